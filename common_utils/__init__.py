@@ -1,2 +1,18 @@
 from .address_parser import *
-from .neo4j_helper import *
\ No newline at end of file
+from .neo4j_helper import *
+from .geocode_cache import *
+from .aho_corasick import *
+from .gazetteer import *
+from .classifier_client import *
+from .company_name_dict import *
+from .mysql_pool import *
+from .schema_cache import *
+from .industry_tree import *
+from .relation_writer import *
+from .kb_bulk_loader import *
+from .hbase_sink import *
+from .hbase_codec import *
+from .hbase_rowkey import *
+from .coauthor_index import *
+from .expert_corpus import *
+from .author_kid_index import *
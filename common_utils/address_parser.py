@@ -5,6 +5,11 @@ import json
 import requests
 import configparser
 import pymysql
+import time
+
+from .geocode_cache import get_geocode_cache
+from .mysql_pool import get_mysql_pool
+from .gazetteer import get_gazetteer
 
 
 logging.basicConfig(level=logging.INFO,
@@ -27,17 +32,12 @@ class AddressParser(object):
         self.config.read(config_path)
         self.ak2 = 'xxx'
         self.ak3 = 'xxx'
+        self.geocode_cache = get_geocode_cache() # 百度地址解析结果本地缓存
 
         # TODO：行政区划使用的是common库中的数据
-        with open(os.path.join(dir_path,'prov_city_area_dict.json'),'r') as load_f:
-            self.all_address = json.load(load_f)
-        self.company_addr_name = []
-        for prov in self.all_address:
-            if prov.strip('省') not in self.company_addr_name:
-                self.company_addr_name.append(prov.strip('省'))
-            for city in self.all_address[prov]:
-                if city.strip('市') not in self.company_addr_name:
-                    self.company_addr_name.append(city.strip('市'))
+        self.gazetteer = get_gazetteer(os.path.join(dir_path,'prov_city_area_dict.json')) # 行政区划自动机，进程内只构建一次
+        self.all_address = self.gazetteer.all_address
+        self.company_addr_name = self.gazetteer.company_addr_name
 
 
 
@@ -51,6 +51,11 @@ class AddressParser(object):
         map_res['area'] = ''
         if not address:
             return map_res
+        # 优先查本地缓存，命中则不再请求百度接口
+        cache_res = self.geocode_cache.get(address)
+        if cache_res is not None:
+            return cache_res
+        start_time = time.time()
         to_ak = self.ak2
         url_new = 'http://api.map.baidu.com/geocoding/v3/?address='
         url = url_new
@@ -67,6 +72,9 @@ class AddressParser(object):
             map_res = self.get_geocode_info(map_index)
             map_res['longitude'] = lng
             map_res['latitude'] = lat
+            # 行政区划接口出错时不缓存，下次重新请求
+            if map_res['province']:
+                self.geocode_cache.set(address, map_res, cost=time.time()-start_time)
         return map_res
 
 
@@ -99,12 +107,12 @@ class AddressParser(object):
             "latitude": ""
         }
 
-        sql_conn = pymysql.connect( host = self.config.get("mysql","host") ,
+        sql_conn = get_mysql_pool( host = self.config.get("mysql","host") ,
                             user = self.config.get("mysql","user") ,
                             passwd = self.config.get("mysql","passwd"),
                             port = self.config.getint("mysql","port") ,
                             db = self.config.get("mysql","db"),
-                            charset = "utf8" )
+                            charset = "utf8" ).connect()
         sql_cur = sql_conn.cursor() 
         # 查询地方的经纬度信息
         sql_state = self.config.get("mysql","location_query").replace("eq","=").format(location_name)
@@ -195,104 +203,27 @@ class AddressParser(object):
                 elif city_name and company_name.find(city_name)>-1:
                     pass
                 else:
-                    city_num = 0
-                    city_tmp_list = []
-                    find_name = False
-                    find_end = False
-                    for name in self.company_addr_name:
-                        if find_name:
-                            city_num += 1
-                            if city_num >22:
-                                find_end = True
-                                city_num = 0
-                        if name and company_name.find(name)>-1:#获取到公司所含省市名陈
-                            city_tmp_list.append(name)
-                            find_name = True
-                        if find_name and find_end:
-                            find_name = False
-                            find_end = False
-                            res_name = ""
-                            if len(city_tmp_list) == 0:#公司名没有省市
-                                break
-                            if len(city_tmp_list) == 1:#公司名有省市一个
-                                res_name = city_tmp_list[0]
-                            else:
-                                name0 = city_tmp_list[0]
-                                name1 = city_tmp_list[1]
-                                if company_name.find(name0) < company_name.find(name1):
-                                    res_name = name0
-                                else:
-                                    res_name = name1
-                            if res_name not in [prov_name,city_name]:
-                                parse_out['province'] = ""
-                                parse_out['city'] = ""
-                                parse_out['area'] = ""
-                                parse_out['longitude'] = ""
-                                parse_out['latitude'] = ""
+                    for res_name in self.gazetteer.company_name_places(company_name):
+                        if res_name not in [prov_name,city_name]:
+                            parse_out['province'] = ""
+                            parse_out['city'] = ""
+                            parse_out['area'] = ""
+                            parse_out['longitude'] = ""
+                            parse_out['latitude'] = ""
 
            
         return parse_out
 
 
     def match_addr(self, _address, _area=''):
-        all_dict = self.all_address
+        '''行政区划匹配，返回 (省, 市, 区县)，一次扫描地址完成'''
 
-        find_prov = False
-        find_city = False
-        find_area = False
         index_prov = ''
-        index_city = ''
-        index_area = ''
         if "省" in _area or _area in ["北京","天津","上海","重庆"]:
             index_prov = _area
-            find_prov = True
             if index_prov in ['北京市','天津市','上海市','重庆市']:
                 index_prov = index_prov.strip('市')
-        else:
-            for prov in all_dict:
-                if _address.find(prov)>-1:
-                    find_prov = True
-                    index_prov = prov
-                    break
-                elif prov.find('省')>-1 and _address.find(prov.strip('省'))>-1:
-                    find_prov = True
-                    index_prov = prov
-                    break
-        if not find_prov:
-                return ('','','')
-        for city in all_dict[index_prov]:
-            if _address.find(city)>-1:
-                find_city = True
-                index_city = city
-                break
-            elif city.find('市')>-1 and _address.find(city.strip('市'))>-1:
-                find_city = True
-                index_city = city
-                break
-        if not find_city:
-            for n_city in all_dict[index_prov]:
-                for n_area in all_dict[index_prov][n_city]:
-                    if _address.find(n_area)>-1:
-                        find_area = True
-                        index_city = n_city
-                        index_area = n_area
-                        break
-                    elif n_area.find('市')>-1 and _address.find(n_area.strip('市'))>-1:
-                        find_area = True
-                        index_city = n_city
-                        index_area = n_area
-                        break
-        else:
-            for area in all_dict[index_prov][index_city]:
-                if _address.find(area)>-1:
-                    find_area = True
-                    index_area = area
-                    break
-                elif area.find('市')>-1 and _address.find(area.strip('市'))>-1:
-                    find_area = True
-                    index_area = area
-                    break
-        return (index_prov,index_city,index_area)
+        return self.gazetteer.match_addr(_address, index_prov)
 
 
 
@@ -0,0 +1,89 @@
+from collections import deque
+
+
+class AhoCorasick(object):
+    '''
+    Aho-Corasick 多模式串匹配自动机
+    先 add 全部模式串，再 build 一次，之后每次匹配只需要扫描一遍文本，耗时与模式串数量无关
+    '''
+
+    def __init__(self, patterns=None):
+
+        self.goto = [{}]    # 状态转移表
+        self.fail = [0]     # 失败指针
+        self.output = [()]  # 每个状态命中的模式串id（含失败链上的）
+        self.patterns = []  # 模式串id -> 模式串
+        self.pattern_ids = {}
+        self.built = False
+        if patterns:
+            for pattern in patterns:
+                self.add(pattern)
+            self.build()
+
+    def add(self, pattern):
+        '''添加模式串，返回模式串id，重复添加返回同一个id；空串不加入'''
+
+        if not pattern:
+            return None
+        if pattern in self.pattern_ids:
+            return self.pattern_ids[pattern]
+        state = 0
+        for ch in pattern:
+            next_state = self.goto[state].get(ch)
+            if next_state is None:
+                next_state = len(self.goto)
+                self.goto[state][ch] = next_state
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append(())
+            state = next_state
+        pid = len(self.patterns)
+        self.patterns.append(pattern)
+        self.pattern_ids[pattern] = pid
+        self.output[state] = self.output[state] + (pid,)
+        self.built = False
+        return pid
+
+    def build(self):
+        '''BFS 计算失败指针，并把失败链上的输出合并到当前状态'''
+
+        queue = deque()
+        for next_state in self.goto[0].values():
+            self.fail[next_state] = 0
+            queue.append(next_state)
+        while queue:
+            state = queue.popleft()
+            for ch, next_state in self.goto[state].items():
+                queue.append(next_state)
+                f = self.fail[state]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[next_state] = self.goto[f].get(ch, 0)
+                if self.fail[next_state] == next_state:
+                    self.fail[next_state] = 0
+                self.output[next_state] = self.output[next_state] + self.output[self.fail[next_state]]
+        self.built = True
+
+    def iter(self, text):
+        '''逐个返回命中结果 (起始位置, 模式串id)，同一模式串多次出现会多次返回'''
+
+        if not self.built:
+            self.build()
+        goto, fail, output, patterns = self.goto, self.fail, self.output, self.patterns
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for pid in output[state]:
+                yield i - len(patterns[pid]) + 1, pid
+
+    def find_ids(self, text):
+        '''文本中出现过的模式串id集合'''
+
+        return set(pid for _, pid in self.iter(text))
+
+    def find_set(self, text):
+        '''文本中出现过的模式串集合，等价于对每个模式串做 text.find(pattern)>-1'''
+
+        return set(self.patterns[pid] for pid in self.find_ids(text))
@@ -0,0 +1,116 @@
+import os
+import queue
+import logging
+import threading
+import configparser
+
+from pyArango.theExceptions import AQLQueryError
+
+
+logger = logging.getLogger(__name__)
+
+dir_path = os.path.dirname(__file__)
+kbp_path = os.path.dirname(dir_path)
+config_path = os.path.join(kbp_path, "config.ini")
+
+_END = object()
+
+
+class ArangoCursor(object):
+    '''
+    AQL 流式游标，替代 fetch_list 一次性把全部结果读入内存
+    - 按 batch_size 分批从服务端拉取，后台线程预取后续批次（最多缓存 prefetch 批），处理与拉取并行
+    - 内存中只保留正在处理和预取的批次，与结果总数无关
+    - 返回字段由调用方在 AQL 的 RETURN 中投影，只取需要的字段
+    - len() 为服务端返回的结果总数（count），不需要先读完结果
+    batch_size、ttl、prefetch 未传入时读取 config.ini 的 [arango_cursor] 配置
+    '''
+
+    def __init__(self, db, aql, bind_vars=None, batch_size=None, ttl=None, prefetch=None):
+
+        config = configparser.ConfigParser()
+        config.read(config_path)
+        self.aql = aql
+        self.batch_size = batch_size or config.getint("arango_cursor", "batch_size", fallback=1000)
+        self.ttl = ttl or config.getint("arango_cursor", "ttl", fallback=600)
+        self.prefetch = prefetch or config.getint("arango_cursor", "prefetch", fallback=2)
+        # 服务端游标 ttl 需覆盖处理一批数据的时间，否则后续批次拉取时游标已失效
+        self.query = db.AQLQuery(aql, rawResults=True, batchSize=self.batch_size,
+                                 bindVars=bind_vars or {}, count=True, ttl=self.ttl)
+        self.count = self.query.response.get("count") or 0
+        self.consumed = False
+
+    def __len__(self):
+        return self.count
+
+    def _has_more(self):
+        return self.query.response.get("hasMore", False)
+
+    @staticmethod
+    def _put(batches, item, stop):
+        while not stop.is_set():
+            try:
+                batches.put(item, timeout=1)
+                return
+            except queue.Full:
+                continue
+
+    def _fetch_batches(self, batches, stop):
+        '''后台线程：依次拉取后续批次放入队列，队列满时等待，调用方退出遍历后停止'''
+
+        try:
+            while self._has_more() and not stop.is_set():
+                self.query.nextBatch()
+                self._put(batches, self.query.result, stop)
+        except Exception as e:
+            self._put(batches, e, stop)
+        self._put(batches, _END, stop)
+
+    def __iter__(self):
+
+        if self.consumed:
+            raise RuntimeError("ArangoCursor 只能遍历一次")
+        self.consumed = True
+
+        first_batch = self.query.result
+        if not self._has_more():
+            for doc in first_batch:
+                yield doc
+            return
+
+        batches = queue.Queue(maxsize=self.prefetch)
+        stop = threading.Event()
+        fetcher = threading.Thread(target=self._fetch_batches, args=(batches, stop), daemon=True)
+        fetcher.start()
+        try:
+            for doc in first_batch:
+                yield doc
+            first_batch = None
+            while True:
+                batch = batches.get()
+                if batch is _END:
+                    break
+                if isinstance(batch, Exception):
+                    raise batch
+                for doc in batch:
+                    yield doc
+        finally:
+            stop.set()
+            fetcher.join()
+            # 提前退出遍历时释放服务端游标
+            if self._has_more() and self.query.cursor is not None:
+                try:
+                    self.query.connection.session.delete(self.query.cursor.getURL())
+                except Exception:
+                    pass
+
+
+def iter_aql(db, aql, bind_vars=None, batch_size=None, **kwargs):
+    '''
+    执行 AQL 返回流式游标；查询出错时记录日志并返回空列表，与原 fetch_list 查询不到数据时的处理一致
+    '''
+    try:
+        return ArangoCursor(db, aql, bind_vars=bind_vars, batch_size=batch_size, **kwargs)
+    except AQLQueryError as e:
+        logger.error("AQL查询失败，AQL=[{}]，错误=[{}]".format(aql[:200], e))
+        return []
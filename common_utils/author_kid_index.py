@@ -0,0 +1,146 @@
+import os
+import re
+import logging
+import configparser
+
+
+logger = logging.getLogger(__name__)
+
+dir_path = os.path.dirname(__file__)
+kbp_path = os.path.dirname(dir_path)
+config_path = os.path.join(kbp_path, "config.ini")
+
+RESOLVED_TIER = 0   # 成果清洗库中已有 kId 的作者
+INDEX_TIER = 1      # res_kb_expert_index 专家索引
+
+
+def normalize_institution(s):
+    '''机构名归一化：去空白、全角括号转半角、英文小写'''
+    if not s:
+        return ""
+    return re.sub(r"\s+", "", s).replace("（", "(").replace("）", ")").lower()
+
+
+class AuthorKidIndex(object):
+    '''
+    成果作者 kId 内存匹配索引，替代逐个作者对成果清洗库、专家索引库做 $regex 查询
+    - 两级数据：成果清洗库中已有 kId 的作者优先，其次为 res_kb_expert_index，与原来先查清洗库、再查索引的顺序一致
+    - 按作者姓名分组，同名作者按加载顺序保存 (归一化机构, kId)，同一机构只保留第一条
+    - 机构匹配为包含匹配：已有机构包含待查机构即命中（原正则 ".*机构" 的含义，含后缀匹配），取加载顺序最靠前的一条
+    - 同名作者超过 scan_limit 条时为该姓名建立机构二元组倒排，只校验包含待查机构最少见二元组的候选
+    - 新匹配到 kId 的作者通过 add_resolved 加入，后续成果可直接命中
+    batch_size、scan_limit 未传入时读取 config.ini 的 [author_kid_index] 配置
+    '''
+
+    def __init__(self, batch_size=None, scan_limit=None):
+
+        config = configparser.ConfigParser()
+        config.read(config_path)
+        self.batch_size = batch_size or config.getint("author_kid_index", "batch_size", fallback=1000)
+        self.scan_limit = scan_limit or config.getint("author_kid_index", "scan_limit", fallback=64)
+        self.entries = ({}, {})     # 每级：姓名 -> [(归一化机构, kId)]
+        self.seen = ({}, {})        # 每级：姓名 -> {归一化机构}
+        self.grams = ({}, {})       # 每级：姓名 -> {二元组: [条目序号]}，同名条目多时建立
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _bigrams(s):
+        return set(s[i:i + 2] for i in range(len(s) - 1))
+
+    def add(self, name, institution, kId, tier=RESOLVED_TIER):
+        '''加入一条 (姓名, 机构, kId)'''
+
+        institution = normalize_institution(institution)
+        if not name or not institution:
+            return False
+        seen = self.seen[tier].setdefault(name, set())
+        if institution in seen:
+            return False
+        seen.add(institution)
+        entries = self.entries[tier].setdefault(name, [])
+        entries.append((institution, kId))
+        grams = self.grams[tier].get(name)
+        if grams is not None:
+            for gram in self._bigrams(institution):
+                grams.setdefault(gram, []).append(len(entries) - 1)
+        return True
+
+    def add_resolved(self, name, institution, kId):
+        '''新匹配到 kId 的作者'''
+        if kId and len(kId) >= 2:
+            self.add(name, institution, kId, RESOLVED_TIER)
+
+    def load_resolved(self, collection):
+        '''读取成果清洗库中已有 kId（至少两个字符）的作者'''
+
+        count = 0
+        cursor = collection.find({"authors.kId": {"$regex": ".{2,}"}},
+                                 {"authors.name": 1, "authors.research_institution": 1, "authors.kId": 1},
+                                 no_cursor_timeout=True).batch_size(self.batch_size)
+        try:
+            for doc in cursor:
+                for author in doc.get("authors") or []:
+                    kId = author.get("kId") or ""
+                    if len(kId) >= 2 and self.add(author.get("name"), author.get("research_institution"), kId):
+                        count += 1
+        finally:
+            cursor.close()
+        logger.info("成果库[{}]已有kId作者加载完成，共[{}]条".format(collection.name, count))
+        return count
+
+    def load_index(self, collection):
+        '''读取专家索引库'''
+
+        count = 0
+        cursor = collection.find({}, {"expert_name": 1, "research_institution": 1, "kId": 1},
+                                 no_cursor_timeout=True).batch_size(self.batch_size)
+        try:
+            for doc in cursor:
+                if self.add(doc.get("expert_name"), doc.get("research_institution"), doc.get("kId", ""), INDEX_TIER):
+                    count += 1
+        finally:
+            cursor.close()
+        logger.info("专家索引[{}]加载完成，共[{}]条".format(collection.name, count))
+        return count
+
+    def _build_grams(self, tier, name):
+        grams = {}
+        for i, (institution, _) in enumerate(self.entries[tier][name]):
+            for gram in self._bigrams(institution):
+                grams.setdefault(gram, []).append(i)
+        self.grams[tier][name] = grams
+        return grams
+
+    def _candidates(self, tier, name, institution):
+        '''可能包含待查机构的条目序号，按加载顺序'''
+
+        entries = self.entries[tier].get(name)
+        if not entries:
+            return ()
+        query_grams = self._bigrams(institution)
+        if len(entries) <= self.scan_limit or not query_grams:
+            return range(len(entries))
+        grams = self.grams[tier].get(name) or self._build_grams(tier, name)
+        postings = [grams.get(gram, ()) for gram in query_grams]
+        return min(postings, key=len)
+
+    def _lookup(self, tier, name, institution):
+        entries = self.entries[tier].get(name)
+        for i in self._candidates(tier, name, institution):
+            if institution in entries[i][0]:
+                return entries[i][1]
+        return None
+
+    def resolve(self, name, institution):
+        '''返回作者的 kId，未匹配到时返回空字符串'''
+
+        institution = normalize_institution(institution)
+        if name and institution:
+            for tier in (RESOLVED_TIER, INDEX_TIER):
+                kId = self._lookup(tier, name, institution)
+                if kId is not None:
+                    self.hits += 1
+                    return kId
+        self.misses += 1
+        return ""
@@ -0,0 +1,118 @@
+import os
+import json
+import asyncio
+import logging
+import configparser
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+
+logger = logging.getLogger(__name__)
+
+dir_path = os.path.dirname(__file__)
+kbp_path = os.path.dirname(dir_path)
+config_path = os.path.join(kbp_path, "config.ini")
+
+
+class ClassifierClient(object):
+    '''
+    分类接口批量客户端（企业/专家/专利/会议产业分类）
+    - 待分类实体按 batch_size 合并成一次请求，pack_func 把一批实体组装成请求体，
+      unpack_func 把接口返回的 body 拆成与该批实体一一对应的结果列表
+    - 多个批次用 asyncio 并发提交，同时在途的请求数不超过 concurrency，每个请求有超时
+    - 请求失败或超时的实体结果为 None，调用方按无分类结果处理
+    batch_size、concurrency、timeout、retries 未传入时读取 config.ini 的 [classifier] 配置
+    '''
+
+    def __init__(self, url, pack_func, unpack_func=None, batch_size=None, concurrency=None, timeout=None, retries=None):
+
+        config = configparser.ConfigParser()
+        config.read(config_path)
+        self.url = url
+        self.pack_func = pack_func
+        self.unpack_func = unpack_func or (lambda body, batch: body)
+        self.batch_size = batch_size or config.getint("classifier", "batch_size", fallback=50)
+        self.concurrency = concurrency or config.getint("classifier", "concurrency", fallback=4)
+        self.timeout = timeout or config.getint("classifier", "timeout", fallback=30)
+        self.retries = retries if retries is not None else config.getint("classifier", "retries", fallback=1)
+        self.session = requests.Session()
+        self.executor = ThreadPoolExecutor(max_workers=self.concurrency)
+        self.count_request = 0
+        self.count_failed = 0  # 没有拿到分类结果的实体数
+
+    def _post(self, batch):
+        '''同步提交一个批次，返回与 batch 对应的结果列表'''
+
+        post_data = json.dumps(self.pack_func(batch))
+        for attempt in range(self.retries + 1):
+            try:
+                self.count_request += 1
+                res = self.session.post(self.url, data=post_data, timeout=self.timeout)
+                if res.status_code != 200:
+                    logger.error("分类接口返回异常状态码[{}]，接口=[{}]，批次大小[{}]".format(res.status_code, self.url, len(batch)))
+                    continue
+                results = self.unpack_func(res.json().get("body"), batch)
+                if results is None or len(results) != len(batch):
+                    logger.error("分类接口返回结果数与请求数不一致，接口=[{}]，批次大小[{}]".format(self.url, len(batch)))
+                    break
+                return list(results)
+            except Exception as e:
+                logger.error("分类接口请求失败，接口=[{}]，批次大小[{}]，第[{}]次，错误=[{}]".format(self.url, len(batch), attempt + 1, e))
+        self.count_failed += len(batch)
+        return [None] * len(batch)
+
+    async def _classify_batches(self, batches):
+
+        loop = asyncio.get_event_loop()
+        semaphore = asyncio.Semaphore(self.concurrency)
+        # 线程内的 requests 已有超时，这里再兜底一次整体超时，防止单批次卡住整个流程
+        batch_timeout = self.timeout * (self.retries + 1) + 5
+
+        async def run(batch):
+            async with semaphore:
+                try:
+                    return await asyncio.wait_for(loop.run_in_executor(self.executor, self._post, batch), batch_timeout)
+                except asyncio.TimeoutError:
+                    logger.error("分类接口批次超时，接口=[{}]，批次大小[{}]".format(self.url, len(batch)))
+                    self.count_failed += len(batch)
+                    return [None] * len(batch)
+
+        return await asyncio.gather(*[run(batch) for batch in batches])
+
+    def classify(self, items):
+        '''批量分类，返回与 items 一一对应的结果列表'''
+
+        if not items:
+            return []
+        batches = [items[i:i + self.batch_size] for i in range(0, len(items), self.batch_size)]
+        loop = asyncio.new_event_loop()
+        try:
+            batch_results = loop.run_until_complete(self._classify_batches(batches))
+        finally:
+            loop.close()
+        results = []
+        for batch_result in batch_results:
+            results.extend(batch_result)
+        return results
+
+    def iter_classified(self, entities, key_func):
+        '''
+        流式分类：每攒够 batch_size*concurrency（至少100）个实体并发请求一次，按原顺序返回 (实体, 分类结果)
+        key_func 从实体中取出提交给 pack_func 的内容
+        '''
+        chunk_size = max(self.batch_size * self.concurrency, 100)
+        chunk = []
+        for entity in entities:
+            chunk.append(entity)
+            if len(chunk) >= chunk_size:
+                for pair in zip(chunk, self.classify([key_func(e) for e in chunk])):
+                    yield pair
+                chunk = []
+        if chunk:
+            for pair in zip(chunk, self.classify([key_func(e) for e in chunk])):
+                yield pair
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+        self.session.close()
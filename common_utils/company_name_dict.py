@@ -0,0 +1,124 @@
+import datetime
+import logging
+
+import pymysql
+import pymysql.cursors
+
+from .mysql_pool import get_mysql_pool
+
+
+logger = logging.getLogger(__name__)
+
+
+class CompanyNameDict(object):
+    '''
+    人工梳理的企业维度数据（企业渠道、企业标签）整表预加载，按企业名索引
+    - query_key：config.ini [mysql] 中的整表查询，返回列与按企业名查询的 SQL 相同，第一列为企业名，
+      如 company_channel_all_query 返回 (company_name, channel_name, channel_id)
+    - name_query_key：按企业名查询的 SQL，如 company_channel_query
+    - update_query_key：按更新时间查询有变化的企业，第一列为企业名，如 company_channel_refresh
+    - 数据用服务端游标流式读取，只保存企业名 -> 行元组列表
+    未配置 query_key、配置为空或整表查询失败时不加载（loaded 为 False），调用方回退到按企业名逐条查询
+    '''
+
+    def __init__(self, config, query_key, name_query_key=None, update_query_key=None):
+
+        self.config = config
+        self.query_key = query_key
+        self.name_query_key = name_query_key
+        self.update_query_key = update_query_key
+        self.data = {}
+        self.loaded = False
+        self.load_time = None
+
+    def _connect(self):
+        return get_mysql_pool( host = self.config.get("mysql","host") ,
+                            user = self.config.get("mysql","user") ,
+                            passwd = self.config.get("mysql","passwd"),
+                            port = self.config.getint("mysql","port") ,
+                            db = self.config.get("mysql","db"),
+                            charset = "utf8" ).connect()
+
+    def _fetch(self, sql_state):
+        '''服务端游标流式读取，按企业名分组'''
+
+        res = {}
+        sql_conn = self._connect()
+        try:
+            sql_cur = sql_conn.cursor(pymysql.cursors.SSCursor)
+            sql_cur.execute(sql_state)
+            for row in sql_cur:
+                res.setdefault(row[0], []).append(tuple(row[1:]))
+            sql_cur.close()
+        finally:
+            sql_conn.close()
+        return res
+
+    def load(self):
+        '''整表加载，每次运行调用一次'''
+
+        if not self.config.get("mysql", self.query_key, fallback="").strip():
+            logger.warning("未配置[{}]，不预加载，按企业名逐条查询".format(self.query_key))
+            return self
+        load_time = datetime.datetime.now()
+        sql_state = self.config.get("mysql", self.query_key).replace("eq","=")
+        try:
+            self.data = self._fetch(sql_state)
+        except pymysql.MySQLError as e:
+            self.data = {}
+            logger.error("MYSQL [{}] 预加载失败，按企业名逐条查询，错误=[{}]".format(self.query_key, e))
+            return self
+        self.loaded = True
+        self.load_time = load_time
+        logger.info("MYSQL [{}] 预加载完成，共[{}]家企业".format(self.query_key, len(self.data)))
+        return self
+
+    def refresh(self, since=None):
+        '''
+        增量刷新：按 update_query_key 找出 since（默认为上次加载日期）之后有更新的企业，
+        在同一个连接上按企业名重新查询这些企业的全部记录并整体替换；
+        未整表加载时只读取有更新的企业，供只处理有更新企业的刷新任务（如 company_tag_refresh）使用
+        '''
+        since = since or self.load_time
+        if not since or not self.update_query_key or not self.name_query_key:
+            return self.load()
+        if isinstance(since, (datetime.datetime, datetime.date)):
+            since = since.strftime("%Y-%m-%d")
+        refresh_time = datetime.datetime.now()
+        sql_state = self.config.get("mysql", self.update_query_key).replace("gte",">=").replace("eq","=").format(since)
+        try:
+            updated_names = list(self._fetch(sql_state))
+            updated = {}
+            sql_conn = self._connect()
+            try:
+                sql_cur = sql_conn.cursor(pymysql.cursors.SSCursor)
+                for company_name in updated_names:
+                    sql_cur.execute(self.config.get("mysql", self.name_query_key).replace("eq","=").format(company_name))
+                    updated[company_name] = [tuple(row[1:]) for row in sql_cur]
+                sql_cur.close()
+            finally:
+                sql_conn.close()
+        except pymysql.MySQLError as e:
+            # 刷新失败时保持原有数据，未加载过时调用方回退到按企业名逐条查询
+            logger.error("MYSQL [{}] 增量刷新失败，错误=[{}]".format(self.query_key, e))
+            return self
+        for company_name, rows in updated.items():
+            if rows:
+                self.data[company_name] = rows
+            else:
+                self.data.pop(company_name, None)
+        self.loaded = True
+        self.load_time = refresh_time
+        logger.info("MYSQL [{}] 增量刷新完成，更新[{}]家企业".format(self.query_key, len(updated_names)))
+        return self
+
+    def get(self, company_name):
+        '''返回与按企业名查询相同格式的行：(企业名, 其余列...)'''
+
+        return [(company_name,) + row for row in self.data.get(company_name, ())]
+
+    def __contains__(self, company_name):
+        return company_name in self.data
+
+    def __len__(self):
+        return len(self.data)
@@ -0,0 +1,97 @@
+import os
+import time
+import logging
+import contextlib
+import configparser
+
+
+logger = logging.getLogger(__name__)
+
+dir_path = os.path.dirname(__file__)
+kbp_path = os.path.dirname(dir_path)
+config_path = os.path.join(kbp_path, "config.ini")
+
+
+class EsBulkIndexer(object):
+    '''
+    Elasticsearch 并行批量导入
+    - index 接收文档生成器，按 chunk_size 分块，thread_count 个线程通过 helpers.parallel_bulk 同时提交
+    - 单条失败不中断导入，失败条目逐条记录日志并计入 count_failed
+    - bulk_load 开启时导入期间关闭索引 refresh、副本数置 0，导入结束（包括异常退出）后恢复原设置并刷新索引
+    chunk_size、thread_count、queue_size、bulk_load 未传入时读取 config.ini 的 [es_indexer] 配置
+    '''
+
+    def __init__(self, es, index_name, doc_type=None, chunk_size=None, thread_count=None, queue_size=None, bulk_load=None):
+
+        config = configparser.ConfigParser()
+        config.read(config_path)
+        self.es = es
+        self.index_name = index_name
+        self.doc_type = doc_type
+        self.chunk_size = chunk_size or config.getint("es_indexer", "chunk_size", fallback=500)
+        self.thread_count = thread_count or config.getint("es_indexer", "thread_count", fallback=4)
+        self.queue_size = queue_size or config.getint("es_indexer", "queue_size", fallback=4)
+        self.bulk_load = bulk_load if bulk_load is not None else \
+            config.getboolean("es_indexer", "bulk_load", fallback=False)
+        self.count_success = 0
+        self.count_failed = 0
+
+    def action(self, doc_id, source):
+        '''组装一条 index 操作，_id 固定为实体 id，重复导入时覆盖原文档'''
+
+        action = {
+            "_index": self.index_name,
+            "_id": doc_id,
+            "_source": source
+        }
+        if self.doc_type:
+            action["_type"] = self.doc_type
+        return action
+
+    @contextlib.contextmanager
+    def bulk_load_settings(self):
+        '''批量导入期间关闭 refresh 和副本，退出时恢复'''
+
+        if not self.bulk_load:
+            yield
+            return
+        settings = self.es.indices.get_settings(index=self.index_name)[self.index_name]["settings"]["index"]
+        origin = {
+            "refresh_interval": settings.get("refresh_interval", "1s"),
+            "number_of_replicas": settings.get("number_of_replicas", "1")
+        }
+        self.es.indices.put_settings(index=self.index_name,
+                                     body={"index": {"refresh_interval": "-1", "number_of_replicas": 0}})
+        logger.info("ES[{}]进入批量导入模式，原设置={}".format(self.index_name, origin))
+        try:
+            yield
+        finally:
+            self.es.indices.put_settings(index=self.index_name, body={"index": origin})
+            self.es.indices.refresh(index=self.index_name)
+            logger.info("ES[{}]已恢复索引设置={}".format(self.index_name, origin))
+
+    def index(self, actions):
+        '''并行导入 actions，返回 (成功数, 失败数)'''
+
+        # 只有 ES 导入阶段需要 elasticsearch，导入 common_utils 的其他阶段不依赖它
+        from elasticsearch import helpers
+
+        start_time = time.time()
+        with self.bulk_load_settings():
+            for ok, info in helpers.parallel_bulk(self.es, actions,
+                                                  thread_count=self.thread_count,
+                                                  chunk_size=self.chunk_size,
+                                                  queue_size=self.queue_size,
+                                                  raise_on_error=False,
+                                                  raise_on_exception=False):
+                if ok:
+                    self.count_success += 1
+                else:
+                    self.count_failed += 1
+                    logger.error("ES[{}]导入失败，详情=[{}]".format(self.index_name, info))
+                if self.count_success and self.count_success % 10000 == 0 and ok:
+                    logger.info("ES[{}]已导入[{}]条，[{:.1f}]条/秒".format(
+                        self.index_name, self.count_success, self.count_success / max(time.time() - start_time, 1e-6)))
+        logger.info("ES[{}]导入完成，成功[{}]条，失败[{}]条，耗时[{:.1f}]秒".format(
+            self.index_name, self.count_success, self.count_failed, time.time() - start_time))
+        return self.count_success, self.count_failed
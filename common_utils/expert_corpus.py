@@ -0,0 +1,178 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+import configparser
+
+
+logger = logging.getLogger(__name__)
+
+dir_path = os.path.dirname(__file__)
+kbp_path = os.path.dirname(dir_path)
+config_path = os.path.join(kbp_path, "config.ini")
+
+DEFAULT_CACHE_PATH = os.path.join(kbp_path, "cache", "expert_corpus.db")
+KID_FIELD = "properties.authors.kId"
+CORPUS_PROJECTION = {KID_FIELD: 1, "properties.title": 1, "properties.abstract": 1}
+STAT_PROJECTION = {KID_FIELD: 1, "update_time": 1}
+
+
+class ExpertCorpusBuilder(object):
+    '''
+    专家语料批量组装：一批专家的全部 kId 对每个成果库（专利、论文、科研课题）只做一次 $in 查询，
+    只取标题和摘要，在内存中按 kId 分组后用 join 拼接语料
+    - 拼接顺序与原来逐个 kId 查询一致：kId 顺序，同一 kId 内依次为专利、论文、科研课题，库内按查询返回顺序
+    - cache_enabled 时语料按 kId 列表缓存在本地 sqlite，校验指纹为 kId 关联成果的 (数量, 最大 update_time)：
+      先用只取 kId 和 update_time 的轻量查询计算指纹，指纹一致直接使用缓存语料，不再读取标题摘要
+    batch_size、cache_enabled、path 未传入时读取 config.ini 的 [expert_corpus] 配置
+    '''
+
+    def __init__(self, patent, article, project, batch_size=None, cache_enabled=None, cache_path=None):
+
+        config = configparser.ConfigParser()
+        config.read(config_path)
+        self.collections = [patent, article, project]    # 拼接顺序：专利、论文、科研课题
+        self.batch_size = batch_size or config.getint("expert_corpus", "batch_size", fallback=200)
+        self.cache_enabled = cache_enabled if cache_enabled is not None else \
+            config.getboolean("expert_corpus", "cache_enabled", fallback=False)
+        self.cache_path = cache_path or config.get("expert_corpus", "path", fallback="") or DEFAULT_CACHE_PATH
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self.conn = None
+        if self.cache_enabled:
+            self._open_cache()
+
+    def _open_cache(self):
+
+        cache_dir = os.path.dirname(self.cache_path)
+        if cache_dir and not os.path.exists(cache_dir):
+            os.makedirs(cache_dir, exist_ok=True)
+        self.conn = sqlite3.connect(self.cache_path, timeout=30, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS corpus (
+                kids TEXT PRIMARY KEY,
+                fingerprint TEXT NOT NULL,
+                text TEXT NOT NULL,
+                resource_count INTEGER NOT NULL,
+                save_time REAL NOT NULL
+            )""")
+
+    @staticmethod
+    def _doc_kids(doc, kids):
+        '''成果作者中属于本批的 kId'''
+        authors = (doc.get("properties") or {}).get("authors") or []
+        return set(author.get("kId") for author in authors if isinstance(author, dict)) & kids
+
+    def _group_by_kid(self, collection, kids, projection):
+        '''一次 $in 查询一批 kId 的成果，返回 {kId: [成果]}'''
+
+        grouped = {}
+        if not kids:
+            return grouped
+        for doc in collection.find({KID_FIELD: {"$in": list(kids)}}, projection):
+            for kid in self._doc_kids(doc, kids):
+                grouped.setdefault(kid, []).append(doc)
+        return grouped
+
+    @staticmethod
+    def _expert_kids(expert):
+        return expert["properties"]["kId"] or []
+
+    @staticmethod
+    def _cache_key(kids):
+        return hashlib.md5(json.dumps(kids, ensure_ascii=False).encode("utf8")).hexdigest()
+
+    def _fingerprints(self, experts, kids):
+        '''每个专家关联成果的 (数量, 最大 update_time)'''
+
+        stats = {}  # kId -> [数量, 最大 update_time]
+        for collection in self.collections:
+            for kid, docs in self._group_by_kid(collection, kids, STAT_PROJECTION).items():
+                stat = stats.setdefault(kid, [0, ""])
+                stat[0] += len(docs)
+                for doc in docs:
+                    update_time = str(doc.get("update_time") or "")
+                    if update_time > stat[1]:
+                        stat[1] = update_time
+        fingerprints = []
+        for expert in experts:
+            expert_stats = [stats.get(kid, [0, ""]) for kid in self._expert_kids(expert)]
+            fingerprints.append(json.dumps([sum(s[0] for s in expert_stats),
+                                            max([s[1] for s in expert_stats] or [""])]))
+        return fingerprints
+
+    def _cache_get(self, key, fingerprint):
+        with self._lock:
+            row = self.conn.execute("SELECT fingerprint, text, resource_count FROM corpus WHERE kids=?", (key,)).fetchone()
+        if row and row[0] == fingerprint:
+            return row[1], row[2]
+        return None
+
+    def _cache_set(self, key, fingerprint, text, resource_count):
+        with self._lock:
+            self.conn.execute("INSERT OR REPLACE INTO corpus (kids, fingerprint, text, resource_count, save_time) "
+                              "VALUES (?, ?, ?, ?, ?)", (key, fingerprint, text, resource_count, time.time()))
+
+    def build(self, experts):
+        '''一批专家的语料，返回与 experts 一一对应的 [(语料, 成果数)]'''
+
+        results = [None] * len(experts)
+        pending = list(range(len(experts)))
+        fingerprints = None
+        if self.cache_enabled:
+            kids = set(kid for expert in experts for kid in self._expert_kids(expert))
+            fingerprints = self._fingerprints(experts, kids)
+            pending = []
+            for i, expert in enumerate(experts):
+                cached = self._cache_get(self._cache_key(self._expert_kids(expert)), fingerprints[i])
+                if cached:
+                    self.hits += 1
+                    results[i] = cached
+                else:
+                    self.misses += 1
+                    pending.append(i)
+        if not pending:
+            return results
+
+        kids = set(kid for i in pending for kid in self._expert_kids(experts[i]))
+        grouped = [self._group_by_kid(collection, kids, CORPUS_PROJECTION) for collection in self.collections]
+        for i in pending:
+            parts = []
+            resource_count = 0
+            # 各个KID数据融合统计
+            for kid in self._expert_kids(experts[i]):
+                for resources in grouped:
+                    for resource in resources.get(kid, ()):
+                        resource_count += 1
+                        parts.append(resource["properties"]["title"])
+                        if resource["properties"]["abstract"]:
+                            parts.append("。" + resource["properties"]["abstract"])
+            results[i] = ("".join(parts), resource_count)
+            if self.cache_enabled:
+                self._cache_set(self._cache_key(self._expert_kids(experts[i])), fingerprints[i], *results[i])
+        return results
+
+    def iter_build(self, experts):
+        '''按 batch_size 分批组装语料，逐个返回 (专家, 语料, 成果数)'''
+
+        batch = []
+        for expert in experts:
+            batch.append(expert)
+            if len(batch) >= self.batch_size:
+                for expert_, (text, resource_count) in zip(batch, self.build(batch)):
+                    yield expert_, text, resource_count
+                batch = []
+        if batch:
+            for expert_, (text, resource_count) in zip(batch, self.build(batch)):
+                yield expert_, text, resource_count
+
+    def close(self):
+        if self.conn:
+            self.conn.close()
+            self.conn = None
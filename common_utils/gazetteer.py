@@ -0,0 +1,168 @@
+import os
+import json
+import threading
+
+from .aho_corasick import AhoCorasick
+
+
+class AddressGazetteer(object):
+    '''
+    行政区划词典编译成一个 Aho-Corasick 自动机，一次扫描文本得到所有出现的省、市、区县名称，
+    再按词典顺序规则选出结果，结果与原来逐个 str.find 的 match_addr 保持一致：
+    - 省：词典顺序第一个命中的省（全称，或带“省”的去掉“省”后的简称）
+    - 市：该省下词典顺序第一个命中的市（全称，或带“市”的去掉“市”后的简称）
+    - 未命中市时：该省下最后一个有区县命中的市，及该市下第一个命中的区县
+    - 命中市时：该市下第一个命中的区县
+    '''
+
+    # 公司名省市检查的窗口大小，与原来 company_addr_name 顺序扫描时的 22 保持一致
+    NAME_WINDOW = 22
+
+    def __init__(self, all_address):
+
+        self.all_address = all_address
+        self.automaton = AhoCorasick()
+        self.prov_index = {}  # 模式串id -> [(省顺序, 省)]
+        self.city_index = {}  # 模式串id -> [(省, 市顺序, 市)]
+        self.area_index = {}  # 模式串id -> [(省, 市顺序, 市, 区县顺序, 区县)]
+        self.name_index = {}  # 模式串id -> company_addr_name 中的位置
+
+        for prov_order, prov in enumerate(all_address):
+            self._add(self.prov_index, prov, '省', (prov_order, prov))
+            for city_order, city in enumerate(all_address[prov]):
+                self._add(self.city_index, city, '市', (prov, city_order, city))
+                for area_order, area in enumerate(all_address[prov][city]):
+                    self._add(self.area_index, area, '市', (prov, city_order, city, area_order, area))
+
+        # 公司名中可能出现的省市简称，顺序与原 company_addr_name 一致
+        self.company_addr_name = []
+        for prov in all_address:
+            if prov.strip('省') not in self.company_addr_name:
+                self.company_addr_name.append(prov.strip('省'))
+            for city in all_address[prov]:
+                if city.strip('市') not in self.company_addr_name:
+                    self.company_addr_name.append(city.strip('市'))
+        for index, name in enumerate(self.company_addr_name):
+            pid = self.automaton.add(name)
+            if pid is not None:
+                self.name_index[pid] = index
+
+        self.automaton.build()
+
+    def _add(self, index, name, suffix, entry):
+        '''全称加入自动机；名称中带 suffix 时，去掉首尾 suffix 的简称也加入'''
+
+        names = [name]
+        if name.find(suffix) > -1:
+            names.append(name.strip(suffix))
+        for n in names:
+            pid = self.automaton.add(n)
+            if pid is not None:
+                index.setdefault(pid, []).append(entry)
+
+    def scan(self, text):
+        '''扫描一次文本，返回命中的模式串id集合'''
+
+        if not text:
+            return set()
+        return self.automaton.find_ids(text)
+
+    def match_prov(self, found):
+        '''按词典顺序返回第一个命中的省，没有返回空串'''
+
+        best = None
+        for pid in found:
+            for entry in self.prov_index.get(pid, ()):
+                if best is None or entry < best:
+                    best = entry
+        return best[1] if best else ''
+
+    def match_city_area(self, found, prov):
+        '''在给定省下匹配市和区县，返回 (市, 区县)'''
+
+        self.all_address[prov]  # 与原逻辑一致，省名不在词典中时抛出 KeyError
+
+        best_city = None
+        for pid in found:
+            for entry in self.city_index.get(pid, ()):
+                if entry[0] == prov and (best_city is None or entry[1] < best_city[1]):
+                    best_city = entry
+
+        best_area = None
+        for pid in found:
+            for entry in self.area_index.get(pid, ()):
+                if entry[0] != prov:
+                    continue
+                if best_city:
+                    if entry[2] == best_city[2] and (best_area is None or entry[3] < best_area[3]):
+                        best_area = entry
+                # 未命中市时，原逻辑内层 break 只跳出区县循环，后面的市会覆盖前面的结果
+                elif best_area is None or (-entry[1], entry[3]) < (-best_area[1], best_area[3]):
+                    best_area = entry
+
+        if best_city:
+            return (best_city[2], best_area[4] if best_area else '')
+        if best_area:
+            return (best_area[2], best_area[4])
+        return ('', '')
+
+    def match_addr(self, address, prov=''):
+        '''
+        prov 为空时从地址中匹配省，匹配不到返回 ('','','')；
+        prov 不为空时直接使用该省，只匹配市和区县
+        '''
+        found = self.scan(address)
+        if not prov:
+            prov = self.match_prov(found)
+            if not prov:
+                return ('', '', '')
+        city, area = self.match_city_area(found, prov)
+        return (prov, city, area)
+
+    def company_name_places(self, company_name):
+        '''
+        公司名中出现的省市简称，按原 company_addr_name 顺序扫描、每 22 个名称一个窗口的规则，
+        返回每个窗口判定出的地名列表（取窗口内前两个命中名称中在公司名里更靠前的一个）
+        '''
+        total = len(self.company_addr_name)
+        indexes = sorted(self.name_index[pid] for pid in self.scan(company_name) if pid in self.name_index)
+
+        res_names = []
+        city_tmp_list = []
+        window_end = None
+        for index in indexes:
+            if window_end is not None and index > window_end:
+                if window_end < total:
+                    res_names.append(self._window_name(company_name, city_tmp_list))
+                window_end = None
+            city_tmp_list.append(self.company_addr_name[index])
+            if window_end is None:
+                window_end = index + self.NAME_WINDOW + 1
+        if window_end is not None and window_end < total:
+            res_names.append(self._window_name(company_name, city_tmp_list))
+        return res_names
+
+    def _window_name(self, company_name, city_tmp_list):
+
+        if len(city_tmp_list) == 1:
+            return city_tmp_list[0]
+        name0 = city_tmp_list[0]
+        name1 = city_tmp_list[1]
+        if company_name.find(name0) < company_name.find(name1):
+            return name0
+        return name1
+
+
+_gazetteers = {}
+_gazetteers_lock = threading.Lock()
+
+
+def get_gazetteer(dict_path):
+    '''按行政区划词典文件路径缓存编译好的自动机，同一进程内只构建一次'''
+
+    dict_path = os.path.abspath(dict_path)
+    with _gazetteers_lock:
+        if dict_path not in _gazetteers:
+            with open(dict_path, 'r') as load_f:
+                _gazetteers[dict_path] = AddressGazetteer(json.load(load_f))
+        return _gazetteers[dict_path]
@@ -0,0 +1,156 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import logging
+import threading
+import configparser
+
+
+logger = logging.getLogger(__name__)
+
+dir_path = os.path.dirname(__file__)
+kbp_path = os.path.dirname(dir_path)
+config_path = os.path.join(kbp_path, "config.ini")
+
+DEFAULT_CACHE_PATH = os.path.join(kbp_path, "cache", "geocode_cache.db")
+DEFAULT_MAX_SIZE = 500000               # 最多缓存的地址条数，超出后按最近访问时间淘汰
+DEFAULT_TTL = 90 * 24 * 3600            # 缓存有效期，单位秒
+
+
+class GeocodeCache(object):
+    '''
+    百度地址解析结果的本地持久化缓存，sqlite存储，按规范化后的地址作为key
+    - 超过 max_size 时按 access_time 淘汰最久未访问的记录（LRU）
+    - 超过 ttl 的记录视为失效，读取时删除并按未命中处理
+    - hits/misses 计数用于统计缓存节省的接口调用次数和耗时
+    '''
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_size=DEFAULT_MAX_SIZE, ttl=DEFAULT_TTL):
+
+        self.path = path
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.fetch_count = 0
+        self.fetch_seconds = 0.0  # 未命中时调用百度接口的累计耗时
+        self._lock = threading.Lock()
+
+        cache_dir = os.path.dirname(path)
+        if cache_dir and not os.path.exists(cache_dir):
+            os.makedirs(cache_dir, exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS geocode (
+                address TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                create_time REAL NOT NULL,
+                access_time REAL NOT NULL
+            )""")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_geocode_access ON geocode(access_time)")
+        self.size = self.conn.execute("SELECT COUNT(*) FROM geocode").fetchone()[0]
+
+    @staticmethod
+    def normalize(address):
+        '''地址规范化：去空白、全角括号转半角、去首尾的“-”'''
+        if not address:
+            return ""
+        address = re.sub(r"\s", "", address).strip('-')
+        return address.replace('（', '(').replace('）', ')')
+
+    def get(self, address):
+        '''命中返回缓存的解析结果dict，未命中或已过期返回None'''
+
+        key = self.normalize(address)
+        if not key:
+            return None
+        now = time.time()
+        with self._lock:
+            row = self.conn.execute("SELECT value, create_time FROM geocode WHERE address=?", (key,)).fetchone()
+            if row and self.ttl and now - row[1] > self.ttl:
+                self.conn.execute("DELETE FROM geocode WHERE address=?", (key,))
+                self.size -= 1
+                self.expired += 1
+                row = None
+            if not row:
+                self.misses += 1
+                return None
+            self.conn.execute("UPDATE geocode SET access_time=? WHERE address=?", (now, key))
+            self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, address, value, cost=None):
+        '''写入解析结果，cost为本次接口调用耗时（秒），用于估算缓存节省的时间'''
+
+        key = self.normalize(address)
+        if not key:
+            return
+        now = time.time()
+        with self._lock:
+            if cost is not None:
+                self.fetch_count += 1
+                self.fetch_seconds += cost
+            cur = self.conn.execute("UPDATE geocode SET value=?, create_time=?, access_time=? WHERE address=?",
+                                    (json.dumps(value, ensure_ascii=False), now, now, key))
+            if cur.rowcount == 0:
+                self.conn.execute("INSERT INTO geocode(address, value, create_time, access_time) VALUES (?,?,?,?)",
+                                  (key, json.dumps(value, ensure_ascii=False), now, now))
+                self.size += 1
+            if self.size > self.max_size:
+                self._evict()
+
+    def _evict(self):
+        '''按最近访问时间淘汰，一次多淘汰10%，避免每次写入都触发淘汰'''
+
+        evict_num = self.size - self.max_size + max(self.max_size // 10, 1)
+        self.conn.execute("DELETE FROM geocode WHERE address IN "
+                          "(SELECT address FROM geocode ORDER BY access_time LIMIT ?)", (evict_num,))
+        self.size = self.conn.execute("SELECT COUNT(*) FROM geocode").fetchone()[0]
+        logger.info("地址解析缓存淘汰[{}]条，剩余[{}]条".format(evict_num, self.size))
+
+    def stats(self):
+        '''缓存命中统计，saved_seconds 按未命中时接口平均耗时估算'''
+
+        avg_cost = self.fetch_seconds / self.fetch_count if self.fetch_count else 0.0
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "expired": self.expired,
+            "size": self.size,
+            "hit_rate": self.hits / (self.hits + self.misses) if (self.hits + self.misses) else 0.0,
+            "fetch_seconds": round(self.fetch_seconds, 2),
+            "saved_seconds": round(self.hits * avg_cost, 2)
+        }
+
+    def close(self):
+        if self.conn:
+            self.conn.close()
+            self.conn = None
+
+
+_geocode_caches = {}
+_geocode_caches_lock = threading.Lock()
+
+
+def get_geocode_cache(path=None):
+    '''
+    进程内按路径共享同一个缓存实例，AddressParser 在部分流程中按文档创建，共享实例避免重复打开并合并计数
+    缓存路径、容量、有效期可在 config.ini 的 [geocode_cache] 中配置
+    '''
+    config = configparser.ConfigParser()
+    config.read(config_path)
+    if not path:
+        path = config.get("geocode_cache", "path", fallback="") or DEFAULT_CACHE_PATH
+    # sqlite连接不能跨进程复用，按进程号区分，fork出的子进程会重新打开
+    cache_key = (path, os.getpid())
+    with _geocode_caches_lock:
+        if cache_key not in _geocode_caches:
+            _geocode_caches[cache_key] = GeocodeCache(path,
+                                                      max_size=config.getint("geocode_cache", "max_size", fallback=DEFAULT_MAX_SIZE),
+                                                      ttl=config.getint("geocode_cache", "ttl", fallback=DEFAULT_TTL))
+        return _geocode_caches[cache_key]
@@ -0,0 +1,122 @@
+import os
+import json
+import zlib
+import logging
+import threading
+import configparser
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+try:
+    import lz4.frame
+except ImportError:
+    lz4 = None
+
+
+logger = logging.getLogger(__name__)
+
+dir_path = os.path.dirname(__file__)
+kbp_path = os.path.dirname(dir_path)
+config_path = os.path.join(kbp_path, "config.ini")
+
+FORMAT_COLUMN = b"info:format_version"  # 单元格编码格式版本列
+FORMAT_JSON = b"1"                      # 原格式：ensure_ascii=False 的 json 文本
+FORMAT_COMPACT = b"2"                   # 紧凑 json，大单元格分块压缩
+
+_COMPRESSED = b"\x00"                   # 压缩单元格的首字节，json 文本不会以 \x00 开头
+_CODEC_IDS = {"zstd": b"z", "lz4": b"l", "zlib": b"d"}
+
+
+class HBaseCodec(object):
+    '''
+    HBASE 结构化文档库 entity_properties / relations / tags 等 json 单元格的编解码
+    - mode=json：与原来一致，json.dumps(ensure_ascii=False) 后 utf8 编码
+    - mode=compact：无缩进空格的紧凑 json（装有 orjson 时用 orjson），不小于 min_size 字节的单元格再做 zstd / lz4 / zlib 压缩，
+      压缩单元格以 \\x00 + 压缩算法标识开头；未安装 zstandard / lz4 时退回标准库 zlib
+    - 行内写入 info:format_version 标记格式版本
+    - loads 根据单元格首字节判断格式，新旧格式的数据都能直接读取
+    mode、compression、min_size、level 未传入时读取 config.ini 的 [hbase_codec] 配置
+    '''
+
+    def __init__(self, mode=None, compression=None, min_size=None, level=None):
+
+        config = configparser.ConfigParser()
+        config.read(config_path)
+        self.mode = mode or config.get("hbase_codec", "mode", fallback="json")
+        self.compression = compression or config.get("hbase_codec", "compression", fallback="zstd")
+        self.min_size = min_size if min_size is not None else config.getint("hbase_codec", "min_size", fallback=1024)
+        self.level = level if level is not None else config.getint("hbase_codec", "level", fallback=3)
+        if self.compression == "zstd" and zstandard is None or self.compression == "lz4" and lz4 is None:
+            logger.warning("未安装[{}]压缩库，HBASE单元格改用zlib压缩".format(self.compression))
+            self.compression = "zlib"
+        if self.compression not in _CODEC_IDS:
+            raise ValueError("不支持的HBASE单元格压缩算法：{}".format(self.compression))
+        self.format_version = FORMAT_COMPACT if self.mode == "compact" else FORMAT_JSON
+        self._local = threading.local()
+
+    def _zstd(self):
+        '''zstandard 压缩/解压对象不能跨线程共享，每个线程各建一份'''
+        if not hasattr(self._local, "zstd"):
+            self._local.zstd = (zstandard.ZstdCompressor(level=self.level), zstandard.ZstdDecompressor())
+        return self._local.zstd
+
+    def dumps(self, value):
+        '''对象编码为单元格字节串'''
+
+        if self.mode != "compact":
+            return bytes(json.dumps(value, ensure_ascii=False), encoding="utf8")
+        if orjson is not None:
+            raw = orjson.dumps(value, default=str)
+        else:
+            raw = json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf8")
+        if len(raw) < self.min_size:
+            return raw
+        if self.compression == "zstd":
+            raw = self._zstd()[0].compress(raw)
+        elif self.compression == "lz4":
+            raw = lz4.frame.compress(raw)
+        else:
+            raw = zlib.compress(raw, self.level)
+        return _COMPRESSED + _CODEC_IDS[self.compression] + raw
+
+    def loads(self, cell):
+        '''单元格字节串解码为对象，兼容原 json 文本格式'''
+
+        if cell is None:
+            return None
+        if cell[:1] == _COMPRESSED:
+            codec_id, raw = cell[1:2], cell[2:]
+            if codec_id == _CODEC_IDS["zstd"] and zstandard is None or codec_id == _CODEC_IDS["lz4"] and lz4 is None:
+                raise ValueError("读取HBASE压缩单元格需要安装对应的压缩库，压缩标识：{}".format(codec_id))
+            if codec_id == _CODEC_IDS["zstd"]:
+                raw = self._zstd()[1].decompress(raw)
+            elif codec_id == _CODEC_IDS["lz4"]:
+                raw = lz4.frame.decompress(raw)
+            elif codec_id == _CODEC_IDS["zlib"]:
+                raw = zlib.decompress(raw)
+            else:
+                raise ValueError("无法识别的HBASE单元格压缩标识：{}".format(codec_id))
+            cell = raw
+        if orjson is not None:
+            return orjson.loads(cell)
+        return json.loads(str(cell, encoding="utf8"))
+
+
+_hbase_codecs = {}
+_hbase_codecs_lock = threading.Lock()
+
+
+def get_hbase_codec():
+    '''
+    进程内共享的 HBASE 单元格编解码器，编码方式在 config.ini 的 [hbase_codec] 中配置
+    '''
+    with _hbase_codecs_lock:
+        if "default" not in _hbase_codecs:
+            _hbase_codecs["default"] = HBaseCodec()
+        return _hbase_codecs["default"]
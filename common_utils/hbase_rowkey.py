@@ -0,0 +1,142 @@
+import os
+import zlib
+import queue
+import logging
+import threading
+import configparser
+
+
+logger = logging.getLogger(__name__)
+
+dir_path = os.path.dirname(__file__)
+kbp_path = os.path.dirname(dir_path)
+config_path = os.path.join(kbp_path, "config.ini")
+
+_END = object()
+
+
+def _to_str(value):
+    if isinstance(value, bytes):
+        return str(value, encoding="utf8")
+    return value
+
+
+class HBaseRowkey(object):
+    '''
+    HBASE 结构化文档库 rowkey 规则
+    - salt_buckets=0：与原来一致，rowkey 为 classid|_key，同一实体类型写入连续的 rowkey 区间
+    - salt_buckets>0：rowkey 前加 crc32(classid|_key) % salt_buckets 的定长十六进制盐值，如 0a|concept_entity/1001|<_key>，
+      同一类型的数据打散到 salt_buckets 个区间，写入和全类型扫描分摊到多个 region
+    - make 由 classid 和 _key 计算 rowkey，读取单条数据时同样用 make 得到 rowkey；strip 去掉盐值
+    - scan 按盐值前缀并行扫描某一类型的全部数据，每个前缀一个线程、各用连接池中的一个连接
+    salt_buckets、scan_workers、scan_batch_size 未传入时读取 config.ini 的 [hbase_rowkey] 配置，
+    修改 salt_buckets 后需要重新导入 HBASE 数据
+    '''
+
+    def __init__(self, salt_buckets=None, scan_workers=None, scan_batch_size=None, prefetch=None):
+
+        config = configparser.ConfigParser()
+        config.read(config_path)
+        self.salt_buckets = salt_buckets if salt_buckets is not None else \
+            config.getint("hbase_rowkey", "salt_buckets", fallback=0)
+        self.scan_workers = scan_workers or config.getint("hbase_rowkey", "scan_workers", fallback=4)
+        self.scan_batch_size = scan_batch_size or config.getint("hbase_rowkey", "scan_batch_size", fallback=1000)
+        self.prefetch = prefetch or config.getint("hbase_rowkey", "prefetch", fallback=10000)
+        self.salt_width = len("{:x}".format(max(self.salt_buckets - 1, 0)))
+
+    def salt(self, rowkey_str):
+        return "{:0{}x}".format(zlib.crc32(rowkey_str.encode("utf8")) % self.salt_buckets, self.salt_width)
+
+    def make(self, classid, key):
+        '''实体类型 classid 和 _key 对应的 rowkey（bytes）'''
+
+        rowkey_str = _to_str(classid) + '|' + _to_str(key)
+        if self.salt_buckets > 0:
+            rowkey_str = self.salt(rowkey_str) + '|' + rowkey_str
+        return bytes(rowkey_str, encoding="utf8")
+
+    def strip(self, rowkey):
+        '''去掉盐值，返回原 classid|_key 格式的 rowkey（bytes）'''
+
+        if self.salt_buckets > 0:
+            return rowkey[self.salt_width + 1:]
+        return rowkey
+
+    def prefixes(self, classid):
+        '''某一实体类型的全部扫描前缀'''
+
+        classid = _to_str(classid)
+        if self.salt_buckets <= 0:
+            return [bytes(classid, encoding="utf8")]
+        return [bytes("{:0{}x}|{}".format(bucket, self.salt_width, classid), encoding="utf8")
+                for bucket in range(self.salt_buckets)]
+
+    @staticmethod
+    def _put(rows, item, stop):
+        while not stop.is_set():
+            try:
+                rows.put(item, timeout=1)
+                return
+            except queue.Full:
+                continue
+
+    def _scan_prefixes(self, pool, table_name, prefixes, rows, stop, scan_kwargs):
+        '''扫描线程：依次扫描分到的前缀，结果放入队列，调用方退出遍历后停止'''
+
+        try:
+            with pool.connection() as hbase_conn:
+                table = hbase_conn.table(table_name)
+                for prefix in prefixes:
+                    for row in table.scan(row_prefix=prefix, batch_size=self.scan_batch_size, **scan_kwargs):
+                        if stop.is_set():
+                            return
+                        self._put(rows, row, stop)
+        except Exception as e:
+            self._put(rows, e, stop)
+        finally:
+            self._put(rows, _END, stop)
+
+    def scan(self, pool, table_name, classid, **scan_kwargs):
+        '''
+        并行扫描某一实体类型的全部行，返回 (rowkey, 列字典) 生成器，各前缀之间不保证顺序
+        scan_kwargs 透传给 happybase Table.scan，如 columns
+        '''
+        prefixes = self.prefixes(classid)
+        workers = max(1, min(self.scan_workers, len(prefixes)))
+        rows = queue.Queue(maxsize=self.prefetch)
+        stop = threading.Event()
+        threads = []
+        for i in range(workers):
+            thread = threading.Thread(target=self._scan_prefixes,
+                                      args=(pool, table_name, prefixes[i::workers], rows, stop, scan_kwargs),
+                                      name="hbase-scan-{}".format(i), daemon=True)
+            thread.start()
+            threads.append(thread)
+        try:
+            running = workers
+            while running:
+                row = rows.get()
+                if row is _END:
+                    running -= 1
+                    continue
+                if isinstance(row, Exception):
+                    raise row
+                yield row
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join()
+
+
+_hbase_rowkeys = {}
+_hbase_rowkeys_lock = threading.Lock()
+
+
+def get_hbase_rowkey():
+    '''
+    进程内共享的 rowkey 规则，盐值分桶数在 config.ini 的 [hbase_rowkey] 中配置
+    '''
+    with _hbase_rowkeys_lock:
+        if "default" not in _hbase_rowkeys:
+            _hbase_rowkeys["default"] = HBaseRowkey()
+        return _hbase_rowkeys["default"]
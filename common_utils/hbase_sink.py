@@ -0,0 +1,141 @@
+import os
+import time
+import queue
+import logging
+import threading
+import configparser
+
+
+logger = logging.getLogger(__name__)
+
+dir_path = os.path.dirname(__file__)
+kbp_path = os.path.dirname(dir_path)
+config_path = os.path.join(kbp_path, "config.ini")
+
+_END = object()
+
+
+class HBaseSink(object):
+    '''
+    HBASE 流式批量写入
+    - put 边处理边写入，不再先把全部行收集到列表；rowkey 用集合去重，保留第一次出现的数据，与原来列表去重结果一致
+    - workers 个写入线程共享一个有界队列，每个线程从连接池取连接、各自攒 batch_size 行后提交一次 batch
+    - 单个批次写入失败时重新从连接池取连接重试（happybase 连接池会替换出错的连接），重试 retries 次后仍失败则记录失败行数
+    - stats() 返回写入行数、重复行数、重试次数、失败行数和每秒写入行数
+    workers、batch_size、queue_size、retries 未传入时读取 config.ini 的 [hbase_sink] 配置，
+    workers 不应大于连接池 size，否则多出的线程会等待空闲连接
+    '''
+
+    def __init__(self, pool, table_name, workers=None, batch_size=None, queue_size=None, retries=None):
+
+        config = configparser.ConfigParser()
+        config.read(config_path)
+        self.pool = pool
+        self.table_name = table_name
+        self.workers = workers or config.getint("hbase_sink", "workers", fallback=4)
+        self.batch_size = batch_size or config.getint("hbase_sink", "batch_size", fallback=200)
+        self.retries = retries if retries is not None else config.getint("hbase_sink", "retries", fallback=2)
+        self.log_every = config.getint("hbase_sink", "log_every", fallback=10000)
+        queue_size = queue_size or config.getint("hbase_sink", "queue_size", fallback=5000)
+
+        self.rowkeys = set()
+        self.count_rows = 0         # 写入成功行数
+        self.count_duplicate = 0    # rowkey 重复被跳过的行数
+        self.count_retry = 0        # 批次重试次数
+        self.count_failed = 0       # 重试后仍写入失败的行数
+        self.start_time = time.time()
+        self.closed = False
+        self._lock = threading.Lock()
+        self.rows = queue.Queue(maxsize=queue_size)
+        self.threads = []
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, name="hbase-sink-{}".format(i), daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def put(self, rowkey, data):
+        '''写入一行，rowkey 本次已写入过时跳过，返回是否加入写入队列'''
+
+        if self.closed:
+            raise RuntimeError("HBaseSink 已关闭")
+        if rowkey in self.rowkeys:
+            self.count_duplicate += 1
+            return False
+        self.rowkeys.add(rowkey)
+        self.rows.put((rowkey, data))
+        return True
+
+    def _work(self):
+        '''写入线程：攒够一批后提交，收到结束标记时提交剩余行'''
+
+        batch = []
+        while True:
+            row = self.rows.get()
+            if row is _END:
+                break
+            batch.append(row)
+            if len(batch) >= self.batch_size:
+                self._send(batch)
+                batch = []
+        if batch:
+            self._send(batch)
+
+    def _send(self, batch):
+
+        for attempt in range(self.retries + 1):
+            try:
+                with self.pool.connection() as hbase_conn:
+                    table = hbase_conn.table(self.table_name)
+                    with table.batch() as bat:
+                        for rowkey, data in batch:
+                            bat.put(rowkey, data)
+                break
+            except Exception as e:
+                logger.error("HBASE[{}]批量写入失败，批次大小[{}]，第[{}]次，错误=[{}]".format(
+                    self.table_name, len(batch), attempt + 1, e))
+                if attempt < self.retries:
+                    with self._lock:
+                        self.count_retry += 1
+                    time.sleep(min(2 ** attempt, 10))
+        else:
+            with self._lock:
+                self.count_failed += len(batch)
+            return
+
+        with self._lock:
+            before = self.count_rows
+            self.count_rows += len(batch)
+            count_rows = self.count_rows
+        if count_rows // self.log_every != before // self.log_every:
+            logger.info("HBASE[{}]已写入[{}]条，[{:.1f}]条/秒".format(self.table_name, count_rows, self.rows_per_sec()))
+
+    def rows_per_sec(self):
+        elapsed = time.time() - self.start_time
+        return self.count_rows / elapsed if elapsed > 0 else 0.0
+
+    def stats(self):
+        return {
+            "rows": self.count_rows,
+            "duplicates": self.count_duplicate,
+            "retries": self.count_retry,
+            "failed": self.count_failed,
+            "rows_per_sec": round(self.rows_per_sec(), 1)
+        }
+
+    def close(self):
+        '''提交剩余行并等待写入线程结束，返回 stats()'''
+
+        if not self.closed:
+            self.closed = True
+            for _ in self.threads:
+                self.rows.put(_END)
+            for thread in self.threads:
+                thread.join()
+            logger.info("HBASE[{}]写入完成，统计={}".format(self.table_name, self.stats()))
+        return self.stats()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
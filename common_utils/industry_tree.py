@@ -0,0 +1,61 @@
+import logging
+
+
+logger = logging.getLogger(__name__)
+
+
+class IndustryTree(object):
+    '''
+    产业领域树：加载 industry_schema 后一次性计算每个产业id的祖先闭包
+    - closure[industry_id] 为 (本领域, 父领域, ..., 顶级领域) 的关系字典元组，字典与 industry_schema 共享
+    - related_tags 对一组叶子领域id返回合并去重后的关系列表，顺序与原来逐个向上查找、列表去重的结果一致
+    '''
+
+    def __init__(self, industry_schema):
+
+        self.industry_schema = industry_schema
+        self.closure = {}
+        for industry_id in industry_schema:
+            self._build(industry_id)
+
+    def _build(self, industry_id):
+        '''沿 object_parent_id 向上，复用已计算的父领域闭包'''
+
+        path = []
+        visited = set()
+        node_id = industry_id
+        tail = ()
+        while node_id:
+            if node_id in self.closure:
+                tail = self.closure[node_id]
+                break
+            if node_id in visited:
+                logger.warning("产业领域父子关系存在环，产业id=[{}]".format(node_id))
+                break
+            if node_id not in self.industry_schema:
+                logger.warning("产业领域父节点不存在，产业id=[{}]".format(node_id))
+                break
+            visited.add(node_id)
+            path.append(node_id)
+            node_id = self.industry_schema[node_id]["object_parent_id"]
+        for node_id in reversed(path):
+            tail = (self.industry_schema[node_id],) + tail
+            self.closure[node_id] = tail
+        return self.closure.get(industry_id, ())
+
+    def ancestors(self, industry_id):
+        '''领域及所有父领域标签，招商领域与图谱定义不一致（不在 schema 中）时返回空元组'''
+
+        return self.closure.get(industry_id, ())
+
+    def related_tags(self, industry_ids):
+        '''一组领域id的全部领域及父领域标签，按 object_id 去重'''
+
+        relations = []
+        seen = set()
+        for industry_id in industry_ids:
+            for node in self.closure.get(industry_id, ()):
+                if node["object_id"] not in seen:
+                    seen.add(node["object_id"])
+                    relations.append(node)
+        return relations
@@ -0,0 +1,115 @@
+import os
+import logging
+import configparser
+
+
+logger = logging.getLogger(__name__)
+
+dir_path = os.path.dirname(__file__)
+kbp_path = os.path.dirname(dir_path)
+config_path = os.path.join(kbp_path, "config.ini")
+
+
+class KbBulkLoader(object):
+    '''
+    清洗库 -> 知识库批量导入
+    - iter_exist 按批查询实体是否已在知识库中：一批 key_field 值用一条 FILTER doc.@field IN @values 的 AQL 查询，
+      key_field 不是 _key 时先确保该字段有持久化索引
+    - add 缓存新实体，攒够 batch_size 个后通过 import 接口批量写入，on_duplicate 为 import 接口的 onDuplicate 策略
+    - 本次运行中已 add 的实体在后续批次中按已存在处理，与原来逐条查重、逐条写入的结果一致
+    - count_insert / count_exist / count_failed 与原来的新增、已存在计数对应
+    batch_size、on_duplicate 未传入时读取 config.ini 的 [kb_bulk_loader] 配置
+    '''
+
+    EXIST_AQL = "FOR doc IN @@coll FILTER doc.@field IN @values RETURN doc.@field"
+
+    def __init__(self, db, collection_name, key_field="_key", batch_size=None, on_duplicate=None):
+
+        config = configparser.ConfigParser()
+        config.read(config_path)
+        self.db = db
+        self.collection_name = collection_name
+        self.collection = db[collection_name]
+        self.key_field = key_field
+        self.batch_size = batch_size or config.getint("kb_bulk_loader", "batch_size", fallback=500)
+        self.on_duplicate = on_duplicate or config.get("kb_bulk_loader", "on_duplicate", fallback="ignore")
+        self.docs = []
+        self.added = set()  # 本次运行已提交写入的 key_field 值
+        self.count_insert = 0
+        self.count_exist = 0
+        self.count_failed = 0
+        if key_field != "_key":
+            self.ensure_index()
+
+    def ensure_index(self):
+        '''查重字段的持久化索引，已存在时 Arango 直接返回已有索引'''
+
+        try:
+            self.collection.ensurePersistentIndex([self.key_field], unique=False, sparse=False)
+        except Exception as e:
+            logger.warning("Arango[{}]创建[{}]索引失败，错误=[{}]".format(self.collection_name, self.key_field, e))
+
+    def exist_values(self, values):
+        '''一次查询返回 values 中已在知识库中的值'''
+
+        values = list(set(v for v in values if v))
+        if not values:
+            return set()
+        bind_vars = {"@coll": self.collection_name, "field": self.key_field, "values": values}
+        query = self.db.AQLQuery(self.EXIST_AQL, rawResults=True, batchSize=len(values), bindVars=bind_vars)
+        return set(query.result)
+
+    def iter_exist(self, entities, key_func):
+        '''
+        流式查重：每 batch_size 个实体查询一次，按原顺序返回 (实体, 是否已存在)
+        key_func 从实体中取出 key_field 对应的值
+        '''
+        chunk = []
+        for entity in entities:
+            chunk.append(entity)
+            if len(chunk) >= self.batch_size:
+                for pair in self._check_chunk(chunk, key_func):
+                    yield pair
+                chunk = []
+        if chunk:
+            for pair in self._check_chunk(chunk, key_func):
+                yield pair
+
+    def _check_chunk(self, chunk, key_func):
+
+        exists = self.exist_values([key_func(e) for e in chunk])
+        for entity in chunk:
+            value = key_func(entity)
+            exist = value in exists or value in self.added
+            if exist:
+                self.count_exist += 1
+            yield entity, exist
+
+    def add(self, doc):
+        '''缓存一个新实体，攒够一批后写入'''
+
+        self.added.add(doc.get(self.key_field))
+        self.docs.append(doc)
+        if len(self.docs) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        '''写入缓存的新实体，返回累计新增数'''
+
+        docs, self.docs = self.docs, []
+        if not docs:
+            return self.count_insert
+        try:
+            res = self.collection.importBulk(docs, onDuplicate=self.on_duplicate, details="true")
+        except Exception as e:
+            self.count_failed += len(docs)
+            logger.error("Arango[{}]批量新增失败，批次大小[{}]，错误=[{}]".format(self.collection_name, len(docs), e))
+            return self.count_insert
+        self.count_insert += res.get("created", 0)
+        self.count_exist += res.get("ignored", 0) + res.get("updated", 0)
+        self.count_failed += res.get("errors", 0)
+        for detail in res.get("details", []):
+            logger.error("Arango[{}]新增失败，详情=[{}]".format(self.collection_name, detail))
+        logger.info("Arango[{}]批量新增[{}]个，重复[{}]个，失败[{}]个".format(
+            self.collection_name, res.get("created", 0), res.get("ignored", 0) + res.get("updated", 0), res.get("errors", 0)))
+        return self.count_insert
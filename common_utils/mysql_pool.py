@@ -0,0 +1,223 @@
+import os
+import time
+import logging
+import threading
+from collections import deque
+
+import pymysql
+
+
+logger = logging.getLogger(__name__)
+
+
+class PooledCursor(object):
+    '''包装 pymysql 游标，记录每次 execute 的耗时'''
+
+    def __init__(self, pool, cursor):
+        self._pool = pool
+        self._cursor = cursor
+
+    def execute(self, query, args=None):
+        start_time = time.time()
+        try:
+            return self._cursor.execute(query, args)
+        finally:
+            self._pool.record_query(query, time.time() - start_time)
+
+    def executemany(self, query, args):
+        start_time = time.time()
+        try:
+            return self._cursor.executemany(query, args)
+        finally:
+            self._pool.record_query(query, time.time() - start_time)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class PooledConnection(object):
+    '''
+    从连接池取出的连接，用法与 pymysql 连接一致；
+    close() 不断开连接而是归还连接池，未显式 close 的连接在对象回收时自动归还
+    '''
+
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._conn = conn
+
+    def cursor(self, *args, **kwargs):
+        if self._conn is None:
+            raise pymysql.err.InterfaceError("连接已归还连接池")
+        return PooledCursor(self._pool, self._conn.cursor(*args, **kwargs))
+
+    def close(self):
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            self._pool.release(conn)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+
+    def __getattr__(self, name):
+        if self._conn is None:
+            raise pymysql.err.InterfaceError("连接已归还连接池")
+        return getattr(self._conn, name)
+
+
+class MySQLPool(object):
+    '''
+    进程内共享的 MySQL 连接池，线程安全
+    - 最多同时存在 max_size 个连接，取不到连接时最多等待 wait_timeout 秒
+    - 空闲超过 ping_interval 秒的连接取出时先 ping 检查，失效则重建
+    - 连接归还时 rollback，避免长连接复用时读到旧事务快照
+    - 记录每条 SQL 的耗时，stats() 输出查询次数、总耗时、最大耗时和新建连接数
+    '''
+
+    def __init__(self, max_size=10, ping_interval=60, wait_timeout=60, slow_query_seconds=5, **conn_kwargs):
+
+        self.conn_kwargs = conn_kwargs
+        self.max_size = max_size
+        self.ping_interval = ping_interval
+        self.wait_timeout = wait_timeout
+        self.slow_query_seconds = slow_query_seconds
+        self._idle = deque()  # (连接, 归还时间)
+        self._size = 0
+        self._cond = threading.Condition()
+        self.count_connect = 0
+        self.count_reuse = 0
+        self.count_broken = 0
+        self.count_query = 0
+        self.query_seconds = 0.0
+        self.max_query_seconds = 0.0
+
+    def _new_connection(self):
+        self.count_connect += 1
+        return pymysql.connect(**self.conn_kwargs)
+
+    def _check(self, conn, idle_since):
+        '''空闲较久的连接做一次健康检查'''
+        if not conn.open:
+            return False
+        if time.time() - idle_since < self.ping_interval:
+            return True
+        try:
+            conn.ping(reconnect=False)
+            return True
+        except Exception:
+            return False
+
+    def connect(self):
+        deadline = time.time() + self.wait_timeout
+        with self._cond:
+            while True:
+                while self._idle:
+                    conn, idle_since = self._idle.pop()
+                    if self._check(conn, idle_since):
+                        self.count_reuse += 1
+                        return PooledConnection(self, conn)
+                    self.count_broken += 1
+                    self._size -= 1
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+                if self._size < self.max_size:
+                    self._size += 1
+                    break
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    raise pymysql.err.OperationalError("MySQL连接池已满[{}]，等待超时".format(self.max_size))
+                self._cond.wait(remaining)
+        try:
+            return PooledConnection(self, self._new_connection())
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+
+    def release(self, conn):
+        with self._cond:
+            try:
+                if conn.open:
+                    conn.rollback()
+                    self._idle.append((conn, time.time()))
+                else:
+                    self._size -= 1
+            except Exception:
+                self._size -= 1
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+            self._cond.notify()
+
+    def record_query(self, query, seconds):
+        self.count_query += 1
+        self.query_seconds += seconds
+        if seconds > self.max_query_seconds:
+            self.max_query_seconds = seconds
+        if seconds > self.slow_query_seconds:
+            logger.warning("MySQL慢查询，耗时[{:.2f}]秒，SQL=[{}]".format(seconds, str(query)[:200]))
+
+    def stats(self):
+        return {
+            "size": self._size,
+            "idle": len(self._idle),
+            "connect": self.count_connect,
+            "reuse": self.count_reuse,
+            "broken": self.count_broken,
+            "query": self.count_query,
+            "query_seconds": round(self.query_seconds, 3),
+            "avg_query_seconds": round(self.query_seconds / self.count_query, 4) if self.count_query else 0.0,
+            "max_query_seconds": round(self.max_query_seconds, 3)
+        }
+
+    def close_all(self):
+        with self._cond:
+            while self._idle:
+                conn, _ = self._idle.pop()
+                self._size -= 1
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+
+
+_mysql_pools = {}
+_mysql_pools_lock = threading.Lock()
+
+
+def get_mysql_pool(max_size=10, **conn_kwargs):
+    '''
+    按连接参数返回进程内共享的连接池，参数与 pymysql.connect 相同，如：
+        sql_conn = get_mysql_pool( host = ..., user = ..., passwd = ..., port = ..., db = ..., charset = "utf8" ).connect()
+    fork 出的子进程不复用父进程的连接，按进程号区分
+    '''
+    pool_key = (os.getpid(), tuple(sorted((k, str(v)) for k, v in conn_kwargs.items())))
+    with _mysql_pools_lock:
+        if pool_key not in _mysql_pools:
+            _mysql_pools[pool_key] = MySQLPool(max_size=max_size, **conn_kwargs)
+        return _mysql_pools[pool_key]
+
+
+def mysql_pool_stats():
+    '''当前进程所有连接池的统计，key 为 host/db'''
+    pid = os.getpid()
+    res = {}
+    for (pool_pid, _), pool in list(_mysql_pools.items()):
+        if pool_pid == pid:
+            res["{}/{}".format(pool.conn_kwargs.get("host"), pool.conn_kwargs.get("db"))] = pool.stats()
+    return res
@@ -1,5 +1,16 @@
-from py2neo import Graph,Node,Subgraph
+from py2neo import Graph,Node,Subgraph,NodeMatcher
+import os
+import logging
 import datetime
+import configparser
+
+
+logger = logging.getLogger(__name__)
+
+dir_path = os.path.dirname(__file__)
+kbp_path = os.path.dirname(dir_path)
+config_path = os.path.join(kbp_path, "config.ini")
+
 
 class Neo4jHelper(object):
     
@@ -21,10 +32,80 @@ class Neo4jHelper(object):
                 exist_node[key] = properties[key]
             sub_graph = Subgraph([exist_node])
             self.graph.push(sub_graph)
-            
-            
 
-                
-                
-                
-            
\ No newline at end of file
+
+class Neo4jBatchUpserter(object):
+    '''
+    图数据库结点批量新增/更新，替代 Neo4jHelper.upsert_node 逐个结点查询再 create / push
+    - 初始化时确保 (label, _key) 唯一约束，MERGE 按 _key 走约束索引
+    - 每 chunk_size 个属性字典用一个事务、一条 UNWIND $rows AS r MERGE (n:Label {_key:r._key}) SET n += r 写入
+    - 同一批内 _key 重复时合并属性，同名属性以后出现的为准，与逐个 upsert 的结果一致
+    - count_create / count_update 分别为新建和更新的结点数
+    chunk_size 未传入时读取 config.ini 的 [neo4j_batch] 配置
+    '''
+
+    UPSERT_CYPHER = (
+        "UNWIND $rows AS r "
+        "OPTIONAL MATCH (e:`{label}` {{_key: r._key}}) "
+        "WITH r, e IS NULL AS created "
+        "MERGE (n:`{label}` {{_key: r._key}}) "
+        "SET n += r "
+        "RETURN sum(CASE WHEN created THEN 1 ELSE 0 END) AS created, count(n) AS total"
+    )
+
+    def __init__(self, graph, label, chunk_size=None):
+
+        config = configparser.ConfigParser()
+        config.read(config_path)
+        self.graph = graph
+        self.label = label
+        self.chunk_size = chunk_size or config.getint("neo4j_batch", "chunk_size", fallback=1000)
+        self.rows = {}
+        self.count_create = 0
+        self.count_update = 0
+        self.count_failed = 0
+        self.ensure_constraint()
+
+    def ensure_constraint(self):
+        '''(label, _key) 唯一约束，兼容新旧版本 Neo4j 的语法，已存在时不重复创建'''
+
+        statements = [
+            "CREATE CONSTRAINT IF NOT EXISTS FOR (n:`{0}`) REQUIRE n._key IS UNIQUE",
+            "CREATE CONSTRAINT IF NOT EXISTS ON (n:`{0}`) ASSERT n._key IS UNIQUE",
+            "CREATE CONSTRAINT ON (n:`{0}`) ASSERT n._key IS UNIQUE",
+        ]
+        for statement in statements:
+            try:
+                self.graph.run(statement.format(self.label))
+                return True
+            except Exception as e:
+                error = e
+        logger.warning("图数据库[{}]创建_key唯一约束失败，错误=[{}]".format(self.label, error))
+        return False
+
+    def add(self, properties):
+        '''缓存一个结点的属性字典，攒够一批后写入'''
+
+        self.rows.setdefault(properties["_key"], {}).update(properties)
+        if len(self.rows) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        '''写入缓存的结点，返回 (累计新建数, 累计更新数)'''
+
+        rows, self.rows = list(self.rows.values()), {}
+        if not rows:
+            return self.count_create, self.count_update
+        try:
+            tx = self.graph.begin()
+            res = tx.run(self.UPSERT_CYPHER.format(label=self.label), rows=rows).data()
+            tx.commit()
+        except Exception as e:
+            self.count_failed += len(rows)
+            logger.error("图数据库[{}]批量写入失败，批次大小[{}]，错误=[{}]".format(self.label, len(rows), e))
+            return self.count_create, self.count_update
+        created = res[0]["created"] if res else 0
+        self.count_create += created
+        self.count_update += len(rows) - created
+        logger.info("图数据库[{}]批量写入[{}]个结点，新建[{}]个".format(self.label, len(rows), created))
+        return self.count_create, self.count_update
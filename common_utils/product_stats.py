@@ -0,0 +1,250 @@
+import os
+import math
+import logging
+import configparser
+from array import array
+
+import numpy as np
+from pymongo import UpdateOne
+
+
+logger = logging.getLogger(__name__)
+
+dir_path = os.path.dirname(__file__)
+kbp_path = os.path.dirname(dir_path)
+config_path = os.path.join(kbp_path, "config.ini")
+
+PRODUCT_STAT_PROJECTION = {"properties.product_stat.product_id": 1, "properties.product_stat.product_count": 1}
+
+
+def normal_range(count, total, total_sq):
+    '''
+    由专家数、词频和、词频平方和精确计算 (expert_max_normal, expert_min_normal)
+    即 int(mean + 2*std)、max(int(mean - 2*std), 0)，std 为总体标准差；
+    全部用整数运算（4*n^2*var = 4*(n*平方和 - 和^2)，开方取整用 isqrt），不受浮点误差影响，
+    全量统计与增量维护得到的阈值完全一致
+    '''
+    if count <= 0:
+        return 0, 0
+    var4 = 4 * (count * total_sq - total * total)     # (2*n*std)^2
+    root = math.isqrt(var4)
+    max_normal = (total + root) // count
+    # mean - 2*std 为负时截断结果为 0，非负时截断即向下取整
+    root_ceil = root if root * root == var4 else root + 1
+    min_normal = max((total - root_ceil) // count, 0)
+    return max_normal, min_normal
+
+
+class ProductStatAccumulator(object):
+    '''
+    产品节点上专家词频分布的一次性统计
+    - add 逐个专家加入 product_stat，(节点序号, 词频) 追加到两个 array 缓冲区，同一专家同一节点只取第一个
+    - compute 用 NumPy 按节点分组累加专家数、词频和、词频平方和（int64），再由 normal_range 精确得到
+      expert_max_normal、expert_min_normal，expert_max_abs = 最大词频，没有专家的节点三项均为 0；
+      compute 后 moments 为 {节点id: (专家数, 词频和, 词频平方和)}，用于初始化增量统计
+    '''
+
+    def __init__(self, node_ids):
+
+        self.node_ids = list(node_ids)
+        self.node_index = dict((node_id, i) for i, node_id in enumerate(self.node_ids))
+        self.indexes = array("q")   # 节点序号
+        self.counts = array("q")    # 词频
+        self.count_expert = 0
+
+    def add(self, product_stat):
+        '''加入一个专家的 product_stat'''
+
+        seen = set()
+        for item in product_stat or []:
+            i = self.node_index.get(item.get("product_id"))
+            if i is None or i in seen:
+                continue
+            seen.add(i)
+            self.indexes.append(i)
+            self.counts.append(int(item["product_count"]))
+        self.count_expert += 1
+
+    def compute(self):
+        '''返回 {节点id: (expert_max_normal, expert_min_normal, expert_max_abs)}'''
+
+        size = len(self.node_ids)
+        indexes = np.frombuffer(self.indexes, dtype=np.int64) if self.indexes else np.zeros(0, dtype=np.int64)
+        counts = np.frombuffer(self.counts, dtype=np.int64) if self.counts else np.zeros(0, dtype=np.int64)
+
+        n = np.bincount(indexes, minlength=size)
+        total = np.zeros(size, dtype=np.int64)
+        np.add.at(total, indexes, counts)
+        total_sq = np.zeros(size, dtype=np.int64)
+        np.add.at(total_sq, indexes, counts * counts)
+        max_abs = np.zeros(size, dtype=np.int64)
+        np.maximum.at(max_abs, indexes, counts)
+
+        # 转为 python int，pymongo 不能直接写入 numpy 类型，normal_range 也需要任意精度整数
+        self.moments = dict((node_id, (int(n[i]), int(total[i]), int(total_sq[i])))
+                            for i, node_id in enumerate(self.node_ids))
+        logger.info("产品节点词频分布统计完成，专家[{}]位，节点[{}]个，有专家的节点[{}]个".format(
+            self.count_expert, size, int((n > 0).sum())))
+        return dict((node_id, normal_range(*self.moments[node_id]) + (int(max_abs[i]),))
+                    for i, node_id in enumerate(self.node_ids))
+
+
+class ProductStatStore(object):
+    '''
+    产品节点专家词频分布的增量维护
+    - 每个节点在产品链节点文档中保存 expert_stat_count / expert_stat_sum / expert_stat_sum_sq 和 expert_max_abs，
+      由全量统计 stat_save_max 写入初始值
+    - 词频为整数，专家数、词频和、词频平方和用整数精确加减，不会累积浮点误差
+    - update_expert 在某个专家的 product_stat 变化时减去旧词频、加上新词频，并由 normal_range 重新计算该节点的
+      expert_max_normal / expert_min_normal，与全量统计结果完全一致
+    - expert_max_abs 只增不减，专家词频变小或移除后的最大值由定期全量统计修正
+    - 没有增量字段的节点（尚未做过全量统计）不做增量更新
+    - 变化的节点攒够 flush_size 个后批量写回
+    incremental、flush_size 未传入时读取 config.ini 的 [product_stats] 配置，incremental=false 时不做增量更新
+    '''
+
+    def __init__(self, collection, incremental=None, flush_size=None):
+
+        config = configparser.ConfigParser()
+        config.read(config_path)
+        self.collection = collection
+        self.incremental = incremental if incremental is not None else \
+            config.getboolean("product_stats", "incremental", fallback=True)
+        self.flush_size = flush_size or config.getint("product_stats", "flush_size", fallback=500)
+        self.stats = {}     # 节点id -> [count, sum, sum_sq, max]
+        self.dirty = set()
+        self.missing = set()
+        if self.incremental:
+            self.load()
+
+    def load(self):
+        '''从产品链节点读取增量统计字段，全量统计后需重新加载'''
+
+        self.stats = {}
+        self.dirty = set()
+        self.missing = set()
+        for node in self.collection.find({"is_match": 1, "expert_stat_sum_sq": {"$exists": True}},
+                                         {"expert_stat_count": 1, "expert_stat_sum": 1, "expert_stat_sum_sq": 1, "expert_max_abs": 1}):
+            self.stats[node["_id"]] = [int(node["expert_stat_count"]), int(node["expert_stat_sum"]),
+                                       int(node["expert_stat_sum_sq"]), int(node.get("expert_max_abs", 0))]
+        logger.info("产品节点增量统计加载完成，共[{}]个节点".format(len(self.stats)))
+
+    @staticmethod
+    def _first_counts(product_stat):
+        '''{节点id: 词频}，同一节点只取第一个，与全量统计一致'''
+        counts = {}
+        for item in product_stat or []:
+            counts.setdefault(item["product_id"], int(item["product_count"]))
+        return counts
+
+    def _add(self, stat, x):
+        stat[0] += 1
+        stat[1] += x
+        stat[2] += x * x
+        stat[3] = max(stat[3], x)
+
+    def _remove(self, stat, x):
+        stat[0] -= 1
+        stat[1] -= x
+        stat[2] -= x * x
+
+    def update_expert(self, old_product_stat, new_product_stat):
+        '''专家 product_stat 由 old 变为 new，返回分布有变化的节点id列表'''
+
+        if not self.incremental:
+            return []
+        old_counts = self._first_counts(old_product_stat)
+        new_counts = self._first_counts(new_product_stat)
+        changed = []
+        for node_id in set(old_counts) | set(new_counts):
+            if old_counts.get(node_id) == new_counts.get(node_id):
+                continue
+            stat = self.stats.get(node_id)
+            if stat is None:
+                if node_id not in self.missing:
+                    self.missing.add(node_id)
+                    logger.warning("产品节点[{}]没有增量统计字段，需要先执行全量统计".format(node_id))
+                continue
+            if node_id in old_counts:
+                self._remove(stat, old_counts[node_id])
+            if node_id in new_counts:
+                self._add(stat, new_counts[node_id])
+            self.dirty.add(node_id)
+            changed.append(node_id)
+        if len(self.dirty) >= self.flush_size:
+            self.flush()
+        return changed
+
+    def thresholds(self, node_id):
+        '''(expert_max_normal, expert_min_normal)'''
+
+        count, total, total_sq, _ = self.stats[node_id]
+        return normal_range(count, total, total_sq)
+
+    def flush(self):
+        '''变化的节点批量写回'''
+
+        dirty, self.dirty = self.dirty, set()
+        if not dirty:
+            return 0
+        requests = []
+        for node_id in dirty:
+            count, total, total_sq, max_abs = self.stats[node_id]
+            expert_max_normal, expert_min_normal = self.thresholds(node_id)
+            requests.append(UpdateOne({"_id": node_id}, {"$set": {
+                "expert_stat_count": count,
+                "expert_stat_sum": total,
+                "expert_stat_sum_sq": total_sq,
+                "expert_max_abs": max_abs,
+                "expert_max_normal": expert_max_normal,
+                "expert_min_normal": expert_min_normal
+            }}))
+        self.collection.bulk_write(requests, ordered=False)
+        logger.info("产品节点增量统计写回[{}]个节点".format(len(requests)))
+        return len(requests)
+
+
+if __name__ == "__main__":
+
+    # 一致性校验：随机专家反复更新 product_stat，增量维护的阈值与全量统计逐节点比较
+    import random
+
+    class MemoryCollection(object):
+
+        def __init__(self, nodes):
+            self.nodes = nodes
+
+        def find(self, query, projection):
+            return self.nodes
+
+        def bulk_write(self, requests, ordered=True):
+            pass
+
+    def random_stat():
+        return [{"product_id": random.randrange(20), "product_count": random.randint(3, 60)}
+                for _ in range(random.randint(0, 6))]
+
+    def full_stat(experts):
+        stats = ProductStatAccumulator(range(20))
+        for product_stat in experts:
+            stats.add(product_stat)
+        return stats, stats.compute()
+
+    random.seed(0)
+    mismatch = 0
+    for _ in range(300):
+        experts = [random_stat() for _ in range(random.randint(1, 30))]
+        stats, _ = full_stat(experts)
+        nodes = [{"_id": node_id, "expert_stat_count": count, "expert_stat_sum": total, "expert_stat_sum_sq": total_sq}
+                 for node_id, (count, total, total_sq) in stats.moments.items()]
+        store = ProductStatStore(MemoryCollection(nodes), incremental=True, flush_size=7)
+        for _ in range(100):
+            i = random.randrange(len(experts))
+            product_stat = random_stat()
+            store.update_expert(experts[i], product_stat)
+            experts[i] = product_stat
+        _, ranges = full_stat(experts)
+        for node_id, (expert_max_normal, expert_min_normal, _) in ranges.items():
+            if store.thresholds(node_id) != (expert_max_normal, expert_min_normal):
+                mismatch += 1
+    print("增量统计与全量统计不一致的节点数：", mismatch)
@@ -0,0 +1,101 @@
+import os
+import time
+import logging
+import datetime
+import threading
+import configparser
+from concurrent.futures import ThreadPoolExecutor
+
+
+logger = logging.getLogger(__name__)
+
+dir_path = os.path.dirname(__file__)
+kbp_path = os.path.dirname(dir_path)
+config_path = os.path.join(kbp_path, "config.ini")
+
+
+class RelationWriter(object):
+    '''
+    知识库实体关系批量写入
+    - add 只缓存 {_key, relations, update_time} 补丁，不再逐个 GET 文档再 save 整个文档
+    - 攒够 flush_size 个补丁后用一条 AQL 批量 UPDATE：FOR d IN @patches UPDATE d IN @@coll OPTIONS {mergeObjects:false}
+    - 最多 concurrency 个批次同时写入
+    - 文档不存在等单条失败不影响同批其他文档，失败的 _key 记录在 failed_keys 并逐条打印
+    flush_size、concurrency 未传入时读取 config.ini 的 [relation_writer] 配置
+    '''
+
+    UPDATE_AQL = ("FOR d IN @patches UPDATE d IN @@coll "
+                  "OPTIONS {mergeObjects: false, ignoreErrors: true} RETURN NEW._key")
+
+    def __init__(self, db, collection_name, flush_size=None, concurrency=None, retries=1):
+
+        config = configparser.ConfigParser()
+        config.read(config_path)
+        self.db = db
+        self.collection_name = collection_name
+        self.flush_size = flush_size or config.getint("relation_writer", "flush_size", fallback=500)
+        self.concurrency = concurrency or config.getint("relation_writer", "concurrency", fallback=2)
+        self.retries = retries
+        self.executor = ThreadPoolExecutor(max_workers=self.concurrency)
+        self.futures = []
+        self.patches = []
+        self.count_update = 0
+        self.failed_keys = []
+        self._lock = threading.Lock()
+
+    def add(self, key, relations, **fields):
+        '''缓存一个实体的关系补丁，fields 为需要一起更新的其他字段，如会议的 tags'''
+
+        patch = {"_key": key, "relations": relations, "update_time": datetime.datetime.today()}
+        patch.update(fields)
+        self.patches.append(patch)
+        if len(self.patches) >= self.flush_size:
+            self._submit()
+
+    def _submit(self):
+
+        patches, self.patches = self.patches, []
+        if not patches:
+            return
+        # 同时在途的批次不超过 concurrency，先等最早提交的批次完成
+        while len(self.futures) >= self.concurrency:
+            self.futures.pop(0).result()
+        self.futures.append(self.executor.submit(self._write, patches))
+
+    def _write(self, patches):
+
+        keys = [patch["_key"] for patch in patches]
+        bind_vars = {"patches": patches, "@coll": self.collection_name}
+        for attempt in range(self.retries + 1):
+            try:
+                start_time = time.time()
+                query = self.db.AQLQuery(self.UPDATE_AQL, rawResults=True, batchSize=len(patches), bindVars=bind_vars)
+                updated = set(key for key in query.result if key)
+                break
+            except Exception as e:
+                logger.error("Arango[{}]批量更新关系失败，批次大小[{}]，第[{}]次，错误=[{}]".format(
+                    self.collection_name, len(patches), attempt + 1, e))
+        else:
+            updated = set()
+
+        failed = [key for key in keys if key not in updated]
+        with self._lock:
+            self.count_update += len(updated)
+            self.failed_keys.extend(failed)
+        for key in failed:
+            logger.error("Arango[{}]关系更新失败，_key=[{}]".format(self.collection_name, key))
+        if updated:
+            logger.info("Arango[{}]批量更新关系[{}]条，耗时[{:.2f}]秒".format(
+                self.collection_name, len(updated), time.time() - start_time))
+
+    def flush(self):
+        '''写入剩余补丁并等待所有批次完成，返回累计更新成功数'''
+
+        self._submit()
+        while self.futures:
+            self.futures.pop(0).result()
+        return self.count_update
+
+    def close(self):
+        self.flush()
+        self.executor.shutdown(wait=True)
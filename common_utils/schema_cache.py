@@ -0,0 +1,144 @@
+import os
+import re
+import time
+import pickle
+import hashlib
+import logging
+import threading
+import configparser
+
+
+logger = logging.getLogger(__name__)
+
+dir_path = os.path.dirname(__file__)
+kbp_path = os.path.dirname(dir_path)
+config_path = os.path.join(kbp_path, "config.ini")
+
+DEFAULT_CACHE_DIR = os.path.join(kbp_path, "cache", "schema")
+DEFAULT_TTL = 24 * 3600                 # 快照最长使用时间，超过后无论校验结果如何都重新查询，单位秒
+SCHEMA_CACHE_VERSION = 1                # 快照文件格式版本，格式变化时加1使旧文件失效
+
+
+class SchemaCache(object):
+    '''
+    MySQL 字典表（行政区划、产业、标签、币种、融资轮次、职称、学历等）查询结果的本地快照
+    - 快照按 (host, db, SQL) 保存为 pickle 文件，内容包括格式版本、表指纹、保存时间和查询结果
+    - 读取时先对字典表做一次轻量校验：select count(*), max(update_time)，表没有 update_time 字段时只比较行数，
+      指纹与快照一致且未超过 ttl 时直接使用快照，否则执行原 SQL 并重写快照
+    - 校验失败（无法从 SQL 中解析出表名、校验查询出错）时，仅在 ttl 内使用快照
+    '''
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, ttl=DEFAULT_TTL, enabled=True):
+
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        if enabled and not os.path.exists(cache_dir):
+            os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def _row_values(row):
+        '''兼容 DictCursor 返回的字典行'''
+        if isinstance(row, dict):
+            return tuple(row.values())
+        return tuple(row)
+
+    @staticmethod
+    def _table_name(sql_state):
+        tables = re.findall(r"\bfrom\s+([`\w.]+)", sql_state, re.I)
+        # 多表查询无法用单表指纹校验
+        if len(tables) != 1 or re.search(r"\bjoin\b", sql_state, re.I):
+            return None
+        return tables[0]
+
+    def _cache_file(self, sql_cur, sql_state):
+        conn = getattr(sql_cur, "connection", None)
+        db = getattr(conn, "db", "")
+        if isinstance(db, bytes):
+            db = db.decode("utf8")
+        key = "{}|{}|{}|{}".format(getattr(conn, "host", ""), getattr(conn, "port", ""), db, sql_state)
+        return os.path.join(self.cache_dir, hashlib.md5(key.encode("utf8")).hexdigest() + ".pkl")
+
+    def fingerprint(self, sql_cur, sql_state):
+        '''字典表指纹 (行数, 最大更新时间)，无法计算时返回 None'''
+
+        table = self._table_name(sql_state)
+        if not table:
+            return None
+        for query in ("select count(*), max(update_time) from {}", "select count(*) from {}"):
+            try:
+                sql_cur.execute(query.format(table))
+                return self._row_values(sql_cur.fetchone())
+            except Exception:
+                continue
+        return None
+
+    def _load(self, cache_file):
+        try:
+            with open(cache_file, "rb") as f:
+                snapshot = pickle.load(f)
+        except Exception:
+            return None
+        if not isinstance(snapshot, dict) or snapshot.get("version") != SCHEMA_CACHE_VERSION:
+            return None
+        return snapshot
+
+    def _save(self, cache_file, snapshot):
+        tmp_file = "{}.{}.tmp".format(cache_file, os.getpid())
+        try:
+            with open(tmp_file, "wb") as f:
+                pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_file, cache_file)
+        except Exception as e:
+            logger.warning("字典表快照写入失败，文件=[{}]，错误=[{}]".format(cache_file, e))
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
+
+    def fetchall(self, sql_cur, sql_state):
+        '''
+        等价于 sql_cur.execute(sql_state); sql_cur.fetchall()，结果优先取自本地快照
+        '''
+        if not self.enabled:
+            sql_cur.execute(sql_state)
+            return sql_cur.fetchall()
+
+        cache_file = self._cache_file(sql_cur, sql_state)
+        snapshot = self._load(cache_file)
+        fingerprint = self.fingerprint(sql_cur, sql_state)
+        if snapshot and snapshot["sql"] == sql_state and time.time() - snapshot["save_time"] < self.ttl:
+            if fingerprint is None or fingerprint == snapshot["fingerprint"]:
+                self.hits += 1
+                logger.info("字典表使用本地快照，共[{}]条，SQL=[{}]".format(len(snapshot["rows"]), sql_state[:100]))
+                return snapshot["rows"]
+
+        self.misses += 1
+        sql_cur.execute(sql_state)
+        rows = sql_cur.fetchall()
+        self._save(cache_file, {
+            "version": SCHEMA_CACHE_VERSION,
+            "sql": sql_state,
+            "fingerprint": fingerprint,
+            "save_time": time.time(),
+            "rows": rows
+        })
+        return rows
+
+
+_schema_caches = {}
+_schema_caches_lock = threading.Lock()
+
+
+def get_schema_cache():
+    '''
+    进程内共享的字典表快照缓存，目录、有效期、开关可在 config.ini 的 [schema_cache] 中配置
+    '''
+    with _schema_caches_lock:
+        if "default" not in _schema_caches:
+            config = configparser.ConfigParser()
+            config.read(config_path)
+            _schema_caches["default"] = SchemaCache(config.get("schema_cache", "path", fallback="") or DEFAULT_CACHE_DIR,
+                                                    ttl=config.getint("schema_cache", "ttl", fallback=DEFAULT_TTL),
+                                                    enabled=config.getboolean("schema_cache", "enabled", fallback=True))
+        return _schema_caches["default"]
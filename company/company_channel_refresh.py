@@ -23,6 +23,9 @@ import copy
 import requests
 import os
 
+main_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(main_path)
+from common_utils.mysql_pool import get_mysql_pool
 logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s - %(filename)s[line:%(lineno)d] - %(levelname)s: %(message)s')
 logger = logging.getLogger(__name__)
@@ -37,12 +40,12 @@ class KbpPipeline(object):
 
         self.config = configparser.ConfigParser()
         self.config.read(config_path)
-        self.sql_conn = pymysql.connect( host = self.config.get("mysql","host") ,
+        self.sql_conn = get_mysql_pool( host = self.config.get("mysql","host") ,
                 user = self.config.get("mysql","user"),
                 passwd = self.config.get("mysql","passwd"),
                 port = self.config.getint("mysql","port") ,
                 db = self.config.get("mysql","db"),
-                charset = self.config.get("mysql","charset") )
+                charset = self.config.get("mysql","charset") ).connect()
         self.sql_cur = self.sql_conn.cursor() 
         self.arango_con = ArangoConnection(arangoURL=self.config.get("arango","arango_url"),username= self.config.get("arango","user"),password=self.config.get("arango","passwd"))
         self.graph_kb_company = self.arango_con[self.config.get("arango","db")][self.config.get("arango","kb_company")]
@@ -72,12 +75,12 @@ class KbpPipeline(object):
     def query_company_channel(self, company_name):
         '''查询公司更新过的渠道数据'''
         channel_rel = []
-        sql_conn = pymysql.connect( host = self.config.get("mysql","host") ,
+        sql_conn = get_mysql_pool( host = self.config.get("mysql","host") ,
                             user = self.config.get("mysql","user") ,
                             passwd = self.config.get("mysql","passwd"),
                             port = self.config.getint("mysql","port") ,
                             db = self.config.get("mysql","db"),
-                            charset = "utf8" )
+                            charset = "utf8" ).connect()
         sql_cur = sql_conn.cursor() 
         # 查询企业相关的渠道信息
         sql_state = self.config.get("mysql","company_channel_query").replace("eq","=").format(company_name)
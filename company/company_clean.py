@@ -13,7 +13,8 @@ import json
 import logging
 from logging.handlers import RotatingFileHandler
 import requests
-from pymongo import MongoClient
+from pymongo import MongoClient, InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError
 import datetime
 import re
 import configparser
@@ -22,6 +23,15 @@ from dateutil import parser
 import uuid
 import pymysql
 import os
+import time
+import argparse
+import multiprocessing
+main_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(main_path)
+from common_utils.geocode_cache import get_geocode_cache
+from common_utils.gazetteer import get_gazetteer
+from common_utils.mysql_pool import get_mysql_pool
+from common_utils.schema_cache import get_schema_cache
 
 logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s - %(filename)s[line:%(lineno)d] - %(levelname)s: %(message)s')
@@ -51,12 +61,12 @@ class CompanyClean(object):
         self.res_kb_company = self.mongo_con[self.config.get("mongo","res_kb_db")][self.config.get("mongo","res_kb_company")] # 企业信息，爬虫库
         self.res_kb_process_company = self.mongo_con[self.config.get("mongo","res_kb_process")][self.config.get("mongo","process_company")] # 企业信息，清洗库
         # 企业tags标签，人工整理
-        self.sql_conn = pymysql.connect( host = self.config.get("mysql","host") ,
+        self.sql_conn = get_mysql_pool( host = self.config.get("mysql","host") ,
                 user = self.config.get("mysql","user"),
                 passwd = self.config.get("mysql","passwd"),
                 port = self.config.getint("mysql","port") ,
                 db = self.config.get("mysql","db"),
-                charset = self.config.get("mysql","charset") )
+                charset = self.config.get("mysql","charset") ).connect()
         self.sql_cur = self.sql_conn.cursor() 
         self.address_parser = AddressParser()
         self.alter_url = self.config.get("url","alter_name")
@@ -66,22 +76,22 @@ class CompanyClean(object):
         self.count_dupl_company = 0
         self.count_insert = 0
         self.count_inner_dupl = 0
+        self.count_skip = 0
 
     def _init_f_round_schema(self):
 
         self.f_round_schema = {}
         self.f_round_sort = {}
 
-        sql_conn = pymysql.connect( host = "xxx" ,
+        sql_conn = get_mysql_pool( host = "xxx" ,
                 user = "xxx",
                 passwd = "xxx",
                 port = 0 ,
                 db = "xxx",
-                charset = "xxx" )
+                charset = "xxx" ).connect()
         sql_cur = sql_conn.cursor() 
         currency_sql = "select name,alter_names,sequence from res_invest_round where sequence is not null"
-        sql_cur.execute(currency_sql)
-        for c in sql_cur.fetchall():
+        for c in get_schema_cache().fetchall(sql_cur, currency_sql):
             f_round = [c[0]]
             self.f_round_sort[c[0]] = c[2]
             if c[1]:
@@ -95,8 +105,7 @@ class CompanyClean(object):
 
         self.currency_world_code = {}
         currency_sql = "select name,alter_names,name_en from res_currency"
-        self.sql_cur.execute(currency_sql)
-        for c in self.sql_cur.fetchall():
+        for c in get_schema_cache().fetchall(self.sql_cur, currency_sql):
             keywords = [c[0],c[2]]
             keywords.extend(c[1].split("|")) 
             keywords = list(set(keywords))
@@ -106,8 +115,7 @@ class CompanyClean(object):
 
         self.company_types = {}
         sql = "select name,alter_names from res_company_type"
-        self.sql_cur.execute(sql)
-        for c in self.sql_cur.fetchall():
+        for c in get_schema_cache().fetchall(self.sql_cur, sql):
             keywords = c[1].split("|")
             self.company_types[c[0]] = keywords
 
@@ -382,62 +390,77 @@ class CompanyClean(object):
         return reg_status
 
     def insert_batch(self,batch_data):
-        '''根据公司全称去重，并写入'''
+        '''
+        根据公司全称去重，并写入
+        批内按名称哈希去重，清洗库按_id和名称一次$in查询判重，新增和简介补全的更新合并为一次无序bulk_write
+        '''
 
         logger.info("批量数据组装完成，准备去重...")
-        company_names = []
-        new_batch = []
+        candidate_ids = [data["_id"] for data in batch_data]
+        candidate_names = set(data["name"] for data in batch_data)
+        exist_ids = set()
+        exist_names = {}
+        exist_datas = self.res_kb_process_company.find(
+                            {"$or":[{"_id":{"$in":candidate_ids}}, {"name":{"$in":list(candidate_names)}}]},
+                            {"_id":1, "name":1, "desc":1})
+        for exist_data in exist_datas:
+            exist_ids.add(exist_data["_id"])
+            if exist_data["name"] in candidate_names and exist_data["name"] not in exist_names:
+                exist_names[exist_data["name"]] = exist_data
+
+        new_batch = {} # 公司名 -> 待写入数据
         for data in batch_data:
             if not data["crawl_time"]: # 旧数据中有部分研究机构数据不完整，且爬虫时间均为空，过滤掉
                 logger.info("跳过数据，ObjectId=[{}]，缺少必须字段crawl_time".format(data["_id"]))
                 self.count_skip += 1
                 continue 
-            if data["name"] in company_names:
+            if data["name"] in new_batch:
 
                 # 关注企业简介的字段是否完整，不完整选取有值的进行替换
-                exist_index = company_names.index(data["name"])
-                exist_data = new_batch[exist_index]
+                exist_data = new_batch[data["name"]]
                 if data["desc"] and ( not exist_data["desc"]):
-                    new_batch[exist_index] = data
+                    new_batch[data["name"]] = data
 
                 self.count_inner_dupl += 1
                 continue
-            elif self.res_kb_process_company.find_one({'_id':str(data['_id'])}):
+            elif data["_id"] in exist_ids:
                 continue
             else:
-                company_names.append(data["name"])
-                new_batch.append(data)
-        
-        dupl_datas = self.res_kb_process_company.find({"name":{"$in":company_names}})
-        for dupl_data in dupl_datas:
-            index = company_names.index(dupl_data["name"])
-
-            # 关注企业简介的字段是否完整，不完整选取有值的进行更新
-            coming_data = new_batch[index]
-            if coming_data["desc"] and (not dupl_data["desc"]):
-                coming_data.pop("_id")
-                self.res_kb_process_company.update_one({"_id": dupl_data["_id"]}, {'$set':coming_data})
-
-            company_names.pop(index)
-            new_batch.pop(index)
-            self.count_dupl_company += 1
+                new_batch[data["name"]] = data
+
+        operations = []
+        for name, coming_data in new_batch.items():
+            dupl_data = exist_names.get(name)
+            if dupl_data:
+                # 关注企业简介的字段是否完整，不完整选取有值的进行更新
+                if coming_data["desc"] and (not dupl_data["desc"]):
+                    update_data = {k: v for k, v in coming_data.items() if k != "_id"}
+                    operations.append(UpdateOne({"_id": dupl_data["_id"]}, {'$set':update_data}))
+                self.count_dupl_company += 1
+            else:
+                operations.append(InsertOne(coming_data))
 
-        if not new_batch:
+        if not operations:
             logger.info("去重完成，无数据写入")
             return
 
-        logger.info("去重完成，剩余[{}]条，准备写入...".format(len(new_batch)))
-        insert_res = self.res_kb_process_company.insert_many(new_batch)
-        self.count_insert += len(insert_res.inserted_ids)
+        logger.info("去重完成，剩余[{}]条，准备写入...".format(len(operations)))
+        try:
+            write_res = self.res_kb_process_company.bulk_write(operations, ordered=False)
+            self.count_insert += write_res.inserted_count
+        except BulkWriteError as e:
+            self.count_insert += e.details["nInserted"]
+            logger.error("批量写入部分失败，失败[{}]条，首个错误=[{}]".format(
+                            len(e.details["writeErrors"]), e.details["writeErrors"][0]["errmsg"] if e.details["writeErrors"] else ""))
         logger.info("批量数据写入完成")
 
     def get_last_execute_time(self):
-        sql_conn = pymysql.connect(host="xxxx",
+        sql_conn = get_mysql_pool(host="xxxx",
                            user="xxxx",
                            passwd="xxxx",
                            port=0000,
                            db="xxxx",
-                           charset="xxxx")
+                           charset="xxxx").connect()
         sql_cur = sql_conn.cursor()
         currency_sql = """
         SELECT FROM_UNIXTIME(start_time/1000,'%Y-%m-%d') as start_time FROM execution_jobs
@@ -449,7 +472,8 @@ class CompanyClean(object):
         return sql_result[0][0]
 
 
-    def query_company(self, crawl_date):
+    def get_crawl_iso_date(self, crawl_date):
+        '''参数日期转换为爬虫时间查询起始时间'''
 
         if crawl_date == "yesterday":
             crawl_date = self.get_last_execute_time()
@@ -467,6 +491,11 @@ class CompanyClean(object):
         self.process_date = crawl_date
         iso_date_str = crawl_date + 'T00:00:00'
         iso_date = parser.parse(iso_date_str)
+        return iso_date
+
+    def query_company(self, crawl_date):
+
+        iso_date = self.get_crawl_iso_date(crawl_date)
         res = self.res_kb_company.find({'crawl_time': {'$gte': iso_date}}).sort([("crawl_time",1)])
         # res = self.res_kb_company.find({'create_time': {'$gte': iso_date}},no_cursor_timeout=True).sort([("crawl_time",1)])
         return res 
@@ -488,10 +517,89 @@ class CompanyClean(object):
 
 
 
-    def process(self, crawl_date):
+    def transform(self, doc):
+        '''单条爬虫企业数据清洗转换'''
+
+        logger.info("正在处理企业，企业名=[{}]".format(doc["company_name"]))
+
+        update_doc = {
+            "_id": str(doc["_id"]), # 直接用ObjectId的值作为后续统一的ID值
+            # "uuid": str(uuid.uuid1()),
+            "name": doc["company_name"].replace('（','(').replace('）',')'),
+            "name_en": doc["name_en"], 
+            # update 2020.10.26 remark: 企业别称不自动添加，统一由人工校验后手动添加             
+            # "alter_names": self.process_alter_name(doc),  
+            "alter_names":[],
+            "used_names": self.process_used_name(doc),
+            "labels": self.process_labels(doc),
+            # "tags": self.process_tags(doc), # 企业人工梳理标签添加，不在清洗时处理，改为relation的时候将这些人工梳理的标签添加到关系中；
+            "address": self.process_str(doc["address"]),
+            "establish_date": self.process_publish_time(doc["establish_date"]),
+            "approve_date": self.process_publish_time(doc["approve_date"]),
+            "email": self.process_str(doc["email"]),
+            "website": self.process_str(doc["website"]),
+            "logo_img": doc["img_logo"],
+            "business_scope":self.process_str(doc["business_scope"]),
+            "desc": self.process_str(doc["description"]),
+            "registration": self.process_str(doc["registration"]),
+            "registration_id": self.process_str(doc["registration_id"]),
+            "register_status": self.process_register_status(doc),
+            "profession": self.process_str(doc["profession"]),
+            "social_credit_code": self.process_str(doc["social_credit_code"]),
+            "organization_code": doc["organization_code"],
+            "legal_person": self.process_str(doc["legal_representative"]),
+            "tax_code": self.process_str(doc["taxpayer_id"]),
+            "insured_number": doc["insured_number"],
+            "url": doc["url"],
+            "source": doc["source"],
+            "html":doc["html"],
+            "crawl_time": doc["crawl_time"],
+            "company_type": self.process_company_type(doc),
+            "leaders": self.process_leader_position(doc),
+            "employee_size":self.process_str(doc["staff_size"]),
+            "phone": self.process_str(doc["phone"]),
+            "shareholder": doc["shareholder"],
+            "financing_round":self.process_f_round(doc["label"]),
+            "create_time": datetime.datetime.today(),
+            "update_time": datetime.datetime.today()
+        }
+
+
+        address_res = self.address_parser.parse(doc)
+        update_doc.update(address_res)
+
+        business_terms = self.process_business_term(doc)
+        update_doc.update(business_terms)
+
+        capitals = self.process_capital(doc)
+        update_doc.update(capitals)          
+
+        return update_doc
+
+    def query_shards(self, iso_date, shard_size):
+        '''
+        按_id顺序把待清洗数据切分成_id区间分片，每个分片 shard_size 条，只取_id不取整条文档
+        '''
+        shards = []
+        shard_ids = []
+        res = self.res_kb_company.find({'crawl_time': {'$gte': iso_date}}, {"_id": 1}).sort([("_id",1)])
+        for doc in res:
+            shard_ids.append(doc["_id"])
+            if len(shard_ids) == shard_size:
+                shards.append((iso_date, shard_ids[0], shard_ids[-1]))
+                shard_ids = []
+        if shard_ids:
+            shards.append((iso_date, shard_ids[0], shard_ids[-1]))
+        return shards
+
+    def process(self, crawl_date, workers=1, batch_size=100):
         '''
         清洗爬虫时间大于等于process_date以后的企业数据
+        workers>1 时多进程并行清洗，写入仍由主进程统一执行；batch_size 为每批写入条数
         '''
+        if workers > 1:
+            return self.process_parallel(crawl_date, workers, batch_size)
+
         count = 0
         
         res = self.query_company(crawl_date)
@@ -513,95 +621,84 @@ class CompanyClean(object):
         for doc in res:
 
             count += 1
-            logger.info("正在处理企业，企业名=[{}]".format(doc["company_name"]))
-
-            update_doc = {
-                "_id": str(doc["_id"]), # 直接用ObjectId的值作为后续统一的ID值
-                # "uuid": str(uuid.uuid1()),
-                "name": doc["company_name"].replace('（','(').replace('）',')'),
-                "name_en": doc["name_en"], 
-                # update 2020.10.26 remark: 企业别称不自动添加，统一由人工校验后手动添加             
-                # "alter_names": self.process_alter_name(doc),  
-                "alter_names":[],
-                "used_names": self.process_used_name(doc),
-                "labels": self.process_labels(doc),
-                # "tags": self.process_tags(doc), # 企业人工梳理标签添加，不在清洗时处理，改为relation的时候将这些人工梳理的标签添加到关系中；
-                "address": self.process_str(doc["address"]),
-                "establish_date": self.process_publish_time(doc["establish_date"]),
-                "approve_date": self.process_publish_time(doc["approve_date"]),
-                "email": self.process_str(doc["email"]),
-                "website": self.process_str(doc["website"]),
-                "logo_img": doc["img_logo"],
-                "business_scope":self.process_str(doc["business_scope"]),
-                "desc": self.process_str(doc["description"]),
-                "registration": self.process_str(doc["registration"]),
-                "registration_id": self.process_str(doc["registration_id"]),
-                "register_status": self.process_register_status(doc),
-                "profession": self.process_str(doc["profession"]),
-                "social_credit_code": self.process_str(doc["social_credit_code"]),
-                "organization_code": doc["organization_code"],
-                "legal_person": self.process_str(doc["legal_representative"]),
-                "tax_code": self.process_str(doc["taxpayer_id"]),
-                "insured_number": doc["insured_number"],
-                "url": doc["url"],
-                "source": doc["source"],
-                "html":doc["html"],
-                "crawl_time": doc["crawl_time"],
-                "company_type": self.process_company_type(doc),
-                "leaders": self.process_leader_position(doc),
-                "employee_size":self.process_str(doc["staff_size"]),
-                "phone": self.process_str(doc["phone"]),
-                "shareholder": doc["shareholder"],
-                "financing_round":self.process_f_round(doc["label"]),
-                "create_time": datetime.datetime.today(),
-                "update_time": datetime.datetime.today()
-            }
-
-
-            address_res = self.address_parser.parse(doc)
-            update_doc.update(address_res)
-
-            business_terms = self.process_business_term(doc)
-            update_doc.update(business_terms)
-
-            capitals = self.process_capital(doc)
-            update_doc.update(capitals)          
-            batch_data.append(update_doc)
+            batch_data.append(self.transform(doc))
             
 
             # MongoDB批量写入
-            if count % 100 == 0 or count == total:
+            if count % batch_size == 0 or count == total:
                 logger.info("正在写入前[{}]家企业信息".format(count))
                 self.insert_batch(batch_data)
                 batch_data = []
 
         logger.info("企业爬虫数据处理完毕，找到[{}]个企业数据，其中批内去重[{}]个，清洗库已有记录[{}]个，写入清洗库[{}]个企业".format(
                         total, self.count_inner_dupl, self.count_dupl_company, self.count_insert ))
+        geocode_stats = self.address_parser.geocode_cache.stats()
+        logger.info("地址解析缓存命中[{}]次，未命中[{}]次，命中率[{:.2%}]，估算节省接口耗时[{}]秒".format(
+                        geocode_stats["hits"], geocode_stats["misses"], geocode_stats["hit_rate"], geocode_stats["saved_seconds"]))
         self.close_connection()
-        
 
+    def process_parallel(self, crawl_date, workers, batch_size=100):
+        '''
+        多进程清洗：按_id区间切分数据，子进程各自读取分片并转换，转换结果按分片顺序流式返回主进程，
+        由主进程调用 insert_batch 写入，批内去重和清洗库去重逻辑与单进程一致
+        '''
+        count = 0
+
+        iso_date = self.get_crawl_iso_date(crawl_date)
+        shards = self.query_shards(iso_date, batch_size)
+        logger.info("日期[{}]，开始多进程清洗企业数据，进程数[{}]，分片[{}]个".format(self.process_date, workers, len(shards)))
+
+        pool = multiprocessing.Pool(workers, initializer=_init_worker)
+        try:
+            for batch_data in pool.imap(_transform_shard, shards):
+                count += len(batch_data)
+                logger.info("正在写入前[{}]家企业信息".format(count))
+                if batch_data:
+                    self.insert_batch(batch_data)
+        finally:
+            pool.close()
+            pool.join()
+
+        logger.info("企业爬虫数据处理完毕，找到[{}]个企业数据，其中批内去重[{}]个，清洗库已有记录[{}]个，写入清洗库[{}]个企业".format(
+                        count, self.count_inner_dupl, self.count_dupl_company, self.count_insert ))
+        self.close_connection()
+
+
+# 多进程清洗时每个子进程持有的清洗对象，MySQL字典在子进程初始化时加载一次
+_worker_cleaner = None
+
+def _init_worker():
+    global _worker_cleaner
+    _worker_cleaner = CompanyClean()
+
+def _transform_shard(shard):
+    '''子进程：读取一个_id区间分片并转换，返回转换后的批次'''
+    iso_date, first_id, last_id = shard
+    res = _worker_cleaner.res_kb_company.find({'crawl_time': {'$gte': iso_date}, '_id': {'$gte': first_id, '$lte': last_id}}).sort([("crawl_time",1)])
+    return [_worker_cleaner.transform(doc) for doc in res]
+        
 
 class AddressParser(object):
     
     def __init__(self):
         self.ak2 = 'xxx'
         self.ak3 = 'xxx'
+        self.geocode_cache = get_geocode_cache() # 百度地址解析结果本地缓存
 
         # TODO：行政区划使用的是common库中的数据
-        with open(os.path.join(dir_path,'prov_city_area_dict.json'),'r') as load_f:
-            self.all_address = json.load(load_f)
-        self.company_addr_name = []
-        for prov in self.all_address:
-            if prov.strip('省') not in self.company_addr_name:
-                self.company_addr_name.append(prov.strip('省'))
-            for city in self.all_address[prov]:
-                if city.strip('市') not in self.company_addr_name:
-                    self.company_addr_name.append(city.strip('市'))
+        self.gazetteer = get_gazetteer(os.path.join(dir_path,'prov_city_area_dict.json')) # 行政区划自动机，进程内只构建一次
+        self.all_address = self.gazetteer.all_address
+        self.company_addr_name = self.gazetteer.company_addr_name
 
     def get_lng_lat(self, address):
 
         if not address:
             return {}
+        # 优先查本地缓存，命中则不再请求百度接口
+        cache_res = self.geocode_cache.get(address)
+        if cache_res is not None:
+            return cache_res
+        start_time = time.time()
         to_ak = self.ak2
         url_new = 'http://api.map.baidu.com/geocoding/v3/?address='
         url = url_new
@@ -617,6 +714,9 @@ class AddressParser(object):
             map_res = self.get_geocode_info(map_index)
             map_res['longitude'] = lng
             map_res['latitude'] = lat
+            # 行政区划接口出错时不缓存，下次重新请求
+            if map_res['province']:
+                self.geocode_cache.set(address, map_res, cost=time.time()-start_time)
         return map_res
 
 
@@ -702,113 +802,37 @@ class AddressParser(object):
                 parse_out['longitude'] = ""
                 parse_out['latitude'] = ""
             else:
-                city_num = 0
-                city_tmp_list = []
-                find_name = False
-                find_end = False
-                for name in self.company_addr_name:
-                    if find_name:
-                        city_num += 1
-                        if city_num >22:
-                            find_end = True
-                            city_num = 0
-                    if name and company_name.find(name)>-1:#获取到公司所含省市名陈
-                        city_tmp_list.append(name)
-                        find_name = True
-                    if find_name and find_end:
-                        find_name = False
-                        find_end = False
-                        res_name = ""
-                        if len(city_tmp_list) == 0:#公司名没有省市
-                            break
-                        if len(city_tmp_list) == 1:#公司名有省市一个
-                            res_name = city_tmp_list[0]
-                        else:
-                            name0 = city_tmp_list[0]
-                            name1 = city_tmp_list[1]
-                            if company_name.find(name0) < company_name.find(name1):
-                                res_name = name0
-                            else:
-                                res_name = name1
-                        if res_name not in [prov_name,city_name,area_name]:
-                            parse_out['province'] = ""
-                            parse_out['city'] = ""
-                            parse_out['area'] = ""
-                            parse_out['longitude'] = ""
-                            parse_out['latitude'] = ""
+                for res_name in self.gazetteer.company_name_places(company_name):
+                    if res_name not in [prov_name,city_name,area_name]:
+                        parse_out['province'] = ""
+                        parse_out['city'] = ""
+                        parse_out['area'] = ""
+                        parse_out['longitude'] = ""
+                        parse_out['latitude'] = ""
 
         return parse_out
 
 
     def match_addr(self, _address, _area=''):
-        all_dict = self.all_address
+        '''行政区划匹配，返回 (省, 市, 区县)，一次扫描地址完成'''
 
-        find_prov = False
-        find_city = False
-        find_area = False
         index_prov = ''
-        index_city = ''
-        index_area = ''
         if _area:
             index_prov = _area
-            find_prov = True
             if index_prov in ['北京市','天津市','上海市','重庆市']:
                 index_prov = index_prov.strip('市')
-        else:
-            for prov in all_dict:
-                if _address.find(prov)>-1:
-                    find_prov = True
-                    index_prov = prov
-                    break
-                elif prov.find('省')>-1 and _address.find(prov.strip('省'))>-1:
-                    find_prov = True
-                    index_prov = prov
-                    break
-        if not find_prov:
-            if not _area:
-                return ('','','')
-        for city in all_dict[index_prov]:
-            if _address.find(city)>-1:
-                find_city = True
-                index_city = city
-                break
-            elif city.find('市')>-1 and _address.find(city.strip('市'))>-1:
-                find_city = True
-                index_city = city
-                break
-        if not find_city:
-            for n_city in all_dict[index_prov]:
-                for n_area in all_dict[index_prov][n_city]:
-                    if _address.find(n_area)>-1:
-                        find_area = True
-                        index_city = n_city
-                        index_area = n_area
-                        break
-                    elif n_area.find('市')>-1 and _address.find(n_area.strip('市'))>-1:
-                        find_area = True
-                        index_city = n_city
-                        index_area = n_area
-                        break
-        else:
-            for area in all_dict[index_prov][index_city]:
-                if _address.find(area)>-1:
-                    find_area = True
-                    index_area = area
-                    break
-                elif area.find('市')>-1 and _address.find(area.strip('市'))>-1:
-                    find_area = True
-                    index_area = area
-                    break
-        return (index_prov,index_city,index_area)
+        return self.gazetteer.match_addr(_address, index_prov)
 
 
 if __name__ == "__main__":
 
     # 最早日期  2019-06-03
     
-	cleaner = CompanyClean()
+	arg_parser = argparse.ArgumentParser()
+	arg_parser.add_argument("crawl_date", nargs="?", default="yesterday", help="yesterday/today/yyyy-mm-dd")
+	arg_parser.add_argument("--workers", type=int, default=1, help="清洗进程数，大于1时多进程并行清洗")
+	arg_parser.add_argument("--batch_size", type=int, default=100, help="每批去重写入的企业数")
+	args = arg_parser.parse_args()
 
-	if len(sys.argv) > 1:
-		cleaner.process(sys.argv[1])
-	else:
-		cleaner.process("yesterday")
+	cleaner = CompanyClean()
+	cleaner.process(args.crawl_date, args.workers, args.batch_size)
@@ -9,7 +9,6 @@
 
 from elasticsearch import Elasticsearch, helpers
 from logging.handlers import RotatingFileHandler
-from pyArango.theExceptions import AQLFetchError
 from pymongo import MongoClient
 from urllib.request import urlopen,quote
 from pymongo import MongoClient
@@ -24,6 +23,15 @@ import sys
 import os
 import logging
 
+main_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(main_path)
+from common_utils.hbase_codec import get_hbase_codec
+from common_utils.hbase_rowkey import get_hbase_rowkey
+from common_utils.arango_cursor import iter_aql
+from common_utils.es_bulk_indexer import EsBulkIndexer
+
+logger = logging.getLogger(__name__)
+
 class TestLink:
 
     def __init__(self):
@@ -36,6 +44,8 @@ class TestLink:
         #self.init_concpet_classid() # 加载实体类别定义关键词映射
 
         self.es = Elasticsearch(self.config.get('ES','es_url'))
+        self.hbase_codec = get_hbase_codec() # 兼容原json格式和紧凑压缩格式
+        self.hbase_rowkey = get_hbase_rowkey() # rowkey规则，盐值前缀时按前缀并行扫描
 
         self.hbase_pool = happybase.ConnectionPool( host = self.config.get("hbase","host"),
                 port = self.config.getint("hbase","port"),
@@ -51,65 +61,56 @@ class TestLink:
         client = MongoClient(self.config.get('mongo','mongo_url'))
         self.mongo_coll = client['recommend_db']['company_score']
 
-    def get_recommend_info(self, com_name, industry_name=''):
-        ''' 从mongodb中推荐库查询企业相关产业分类下的推荐数据'''
+        self.fetch_batch = self.config.getint("es_indexer", "fetch_batch", fallback=500) # 每批预取关联数据的公司数
+        self.es_indexer = EsBulkIndexer(self.es,
+                                        self.config.get("es_indexer", "company_index", fallback="company"),
+                                        doc_type=self.config.get("es_indexer", "company_doc_type", fallback="") or None)
+        self.count_pack_fail = 0 # 组装ES文档失败的公司数
 
-        recommend = {}
-        query = self.mongo_coll.find_one({"company_name":com_name})
-        if not query:
-            return {}
-        if industry_name:
-            return query[industry_name]
-        return query
+    def get_recommend_batch(self, com_names):
+        ''' 从mongodb推荐库一次查询一批企业的推荐数据，返回 {公司名: 推荐数据}'''
 
+        recommend = {}
+        for query in self.mongo_coll.find({"company_name": {"$in": com_names}}):
+            recommend[query["company_name"]] = query
+        return recommend
 
-    def get_financing_coms(self, com_name):
-        '''根据公司名，获取融资信息'''
+    def get_financing_batch(self, com_names):
+        '''一次查询一批公司的融资信息，返回 {公司名: [融资信息]}'''
 
-        company_info = []
-        #com_name = '北京唯迈医疗设备有限公司'
-        #aql_arango = "FOR company IN kb_financing filter company.name=='%s' return company" % com_name
-        #query = self.agdb_name.fetch_list(aql_arango)
-        collection = self.agdb_name['kb_financing']
-        query = collection.fetchByExample({'name':com_name},batchSize=200)
-        if not query:
-            return []
+        company_info = {}
+        aql_arango = "FOR item IN kb_financing FILTER item.name IN @names RETURN item"
+        query = iter_aql(self.agdb_name, aql_arango, bind_vars={"names": com_names})
         for item in query:
-            it = item
             financing = {}
-            investor = []
             financing['name'] = item['name']
-            investor = item['properties']['investors']
-            financing['investor'] = investor
+            financing['investor'] = item['properties']['investors']
             financing['financing_round'] = item['properties']['finance_round']
             #financing['registered_capital'] = item['price_amount']
             financing['financing_time'] = item['properties']['finance_date']
             financing['financing_amount'] = item['properties']['price_amount']
-            company_info.append(company_info)
-            #print(item['name'],item['properties']['finance_round'],item['properties']['finance_date'])
+            company_info.setdefault(item['name'], []).append(financing)
         return company_info
 
-    def get_products(self, com_name):
+    def get_products_batch(self, com_names):
+        '''一次查询一批公司的产品，返回 {公司名: [产品]}'''
 
-        products = []
-        com_name = '北京唯迈医疗设备有限公司'
-        aql_arango = "FOR company IN kb_product filter company.relations[0]['relation_type']=='concept_relation/100003' AND company.relations[0]['object_name']=='%s' return company" % com_name
-        try:
-            query = self.agdb_name.fetch_list(aql_arango)
-        except AQLFetchError as e:
-            return []
+        products = {}
+        aql_arango = ("FOR item IN kb_product FILTER item.relations[0]['relation_type']=='concept_relation/100003' "
+                      "AND item.relations[0]['object_name'] IN @names RETURN item")
+        query = iter_aql(self.agdb_name, aql_arango, bind_vars={"names": com_names})
         for item in query:
             product = {}
             product['product_name'] = item['name']
             #product['product_desc'] = itemi['properties']['introduction']
             product['introduction'] = item['properties']['introduction']
             product['product_url'] = item['properties']['product_url']
-            products.append(product)
+            products.setdefault(item['relations'][0]['object_name'], []).append(product)
         return products
 
 
-    def pack_es_item(self, item,uuid):
-        ''' 将mysql读取的数据按需组成字典'''
+    def pack_es_item(self, item, uuid, financing_coms=None, product_names=None, recommend=None):
+        ''' 将hbase读取的公司属性和预取的融资、产品、推荐数据组成ES文档'''
 
         if not item:
             return {}
@@ -191,90 +192,69 @@ class TestLink:
         new_item["avg_score"] = []
         new_item["fenxins"] = []
 
-        financing_coms = self.get_financing_coms(item['name'])
-        product_names = self.get_products(item['name'])
-        new_item['product'] = product_names
+        financing_coms = financing_coms or []
+        new_item['product'] = product_names or []
         new_item['financing'] = financing_coms
-        new_item['financeMoney'] = str(financing_coms['financing_amount'])
+        if financing_coms:
+            # 取最近一次融资金额
+            latest = max(financing_coms, key=lambda financing: financing['financing_time'] or '')
+            new_item['financeMoney'] = str(latest['financing_amount'])
+        if recommend:
+            new_item["isRecommend"] = 1
         #new_item.pop('update_time')
         return new_item
 
-    def bulk_action(self, _time_site):
+    def iter_company_batches(self):
+        '''并行扫描hbase公司行，按 fetch_batch 分批返回 [(公司属性, uuid)]'''
 
-        #logging.info('数据库已连接[%s]，fetch:[%s],正在读取数据库' % (self.tb_name_list[_tb_num],_time_site))
-        #endtime = datetime.strptime(_time_site, '%Y-%m-%d %H:%M:%S')
-        num = 0
-        num_ins = 0
-        num_up = 0
-        num_del = 0
-        ACTIONS = []
-        location_company = []
         concept_type_id = b"concept_entity/1001"
-        self.hbase_pool = happybase.ConnectionPool( host = self.config.get("hbase","host"),
-                        port = self.config.getint("hbase","port"),
-                        timeout=None,
-                        autoconnect=True,
-                        size = self.config.getint("hbase","pool_size"))
-        #colletion_name = "kb_company"
-        #collection = agdb_name[colletion_name]
-        with self.hbase_pool.connection() as hbase_conn:
-            self.hbase_entity_table = hbase_conn.table(self.config.get("hbase","entity"))
+        batch = []
+        hbase_rows = self.hbase_rowkey.scan(self.hbase_pool, self.config.get("hbase","entity"), concept_type_id,
+                                            columns=[b'info:entity_properties', b'info:uuid'])
+        for key,val in hbase_rows:
+            prop = self.hbase_codec.loads(val[b'info:entity_properties'])
+            uuid = str(val[b'info:uuid'],encoding='utf-8')
+            batch.append((prop, uuid))
+            if len(batch) >= self.fetch_batch:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
 
-            #with self.hbase_entity_table.batch(batch_size=200) as bat:
-            #filter="SingleColumnValueFilter ('')"
-            hbase_rows = self.hbase_entity_table.scan(row_prefix=concept_type_id)
-            for key,val in hbase_rows:
-                #print('<',key,'>',val)
-                name = str(val[b'info:entity_name'],encoding='utf-8')
-                type_id = str(val[b'info:entity_type_id'],encoding='utf-8')
-                prop = json.loads(str(val[b'info:entity_properties'],encoding='utf-8'))
-                rela = json.loads(str(val[b'info:relations'],encoding='utf-8'))
-                uuid = str(val[b'info:uuid'],encoding='utf-8')
-                com_id = rela[0]['object_id']
-                new_item = self.pack_es_item(prop,uuid)
-                print(new_item)
-                return
-        return
-        #data_sum = len(res_cor)#sr_cor.count()
-        #logging.info('总共处理%s条数据.....' % data_sum)
+    def iter_actions(self, location_company):
+        '''每批公司的融资、产品、推荐数据各用一次查询预取，再组装ES文档'''
 
-        for line in res_cor:
-            num += 1
+        for batch in self.iter_company_batches():
+            com_names = list(set(prop['name'] for prop, uuid in batch if prop.get('name')))
+            financing_map = self.get_financing_batch(com_names)
+            product_map = self.get_products_batch(com_names)
+            recommend_map = self.get_recommend_batch(com_names)
+            for prop, uuid in batch:
+                name = prop.get('name')
+                try:
+                    new_item = self.pack_es_item(prop, uuid, financing_map.get(name), product_map.get(name),
+                                                 recommend_map.get(name))
+                    if not new_item:
+                        raise ValueError("公司属性为空")
+                    loc = new_item['loc']
+                except (KeyError, TypeError, ValueError) as e:
+                    self.count_pack_fail += 1
+                    logger.error("公司[{}]组装ES文档失败，uuid=[{}]，错误=[{}]".format(name, uuid, e))
+                    continue
+                location_company.append({'name': name, 'loc': loc})
+                yield self.es_indexer.action(uuid, new_item)
 
-            num_ins += 1
-            tmp_l = self.pack_es_item(line)
-            action = {
-                "_index": self.table_info['index_name'],
-                "_type": self.table_info['type_name'],
-                #"_id": res_max['_id'], #_id 也可以默认生成，不赋值
-                "_source":tmp_l
-            }
-            loc_map = {}
-            loc_map['name'] = tmp_l['company_name']
-            loc_map['loc'] = tmp_l['location']
-            location_company.append(loc_map)
-            #if num_ins%1000==0:
-            #    print('已经更新%s条！。。。。' % num_ins)
-            #doc = {'update':action},{'doc':{'tag':[]}}
-            #ACTIONS.append(doc)
-            ACTIONS.append(action)
-            print(ACTIONS)
-            return
-            if len(ACTIONS)%1000==0 and ACTIONS:
-                success,_ = helpers.bulk(self.es, ACTIONS)
-                ACTIONS = []
-                print('已经插入%s条' % num_ins)
-        if ACTIONS:
-            success,_ = helpers.bulk(self.es, ACTIONS)
+    def bulk_action(self, _time_site):
+
+        location_company = []
+        num_ins, num_fail = self.es_indexer.index(self.iter_actions(location_company))
         try:
             with open('./company_loc.json','w') as dump_f:
                 json.dump(location_company,dump_f, ensure_ascii=False, indent=4)
         except Exception as e:
-            print('write err:%s' % e)
-        #print(ACTIONS)
-        print('sum:%s,插入完成%s条!!!!!!' % (num,num_ins))
-        #success = self.es.bulk(body=ACTIONS,index=self.table_info['index_name'])
-        #print(success)
+            logger.error('write err:%s' % e)
+        logger.info('sum:%s,插入完成%s条,失败%s条,组装失败%s条!!!!!!' % (
+            num_ins + num_fail + self.count_pack_fail, num_ins, num_fail, self.count_pack_fail))
 
 
 if __name__ == '__main__':
@@ -22,6 +22,12 @@ import re
 import copy
 import requests
 import os
+main_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(main_path)
+from common_utils.company_name_dict import CompanyNameDict
+from common_utils.mysql_pool import get_mysql_pool
+from common_utils.schema_cache import get_schema_cache
+from common_utils.kb_bulk_loader import KbBulkLoader
 
 logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s - %(filename)s[line:%(lineno)d] - %(levelname)s: %(message)s')
@@ -41,7 +47,11 @@ class KbpPipeline(object):
         self.res_kb_process_company = self.mongo_con[self.config.get("mongo","res_kb_process")][self.config.get("mongo","process_company")] # 清洗库
         self.arango_con = ArangoConnection(arangoURL=self.config.get("arango","arango_url"),username= self.config.get("arango","user"),password=self.config.get("arango","passwd"))
         self.graph_kb_company = self.arango_con[self.config.get("arango","db")][self.config.get("arango","kb_company")]
+        self.kb_loader = KbBulkLoader(self.arango_con[self.config.get("arango","db")], self.config.get("arango","kb_company"), key_field="name") # 批量查重、批量新增
         self._init_label_schema() # init self.label_schema from mysql
+        # 企业标签整表预加载，避免每家企业单独建立MySQL连接查询
+        self.company_tags_dict = CompanyNameDict(self.config, "company_tags_all_query",
+                                        "company_tags_query", "company_tag_refresh").load()
         self.count_graph_insert = 0 # arango新增数据数量
         self.count_graph_exist = 0 # 企业信息在图数据库中
         self.total = 0 # 处理日期清洗库待处理的企业数
@@ -52,18 +62,17 @@ class KbpPipeline(object):
         '''
         self.label_schema = {}
         self.industry_schema = {}
-        sql_conn = pymysql.connect( host = self.config.get("mysql","host") ,
+        sql_conn = get_mysql_pool( host = self.config.get("mysql","host") ,
                             user = self.config.get("mysql","user") ,
                             passwd = self.config.get("mysql","passwd"),
                             port = self.config.getint("mysql","port") ,
                             db = self.config.get("mysql","db"),
-                            charset = "utf8" )
+                            charset = "utf8" ).connect()
         sql_cur = sql_conn.cursor() 
 
         # 初始化企业标签schema
         sql_query_label = "select name, type, id from {}".format(self.config.get("mysql","res_tag"))
-        sql_cur.execute(sql_query_label)
-        labels = sql_cur.fetchall()
+        labels = get_schema_cache().fetchall(sql_cur, sql_query_label)
         for label in labels:
             label_name, label_type, label_id = label
             self.label_schema[label_name] = {
@@ -97,17 +106,22 @@ class KbpPipeline(object):
         # 人工梳理的标签确定，再进行ID化
         res = []
 
-        sql_conn = pymysql.connect( host = self.config.get("mysql","host") ,
-                            user = self.config.get("mysql","user") ,
-                            passwd = self.config.get("mysql","passwd"),
-                            port = self.config.getint("mysql","port") ,
-                            db = self.config.get("mysql","db"),
-                            charset = "utf8" )
-        sql_cur = sql_conn.cursor() 
-        # 查询企业相关的标签信息
-        sql_state = self.config.get("mysql","company_tags_query").replace("eq","=").format(properties["name"])
-        sql_cur.execute(sql_state)
-        datas = sql_cur.fetchall()
+        if self.company_tags_dict.loaded:
+            datas = self.company_tags_dict.get(properties["name"])
+        else:
+            sql_conn = get_mysql_pool( host = self.config.get("mysql","host") ,
+                                user = self.config.get("mysql","user") ,
+                                passwd = self.config.get("mysql","passwd"),
+                                port = self.config.getint("mysql","port") ,
+                                db = self.config.get("mysql","db"),
+                                charset = "utf8" ).connect()
+            sql_cur = sql_conn.cursor() 
+            # 查询企业相关的标签信息
+            sql_state = self.config.get("mysql","company_tags_query").replace("eq","=").format(properties["name"])
+            sql_cur.execute(sql_state)
+            datas = sql_cur.fetchall()
+            sql_cur.close()
+            sql_conn.close()
         for data in datas:
             company_name, tag_name, tag_type, tag_id = data
             tag = {
@@ -117,8 +131,6 @@ class KbpPipeline(object):
             }
             res.append(tag)
 
-        sql_cur.close()
-        sql_conn.close()
         return res
 
     def process_tags(self,properties):
@@ -161,12 +173,12 @@ class KbpPipeline(object):
             logger.error("更新企业信息至arango失败，企业名=[{}]，更新信息=[{}]".format(kf["name"], kf[up_key]), e)
 
     def get_last_execute_time(self):
-        sql_conn = pymysql.connect(host="xxxx",
+        sql_conn = get_mysql_pool(host="xxxx",
                            user="xxxx",
                            passwd="xxxx",
                            port=0000,
                            db="xxxx",
-                           charset="xxxx")
+                           charset="xxxx").connect()
         sql_cur = sql_conn.cursor()
         currency_sql = """
         SELECT FROM_UNIXTIME(start_time/1000,'%Y-%m-%d') as start_time FROM execution_jobs
@@ -224,13 +236,10 @@ class KbpPipeline(object):
 
         # arango数据库企业信息处理
 
-        for company in process_companys:
+        for company, exist in self.kb_loader.iter_exist(process_companys, lambda d: d["name"]):
 
             logger.info("查询推荐企业[{}]".format(company["name"]))
 
-            # Arango查重
-            exist = self.graph_kb_company.fetchFirstExample({"name":company["name"]})
-
             if not exist:
 
                 logger.info("发现需新增企业[{}]，准备转移到企业知识库".format(company["name"]))
@@ -251,11 +260,10 @@ class KbpPipeline(object):
                     "update_time": datetime.datetime.today()
                 }
 
-                self.insert_graph_kb(kf) 
+                self.kb_loader.add(kf)
 
             else:
                 logger.info("企业数据已存在图数据库中，企业名=[{}]".format(company)) 
-                self.count_graph_exist += 1
 
             count += 1
 
@@ -263,6 +271,9 @@ class KbpPipeline(object):
                 logger.info("清洗库前[{}]家企业导入企业知识库处理完成".format(count))
 
 
+        self.kb_loader.flush()
+        self.count_graph_insert = self.kb_loader.count_insert
+        self.count_graph_exist = self.kb_loader.count_exist
         self.close_connection() 
 
         logger.info("日期[{}]清洗库共找到企业{}个，arango企业库新增{}个，arango已有[{}]个".format(
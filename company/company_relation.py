@@ -13,7 +13,6 @@ import sys
 from pymongo import MongoClient
 from pymongo import errors
 from pyArango.connection import Connection as ArangoConnection
-from pyArango.theExceptions import AQLFetchError
 import pymysql
 from dateutil import parser
 import datetime
@@ -23,6 +22,15 @@ import re
 import copy
 import requests
 import os
+main_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(main_path)
+from common_utils.classifier_client import ClassifierClient
+from common_utils.company_name_dict import CompanyNameDict
+from common_utils.mysql_pool import get_mysql_pool, mysql_pool_stats
+from common_utils.schema_cache import get_schema_cache
+from common_utils.industry_tree import IndustryTree
+from common_utils.arango_cursor import iter_aql
+from common_utils.relation_writer import RelationWriter
 
 logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s - %(filename)s[line:%(lineno)d] - %(levelname)s: %(message)s')
@@ -41,9 +49,16 @@ class RelationPipeline(object):
         self.arango_con = ArangoConnection(arangoURL=self.config.get("arango","arango_url"),username= self.config.get("arango","user"),password=self.config.get("arango","passwd"))
         self.arango_db = self.arango_con[self.config.get("arango","db")]
         self.kb_company = self.arango_db[self.config.get("arango","kb_company")]
+        self.relation_writer = RelationWriter(self.arango_db, self.config.get("arango","kb_company")) # 关系批量写入
         self.industry_url = self.config.get("url","company_classifier")
+        # 企业产业分类接口支持 company_list 批量分类，按批合并请求
+        self.industry_client = ClassifierClient(self.industry_url,
+                                    lambda names: {"company_list": names, "industry_list":"all"})
         self._init_division_schema() # init division_schema from mysql
         self._init_industry_schema()
+        # 企业渠道整表预加载，避免每家企业单独建立MySQL连接查询
+        self.company_channel_dict = CompanyNameDict(self.config, "company_channel_all_query",
+                                        "company_channel_query", "company_channel_refresh").load()
         self.count_graph_update = 0 # arango更新关系数据数量
         self.total = 0 # 处理日期总共需要添加关系的数量
 
@@ -52,18 +67,17 @@ class RelationPipeline(object):
         行政区域实体关系加载
         '''
         self.division_schema = {}
-        sql_conn = pymysql.connect( host = self.config.get("mysql","host") ,
+        sql_conn = get_mysql_pool( host = self.config.get("mysql","host") ,
                             user = self.config.get("mysql","user") ,
                             passwd = self.config.get("mysql","passwd"),
                             port = self.config.getint("mysql","port") ,
                             db = self.config.get("mysql","db"),
-                            charset = "utf8" )
+                            charset = "utf8" ).connect()
         sql_cur = sql_conn.cursor() 
 
         # 初始化行政区域的关系schema
         sql_query_industry = "select name, id, level, parent_id from {}".format(self.config.get("mysql","res_division"))
-        sql_cur.execute(sql_query_industry)
-        divisions = sql_cur.fetchall()
+        divisions = get_schema_cache().fetchall(sql_cur, sql_query_industry)
         for division in divisions:
             division_name, division_id, division_level, division_parent_id = division
             self.division_schema[division_name] = {
@@ -82,18 +96,17 @@ class RelationPipeline(object):
         init loading industry schema at mysql res_industry table
         '''
         self.industry_schema = {}
-        sql_conn = pymysql.connect( host = self.config.get("mysql","host") ,
+        sql_conn = get_mysql_pool( host = self.config.get("mysql","host") ,
                             user = self.config.get("mysql","user") ,
                             passwd = self.config.get("mysql","passwd"),
                             port = self.config.getint("mysql","port") ,
                             db = self.config.get("mysql","db"),
-                            charset = "utf8" )
+                            charset = "utf8" ).connect()
         sql_cur = sql_conn.cursor() 
 
         # 初始化产业/产业领域 schema
         sql_query_industry = "select name, id, parent_id from {}".format(self.config.get("mysql","res_industry"))
-        sql_cur.execute(sql_query_industry)
-        labels = sql_cur.fetchall()
+        labels = get_schema_cache().fetchall(sql_cur, sql_query_industry)
         for industry in labels:
             industry_name, industry_id, parent_id = industry
             self.industry_schema[industry_id] = {
@@ -104,35 +117,19 @@ class RelationPipeline(object):
                 "object_parent_id": parent_id
             }
 
+        self.industry_tree = IndustryTree(self.industry_schema)
         sql_cur.close()
         sql_conn.close()
         logger.info("MYSQL industry schema 加载完成")
         
-    def get_related_industry_tags(self, industry_id):
-        '''
-        根据子领域名称递归返回领域及所有父领域标签
-        '''
-        relations = []
-        # 过滤招商领域与图谱定义不一致的
-        if not industry_id in self.industry_schema:
-            return relations
-        
-        relations.append(self.industry_schema[industry_id])
-        parent_id = self.industry_schema[industry_id]["object_parent_id"]
-        while (parent_id):
-            node = self.industry_schema[parent_id]
-            relations.append(node)
-            parent_id = node["object_parent_id"]
-        return relations
-
 
     def get_last_execute_time(self):
-        sql_conn = pymysql.connect(host="xxx",
+        sql_conn = get_mysql_pool(host="xxx",
                            user="xxx",
                            passwd="xxx",
                            port=0000,
                            db="xxx",
-                           charset="xxx")
+                           charset="xxx").connect()
         sql_cur = sql_conn.cursor()
         currency_sql = """
         SELECT FROM_UNIXTIME(start_time/1000,'%Y-%m-%d') as start_time FROM execution_jobs
@@ -164,15 +161,12 @@ class RelationPipeline(object):
         iso_date_str = process_date + 'T00:00:00+08:00'
         iso_date = parser.parse(iso_date_str)
 
-        aql = "FOR company IN {} FILTER company.create_time >= '{}' SORT company.create_time return company".format(
+        aql = "FOR company IN {} FILTER company.create_time >= '{}' SORT company.create_time return ".format(
                         self.config.get("arango","kb_company"), iso_date) 
-        
-        try:
-            res = self.arango_db.fetch_list(aql)
-        except AQLFetchError as e:
-            '''没有查到数据时，fetch_list会抛出异常'''
-            res = []
-            logger.warn("Arango企业库没有查到数据",e)
+        end_str_sql = "{'_key':company._key,'name':company.name,'properties':{'name':company.properties.name,'province':company.properties.province,'city':company.properties.city,'area':company.properties.area}}"
+
+        # 流式游标，只返回关系处理需要的字段
+        res = iter_aql(self.arango_db, aql + end_str_sql)
 
         self.total = len(res)           
         logger.info("[{}]，企业知识库查到待处理数据[{}]个".format(process_date, self.total))
@@ -199,50 +193,39 @@ class RelationPipeline(object):
         return div_rel
 
         
-    def process_industry_rel(self,properties):
+    def process_industry_rel(self, properties, industry_field_tags=None):
         '''
         产业领域标签ID化添加
+        industry_field_tags 为批量分类接口已返回的分类结果，为None时单独请求分类接口
         '''
-        industry_tags = []
-
-        industry_field_tags = []
-        company = properties["name"]
-
-        post_data = {
-            "company_list": [ company ],
-            "industry_list":"all"
-        }
-        try:
-            res = requests.post(self.industry_url, data=json.dumps(post_data))
+        if industry_field_tags is None:
+            industry_field_tags = self.industry_client.classify([properties["name"]])[0]
+        if not industry_field_tags:
+            industry_field_tags = []
 
-            if res.status_code == 200:
-                tags = res.json().get("body")[0]
-                industry_field_tags.extend(tags)
-
-        except Exception as e:
-            logging.error("获取公司产业领域失败，公司名=[{}]，接口=[{}]".format(company,self.industry_url),e)
-
-        for field in industry_field_tags:
-            for node in self.get_related_industry_tags(field["id"]):
-                if node not in industry_tags:
-                    industry_tags.append(node)
+        industry_tags = self.industry_tree.related_tags(field["id"] for field in industry_field_tags)
 
         return industry_tags
 
     def process_channel_rel(self, properties):
         '''与渠道实体的关系添加'''
         channel_rel = []
-        sql_conn = pymysql.connect( host = self.config.get("mysql","host") ,
-                            user = self.config.get("mysql","user") ,
-                            passwd = self.config.get("mysql","passwd"),
-                            port = self.config.getint("mysql","port") ,
-                            db = self.config.get("mysql","db"),
-                            charset = "utf8" )
-        sql_cur = sql_conn.cursor() 
-        # 查询企业相关的渠道信息
-        sql_state = self.config.get("mysql","company_channel_query").replace("eq","=").format(properties["name"])
-        sql_cur.execute(sql_state)
-        datas = sql_cur.fetchall()
+        if self.company_channel_dict.loaded:
+            datas = self.company_channel_dict.get(properties["name"])
+        else:
+            sql_conn = get_mysql_pool( host = self.config.get("mysql","host") ,
+                                user = self.config.get("mysql","user") ,
+                                passwd = self.config.get("mysql","passwd"),
+                                port = self.config.getint("mysql","port") ,
+                                db = self.config.get("mysql","db"),
+                                charset = "utf8" ).connect()
+            sql_cur = sql_conn.cursor() 
+            # 查询企业相关的渠道信息
+            sql_state = self.config.get("mysql","company_channel_query").replace("eq","=").format(properties["name"])
+            sql_cur.execute(sql_state)
+            datas = sql_cur.fetchall()
+            sql_cur.close()
+            sql_conn.close()
         for data in datas:
             company_name, channel_name, channel_id = data
             rel = {
@@ -253,14 +236,12 @@ class RelationPipeline(object):
             }
             channel_rel.append(rel)
 
-        sql_cur.close()
-        sql_conn.close()
         return channel_rel
 
 
         
 
-    def process_relations(self, properties):
+    def process_relations(self, properties, industry_field_tags=None):
         '''
         添加关系：行政区域、产业类别、渠道信息
         '''
@@ -268,7 +249,7 @@ class RelationPipeline(object):
         division_rel = self.process_division_rel(properties)
         relations.extend(division_rel)
 
-        industry_rel = self.process_industry_rel(properties)
+        industry_rel = self.process_industry_rel(properties, industry_field_tags)
         relations.extend(industry_rel)
 
         channel_rel = self.process_channel_rel(properties)
@@ -286,19 +267,14 @@ class RelationPipeline(object):
 
         # arango数据库企业信息处理
 
-        for company in process_companys:
+        # 产业分类接口批量并发请求，按原顺序返回每个企业的分类结果
+        classified_companys = self.industry_client.iter_classified(process_companys, lambda c: c["properties"]["name"])
+        for company, industry_field_tags in classified_companys:
 
             logger.info("处理企业关系，企业名=[{}]".format(company["name"]))
             company_key = company["_key"]
-            relations = self.process_relations(company["properties"])
-            try:
-                doc = self.kb_company[company_key]
-                doc["relations"] = relations
-                doc["update_time"] = datetime.datetime.today()
-                doc.save()
-                self.count_graph_update += 1
-            except Exception as e:
-                logger.error("企业关系添加失败，企业名=[{}]".format(company["name"]))
+            relations = self.process_relations(company["properties"], industry_field_tags)
+            self.relation_writer.add(company_key, relations)
 
 
             count += 1
@@ -306,8 +282,14 @@ class RelationPipeline(object):
             if count % 100 == 0 or count == self.total:
                 logger.info("前[{}]家企业关系添加完成".format(count))
 
-        logger.info("日期[{}]清洗库共找到企业{}个，arango企业库更新关系{}个".format(
-            self.process_date, self.total, self.count_graph_update))
+        self.count_graph_update = self.relation_writer.flush()
+        if self.relation_writer.failed_keys:
+            logger.error("关系更新失败[{}]条".format(len(self.relation_writer.failed_keys)))
+        logger.info("日期[{}]清洗库共找到企业{}个，arango企业库更新关系{}个，产业分类请求[{}]次，分类失败企业[{}]个".format(
+            self.process_date, self.total, self.count_graph_update, self.industry_client.count_request, self.industry_client.count_failed))
+        for pool_name, pool_stats in mysql_pool_stats().items():
+            logger.info("MySQL连接池[{}]：新建连接[{}]个，复用[{}]次，查询[{}]次，平均耗时[{}]秒，最大耗时[{}]秒".format(
+                pool_name, pool_stats["connect"], pool_stats["reuse"], pool_stats["query"], pool_stats["avg_query_seconds"], pool_stats["max_query_seconds"]))
 
 if __name__=="__main__":
 
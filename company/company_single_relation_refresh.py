@@ -13,7 +13,6 @@ import sys
 from pymongo import MongoClient
 from pymongo import errors
 from pyArango.connection import Connection as ArangoConnection
-from pyArango.theExceptions import AQLFetchError
 import pymysql
 import Threading
 from dateutil import parser
@@ -25,6 +24,12 @@ import copy
 import requests
 import os
 
+main_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(main_path)
+from common_utils.mysql_pool import get_mysql_pool
+from common_utils.schema_cache import get_schema_cache
+from common_utils.industry_tree import IndustryTree
+from common_utils.arango_cursor import iter_aql
 logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s - %(filename)s[line:%(lineno)d] - %(levelname)s: %(message)s')
 logger = logging.getLogger(__name__)
@@ -60,18 +65,17 @@ class RelationPipeline(object):
         行政区域实体关系加载
         '''
         self.division_schema = {}
-        sql_conn = pymysql.connect( host = self.config.get("mysql","host") ,
+        sql_conn = get_mysql_pool( host = self.config.get("mysql","host") ,
                             user = self.config.get("mysql","user") ,
                             passwd = self.config.get("mysql","passwd"),
                             port = self.config.getint("mysql","port") ,
                             db = self.config.get("mysql","db"),
-                            charset = "utf8" )
+                            charset = "utf8" ).connect()
         sql_cur = sql_conn.cursor() 
 
         # 初始化行政区域的关系schema
         sql_query_industry = "select name, id, level, parent_id from {}".format(self.config.get("mysql","res_division"))
-        sql_cur.execute(sql_query_industry)
-        divisions = sql_cur.fetchall()
+        divisions = get_schema_cache().fetchall(sql_cur, sql_query_industry)
         for division in divisions:
             division_name, division_id, division_level, division_parent_id = division
             self.division_schema[division_name] = {
@@ -90,12 +94,12 @@ class RelationPipeline(object):
         init loading industry schema at mysql res_industry table
         '''
         self.industry_schema = {}
-        sql_conn = pymysql.connect( host = self.config.get("mysql","host") ,
+        sql_conn = get_mysql_pool( host = self.config.get("mysql","host") ,
                             user = self.config.get("mysql","user") ,
                             passwd = self.config.get("mysql","passwd"),
                             port = self.config.getint("mysql","port") ,
                             db = self.config.get("mysql","db"),
-                            charset = "utf8" )
+                            charset = "utf8" ).connect()
         sql_cur = sql_conn.cursor() 
 
         ###################################################################
@@ -104,8 +108,7 @@ class RelationPipeline(object):
         self.update_industries_id = []
         # 初始化产业/产业领域 schema
         sql_query_industry = "select name, id, parent_id from {}".format(self.config.get("mysql","res_industry"))
-        sql_cur.execute(sql_query_industry)
-        labels = sql_cur.fetchall()
+        labels = get_schema_cache().fetchall(sql_cur, sql_query_industry)
         for industry in labels:
             industry_name, industry_id, parent_id = industry
             self.industry_schema[industry_id] = {
@@ -118,29 +121,13 @@ class RelationPipeline(object):
             if industry_name in self.all_industries:
                 self.update_industries_id.append(industry_id)
 
+        self.industry_tree = IndustryTree(self.industry_schema)
         sql_cur.close()
         sql_conn.close()
         logger.info("MYSQL industry schema 加载完成")
 
 
 
-    def get_related_industry_tags(self, industry_id):
-        '''
-        根据子领域名称递归返回领域及所有父领域标签
-        '''
-        relations = []
-        # 过滤招商领域与图谱定义不一致的
-        if not industry_id in self.industry_schema:
-            return relations
-        
-        relations.append(self.industry_schema[industry_id])
-        parent_id = self.industry_schema[industry_id]["object_parent_id"]
-        while (parent_id):
-            node = self.industry_schema[parent_id]
-            relations.append(node)
-            parent_id = node["object_parent_id"]
-        return relations
-
 
     def query_process_company(self, process_date):
         
@@ -160,15 +147,12 @@ class RelationPipeline(object):
         iso_date_str = process_date + 'T00:00:00+08:00'
         iso_date = parser.parse(iso_date_str)
 
-        aql = "FOR company IN {} filter company.create_time>='2020-04-24 12:57:37.408114' SORT company.create_time return company".format(
+        aql = "FOR company IN {} filter company.create_time>='2020-04-24 12:57:37.408114' SORT company.create_time return ".format(
                         self.config.get("arango","kb_company"), iso_date) 
-        
-        try:
-            res = self.arango_db.fetch_list(aql)
-        except AQLFetchError as e:
-            '''没有查到数据时，fetch_list会抛出异常'''
-            res = []
-            logger.warn("Arango企业库没有查到数据",e)
+        end_str_sql = "{'_key':company._key,'name':company.name,'properties':{'name':company.properties.name,'province':company.properties.province,'city':company.properties.city,'area':company.properties.area}}"
+
+        # 流式游标，只返回关系处理需要的字段
+        res = iter_aql(self.arango_db, aql + end_str_sql)
 
         self.total = len(res)           
         logger.info("[{}]，企业知识库查到待处理数据[{}]个".format(process_date, self.total))
@@ -199,8 +183,6 @@ class RelationPipeline(object):
         '''
         产业领域标签ID化添加
         '''
-        industry_tags = []
-
         industry_field_tags = []
         company = properties["name"]
         #all_industries = ["人工智能","光电产业","新能源汽车","医疗器械"]#2020-05-27up
@@ -221,10 +203,7 @@ class RelationPipeline(object):
         except Exception as e:
             logging.error("获取公司产业领域失败，公司名=[{}]，接口=[{}]".format(company,self.industry_url),e)
 
-        for field in industry_field_tags:
-            for industry_node in self.get_related_industry_tags(field["id"]):
-                if industry_node not in industry_tags:
-                    industry_tags.append(industry_node)
+        industry_tags = self.industry_tree.related_tags(field["id"] for field in industry_field_tags)
 
         logger.info("添加所有产业领域关系=[{}]".format(industry_tags))
 
@@ -233,12 +212,12 @@ class RelationPipeline(object):
     def process_channel_rel(self, properties):
         '''与渠道实体的关系添加'''
         channel_rel = []
-        sql_conn = pymysql.connect( host = self.config.get("mysql","host") ,
+        sql_conn = get_mysql_pool( host = self.config.get("mysql","host") ,
                             user = self.config.get("mysql","user") ,
                             passwd = self.config.get("mysql","passwd"),
                             port = self.config.getint("mysql","port") ,
                             db = self.config.get("mysql","db"),
-                            charset = "utf8" )
+                            charset = "utf8" ).connect()
         sql_cur = sql_conn.cursor() 
         # 查询企业相关的渠道信息
         sql_state = self.config.get("mysql","company_channel_query").replace("eq","=").format(properties["name"])
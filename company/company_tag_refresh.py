@@ -22,6 +22,11 @@ import re
 import copy
 import requests
 import os
+main_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(main_path)
+from common_utils.company_name_dict import CompanyNameDict
+from common_utils.mysql_pool import get_mysql_pool
+from common_utils.schema_cache import get_schema_cache
 
 logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s - %(filename)s[line:%(lineno)d] - %(levelname)s: %(message)s')
@@ -37,16 +42,19 @@ class KbpPipeline(object):
 
         self.config = configparser.ConfigParser()
         self.config.read(config_path)
-        self.sql_conn = pymysql.connect( host = self.config.get("mysql","host") ,
+        self.sql_conn = get_mysql_pool( host = self.config.get("mysql","host") ,
                 user = self.config.get("mysql","user"),
                 passwd = self.config.get("mysql","passwd"),
                 port = self.config.getint("mysql","port") ,
                 db = self.config.get("mysql","db"),
-                charset = self.config.get("mysql","charset") )
+                charset = self.config.get("mysql","charset") ).connect()
         self.sql_cur = self.sql_conn.cursor() 
         self.arango_con = ArangoConnection(arangoURL=self.config.get("arango","arango_url"),username= self.config.get("arango","user"),password=self.config.get("arango","passwd"))
         self.graph_kb_company = self.arango_con[self.config.get("arango","db")][self.config.get("arango","kb_company")]
         self._init_tag_schema() # init self.tag_schema, self.industry_schema from mysql
+        # 有更新企业的标签在 process 中按更新日期一次读取，避免每家企业单独建立MySQL连接查询
+        self.company_tags_dict = CompanyNameDict(self.config, "company_tags_all_query",
+                                        "company_tags_query", "company_tag_refresh")
         self.total = 0 # 发现更新企业标签数量
         self.count_skip = 0 # Arango中不存在的企业数量
         self.count_update = 0 # 实际更新数量
@@ -60,8 +68,7 @@ class KbpPipeline(object):
 
         # 初始化企业标签schema
         sql_query_label = "select name, type, id from {}".format(self.config.get("mysql","res_tag"))
-        self.sql_cur.execute(sql_query_label)
-        labels = self.sql_cur.fetchall()
+        labels = get_schema_cache().fetchall(self.sql_cur, sql_query_label)
         for label in labels:
             label_name, label_type, label_id = label
             self.tag_schema[label_name] = {
@@ -85,17 +92,22 @@ class KbpPipeline(object):
         '''
         res = []
 
-        sql_conn = pymysql.connect( host = self.config.get("mysql","host") ,
-                            user = self.config.get("mysql","user") ,
-                            passwd = self.config.get("mysql","passwd"),
-                            port = self.config.getint("mysql","port") ,
-                            db = self.config.get("mysql","db"),
-                            charset = "utf8" )
-        sql_cur = sql_conn.cursor() 
-        # 查询企业相关的标签信息
-        sql_state = self.config.get("mysql","company_tags_query").replace("eq","=").format(company_name)
-        sql_cur.execute(sql_state)
-        datas = sql_cur.fetchall()
+        if self.company_tags_dict.loaded:
+            datas = self.company_tags_dict.get(company_name)
+        else:
+            sql_conn = get_mysql_pool( host = self.config.get("mysql","host") ,
+                                user = self.config.get("mysql","user") ,
+                                passwd = self.config.get("mysql","passwd"),
+                                port = self.config.getint("mysql","port") ,
+                                db = self.config.get("mysql","db"),
+                                charset = "utf8" ).connect()
+            sql_cur = sql_conn.cursor() 
+            # 查询企业相关的标签信息
+            sql_state = self.config.get("mysql","company_tags_query").replace("eq","=").format(company_name)
+            sql_cur.execute(sql_state)
+            datas = sql_cur.fetchall()
+            sql_cur.close()
+            sql_conn.close()
         for data in datas:
             company_name, tag_name, tag_type, tag_id = data
             tag = {
@@ -105,8 +117,6 @@ class KbpPipeline(object):
             }
             res.append(tag)
 
-        sql_cur.close()
-        sql_conn.close()
         return res 
 
     
@@ -149,6 +159,7 @@ class KbpPipeline(object):
 
         process_companys = self.query_new_tags(scan_date)
         self.total = len(process_companys)
+        self.company_tags_dict.refresh(self.process_date)
 
         count = 0
 
@@ -11,6 +11,13 @@ import datetime
 import time 
 import re
 import copy
+import sys
+main_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(main_path)
+from common_utils.geocode_cache import get_geocode_cache
+from common_utils.gazetteer import get_gazetteer
+from common_utils.mysql_pool import get_mysql_pool
+from common_utils.schema_cache import get_schema_cache
 
 logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s - %(filename)s[line:%(lineno)d] - %(levelname)s: %(message)s')
@@ -33,18 +40,17 @@ class Refresh(object):
         行政区域实体关系加载
         '''
         self.division_schema = {}
-        sql_conn = pymysql.connect( host = self.config.get("mysql","host") ,
+        sql_conn = get_mysql_pool( host = self.config.get("mysql","host") ,
                             user = self.config.get("mysql","user") ,
                             passwd = self.config.get("mysql","passwd"),
                             port = self.config.getint("mysql","port") ,
                             db = self.config.get("mysql","db"),
-                            charset = "utf8" )
+                            charset = "utf8" ).connect()
         sql_cur = sql_conn.cursor() 
 
         # 初始化行政区域的关系schema
         sql_query_industry = "select name, id, level, parent_id from {}".format(self.config.get("mysql","res_division"))
-        sql_cur.execute(sql_query_industry)
-        divisions = sql_cur.fetchall()
+        divisions = get_schema_cache().fetchall(sql_cur, sql_query_industry)
         for division in divisions:
             division_name, division_id, division_level, division_parent_id = division
             self.division_schema[division_name] = {
@@ -127,10 +133,11 @@ class AddressParser(object):
         self.config.read(config_path)
         self.ak2 = 'xxxx'
         self.ak3 = 'xxxx'
+        self.geocode_cache = get_geocode_cache() # 百度地址解析结果本地缓存
 
         # TODO：行政区划使用的是common库中的数据
-        with open(os.path.join(dir_path,'prov_city_area_dict.json'),'r') as load_f:
-            self.all_address = json.load(load_f)
+        self.gazetteer = get_gazetteer(os.path.join(dir_path,'prov_city_area_dict.json')) # 行政区划自动机，进程内只构建一次
+        self.all_address = self.gazetteer.all_address
 
     def get_lng_lat(self, address):
 
@@ -142,6 +149,11 @@ class AddressParser(object):
         map_res['area'] = ''
         if not address:
             return map_res
+        # 优先查本地缓存，命中则不再请求百度接口
+        cache_res = self.geocode_cache.get(address)
+        if cache_res is not None:
+            return cache_res
+        start_time = time.time()
         to_ak = self.ak2
         url_new = 'http://api.map.baidu.com/geocoding/v3/?address='
         url = url_new
@@ -158,6 +170,9 @@ class AddressParser(object):
             map_res = self.get_geocode_info(map_index)
             map_res['longitude'] = lng
             map_res['latitude'] = lat
+            # 行政区划接口出错时不缓存，下次重新请求
+            if map_res['province']:
+                self.geocode_cache.set(address, map_res, cost=time.time()-start_time)
         return map_res
 
 
@@ -190,12 +205,12 @@ class AddressParser(object):
             "latitude": ""
         }
 
-        sql_conn = pymysql.connect( host = self.config.get("mysql","host") ,
+        sql_conn = get_mysql_pool( host = self.config.get("mysql","host") ,
                             user = self.config.get("mysql","user") ,
                             passwd = self.config.get("mysql","passwd"),
                             port = self.config.getint("mysql","port") ,
                             db = self.config.get("mysql","db"),
-                            charset = "utf8" )
+                            charset = "utf8" ).connect()
         sql_cur = sql_conn.cursor() 
         # 查询地方的经纬度信息
         sql_state = self.config.get("mysql","location_query").replace("eq","=").format(location_name)
@@ -279,64 +294,14 @@ class AddressParser(object):
 
 
     def match_addr(self, _address, _area=''):
-        all_dict = self.all_address
+        '''行政区划匹配，返回 (省, 市, 区县)，一次扫描地址完成'''
 
-        find_prov = False
-        find_city = False
-        find_area = False
         index_prov = ''
-        index_city = ''
-        index_area = ''
         if "省" in _area or _area in ["北京","天津","上海","重庆"]:
             index_prov = _area
-            find_prov = True
             if index_prov in ['北京市','天津市','上海市','重庆市']:
                 index_prov = index_prov.strip('市')
-        else:
-            for prov in all_dict:
-                if _address.find(prov)>-1:
-                    find_prov = True
-                    index_prov = prov
-                    break
-                elif prov.find('省')>-1 and _address.find(prov.strip('省'))>-1:
-                    find_prov = True
-                    index_prov = prov
-                    break
-        if not find_prov:
-                return ('','','')
-        for city in all_dict[index_prov]:
-            if _address.find(city)>-1:
-                find_city = True
-                index_city = city
-                break
-            elif city.find('市')>-1 and _address.find(city.strip('市'))>-1:
-                find_city = True
-                index_city = city
-                break
-        if not find_city:
-            for n_city in all_dict[index_prov]:
-                for n_area in all_dict[index_prov][n_city]:
-                    if _address.find(n_area)>-1:
-                        find_area = True
-                        index_city = n_city
-                        index_area = n_area
-                        break
-                    elif n_area.find('市')>-1 and _address.find(n_area.strip('市'))>-1:
-                        find_area = True
-                        index_city = n_city
-                        index_area = n_area
-                        break
-        else:
-            for area in all_dict[index_prov][index_city]:
-                if _address.find(area)>-1:
-                    find_area = True
-                    index_area = area
-                    break
-                elif area.find('市')>-1 and _address.find(area.strip('市'))>-1:
-                    find_area = True
-                    index_area = area
-                    break
-        return (index_prov,index_city,index_area)
+        return self.gazetteer.match_addr(_address, index_prov)
 
 
 if __name__ == "__main__":          
@@ -13,7 +13,6 @@ import sys
 from pymongo import MongoClient
 from pymongo import errors
 from pyArango.connection import Connection as ArangoConnection
-from pyArango.theExceptions import AQLFetchError
 import pymysql
 from dateutil import parser
 import datetime
@@ -23,6 +22,14 @@ import re
 import copy
 import requests
 import os
+main_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(main_path)
+from common_utils.classifier_client import ClassifierClient
+from common_utils.mysql_pool import get_mysql_pool
+from common_utils.schema_cache import get_schema_cache
+from common_utils.industry_tree import IndustryTree
+from common_utils.arango_cursor import iter_aql
+from common_utils.relation_writer import RelationWriter
 
 logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s - %(filename)s[line:%(lineno)d] - %(levelname)s: %(message)s')
@@ -41,7 +48,11 @@ class RelationPipeline(object):
         self.arango_con = ArangoConnection(arangoURL=self.config.get("arango","arango_url"),username= self.config.get("arango","user"),password=self.config.get("arango","passwd"))
         self.arango_db = self.arango_con[self.config.get("arango","db")]
         self.kb_conference = self.arango_db[self.config.get("arango","kb_conference")]
+        self.relation_writer = RelationWriter(self.arango_db, self.config.get("arango","kb_conference")) # 关系批量写入
         self.conference_url = self.config.get("url","conference_classifier")
+        # 会议分类接口支持 conference_list 批量分类，按批合并请求
+        self.conference_client = ClassifierClient(self.conference_url,
+                                    lambda confs: {"conference_list": [{"title": c["name"], "content": c["desc"]} for c in confs]})
         self._init_division_schema() # init division_schema from mysql
         self._init_industry_schema()
         self._init_conference_tag_schema()
@@ -51,17 +62,16 @@ class RelationPipeline(object):
     def _init_conference_tag_schema(self):
         # 会议分类类型加载
         self.conference_tags_schema = {}
-        sql_conn = pymysql.connect( host = self.config.get("mysql","host") ,
+        sql_conn = get_mysql_pool( host = self.config.get("mysql","host") ,
                             user = self.config.get("mysql","user") ,
                             passwd = self.config.get("mysql","passwd"),
                             port = self.config.getint("mysql","port") ,
                             db = self.config.get("mysql","db"),
-                            charset = "utf8" )
+                            charset = "utf8" ).connect()
         sql_cur = sql_conn.cursor() 
         # 查询企业相关的标签信息
         sql_state = self.config.get("mysql","conference_tags_query").replace("eq","=")
-        sql_cur.execute(sql_state)
-        datas = sql_cur.fetchall()
+        datas = get_schema_cache().fetchall(sql_cur, sql_state)
         for data in datas:
             tag_name, tag_type, tag_id = data
             tag = {
@@ -80,18 +90,17 @@ class RelationPipeline(object):
         行政区域实体关系加载
         '''
         self.division_schema = {}
-        sql_conn = pymysql.connect( host = self.config.get("mysql","host") ,
+        sql_conn = get_mysql_pool( host = self.config.get("mysql","host") ,
                             user = self.config.get("mysql","user") ,
                             passwd = self.config.get("mysql","passwd"),
                             port = self.config.getint("mysql","port") ,
                             db = self.config.get("mysql","db"),
-                            charset = "utf8" )
+                            charset = "utf8" ).connect()
         sql_cur = sql_conn.cursor() 
 
         # 初始化行政区域的关系schema
         sql_query_industry = "select name, id, level, parent_id from {}".format(self.config.get("mysql","res_division"))
-        sql_cur.execute(sql_query_industry)
-        divisions = sql_cur.fetchall()
+        divisions = get_schema_cache().fetchall(sql_cur, sql_query_industry)
         for division in divisions:
             division_name, division_id, division_level, division_parent_id = division
             self.division_schema[division_name] = {
@@ -110,18 +119,17 @@ class RelationPipeline(object):
         init loading industry schema at mysql res_industry table
         '''
         self.industry_schema = {}
-        sql_conn = pymysql.connect( host = self.config.get("mysql","host") ,
+        sql_conn = get_mysql_pool( host = self.config.get("mysql","host") ,
                             user = self.config.get("mysql","user") ,
                             passwd = self.config.get("mysql","passwd"),
                             port = self.config.getint("mysql","port") ,
                             db = self.config.get("mysql","db"),
-                            charset = "utf8" )
+                            charset = "utf8" ).connect()
         sql_cur = sql_conn.cursor() 
 
         # 初始化产业/产业领域 schema
         sql_query_industry = "select name, id, parent_id from {}".format(self.config.get("mysql","res_industry"))
-        sql_cur.execute(sql_query_industry)
-        labels = sql_cur.fetchall()
+        labels = get_schema_cache().fetchall(sql_cur, sql_query_industry)
         for industry in labels:
             industry_name, industry_id, parent_id = industry
             self.industry_schema[industry_id] = {
@@ -132,27 +140,11 @@ class RelationPipeline(object):
                 "object_parent_id": parent_id
             }
 
+        self.industry_tree = IndustryTree(self.industry_schema)
         sql_cur.close()
         sql_conn.close()
         logger.info("MYSQL industry schema 加载完成")
 
-    def get_related_industry_tags(self, industry_id):
-        '''
-        根据子领域名称递归返回领域及所有父领域标签
-        '''
-        relations = []
-        # 过滤招商领域与图谱定义不一致的
-        if not industry_id in self.industry_schema:
-            return relations
-        
-        relations.append(self.industry_schema[industry_id])
-        parent_id = self.industry_schema[industry_id]["object_parent_id"]
-        while (parent_id):
-            node = self.industry_schema[parent_id]
-            relations.append(node)
-            parent_id = node["object_parent_id"]
-        return relations
-
 
     def query_datas(self, process_date):
         
@@ -172,16 +164,13 @@ class RelationPipeline(object):
         iso_date_str = process_date + 'T00:00:00+08:00'
         iso_date = parser.parse(iso_date_str)
 
-        aql = "FOR conference IN {} FILTER conference.create_time >= '{}' SORT kb_conference.create_time return conference".format(
+        aql = "FOR conference IN {} FILTER conference.create_time >= '{}' SORT kb_conference.create_time return ".format(
                         self.config.get("arango","kb_conference"), iso_date) 
         #aql = "FOR conference IN {} FILTER conference._key=='5ea0f3c9bf45745dcf5d38b5' return conference".format(self.config.get("arango","kb_conference"))
-        
-        try:
-            res = self.arango_db.fetch_list(aql)
-        except AQLFetchError as e:
-            '''没有查到数据时，fetch_list会抛出异常'''
-            res = []
-            logger.warn("Arango会议库没有查到数据",e)
+        end_str_sql = "{'_key':conference._key,'name':conference.name,'properties':{'name':conference.properties.name,'desc':conference.properties.desc,'province':conference.properties.province,'city':conference.properties.city,'area':conference.properties.area}}"
+
+        # 流式游标，只返回关系处理需要的字段
+        res = iter_aql(self.arango_db, aql + end_str_sql)
 
         self.total = len(res)           
         logger.info("[{}]，会议知识库查到待处理数据[{}]个".format(process_date, self.total))
@@ -209,27 +198,19 @@ class RelationPipeline(object):
         return div_rel
 
         
-    def process_industry_rel(self,properties):
+    def process_industry_rel(self, properties, classify_res=None):
         '''
         会议分类标签ID化添加
+        classify_res 为批量分类接口已返回的分类结果，为None时单独请求分类接口
         '''
-        industry_rel = []
         conference_tag = []
 
         industry_field_tags = []
 
-        post_data = {
-            "conference_list": [ {
-                "title": properties["name"],
-                "content": properties["desc"]
-            } ],
-        
-        }
+        if classify_res is None:
+            classify_res = self.conference_client.classify([properties])[0]
         try:
-            res = requests.post(self.conference_url, data=json.dumps(post_data))
-
-            if res.status_code == 200:
-                classify_res = res.json().get("body")[0]
+            if classify_res:
                 # 验证是否返回对应字段的分类值
                 if "domain" in classify_res and classify_res["domain"]:
                     industry_field_tags.append(classify_res["domain"])
@@ -247,17 +228,14 @@ class RelationPipeline(object):
 
         #logger.info("会议分类结果=[{}]".format(industry_field_tags))
 
-        for industry_id in industry_field_tags:
-            for industry_node in self.get_related_industry_tags(industry_id):
-                if industry_node not in industry_rel:
-                    industry_rel.append(industry_node)
+        industry_rel = self.industry_tree.related_tags(industry_field_tags)
 
         return industry_rel, conference_tag
 
 
         
 
-    def process_relations(self, properties):
+    def process_relations(self, properties, classify_res=None):
         '''
         添加关系：行政区域、产业类别、渠道信息
         '''
@@ -265,7 +243,7 @@ class RelationPipeline(object):
         division_rel = self.process_division_rel(properties)
         relations.extend(division_rel)
 
-        industry_rel, conference_tag = self.process_industry_rel(properties)
+        industry_rel, conference_tag = self.process_industry_rel(properties, classify_res)
         relations.extend(industry_rel)
 	
         return relations, conference_tag
@@ -280,13 +258,15 @@ class RelationPipeline(object):
 
         # arango数据库企业信息处理
 
-        for data in datas:
+        # 会议分类接口批量并发请求，按原顺序返回每个会议的分类结果
+        classified_datas = self.conference_client.iter_classified(datas, lambda d: d["properties"])
+        for data, classify_res in classified_datas:
 
             #logger.info("处理会议关系，会议名=[{}]".format(data["name"]))
             conference_key = data["_key"]
             #if data["properties"]['city'] not in ["北京","上海","重庆","天津"]:
             #    continue
-            relations, conference_tag = self.process_relations(data["properties"])
+            relations, conference_tag = self.process_relations(data["properties"], classify_res)
             # 删除无分类属性的会议？
             # if not relations:
             #     try:
@@ -298,16 +278,7 @@ class RelationPipeline(object):
             #     except Exception as e:
             #         logger.error("会议数据移除失败，会议ID=[{}]".format(conference_key))
 
-            try:
-                doc = self.kb_conference[conference_key]
-                doc["relations"] = relations
-                doc["tags"] = conference_tag
-                doc["update_time"] = datetime.datetime.today()
-                doc.save()
-                #print('relations:',doc['relations'])
-                self.count_graph_update += 1
-            except Exception as e:
-                logger.error("会议标签、关系添加失败，会议名=[{}]".format(data["name"]))
+            self.relation_writer.add(conference_key, relations, tags=conference_tag)
 
 
             count += 1
@@ -315,6 +286,9 @@ class RelationPipeline(object):
             if count % 500 == 0 or count == self.total:
                 logger.info("前[{}]个会议标签、关系添加完成".format(count))
 
+        self.count_graph_update = self.relation_writer.flush()
+        if self.relation_writer.failed_keys:
+            logger.error("关系更新失败[{}]条".format(len(self.relation_writer.failed_keys)))
         logger.info("日期[{}]清洗库共找到会议{}个，arango会议库更新关系{}个".format(
             self.process_date, self.total, self.count_graph_update))
 
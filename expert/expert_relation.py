@@ -13,7 +13,6 @@ import sys
 from pymongo import MongoClient
 from pymongo import errors
 from pyArango.connection import Connection as ArangoConnection
-from pyArango.theExceptions import AQLFetchError
 import pymysql
 from dateutil import parser
 import datetime
@@ -23,6 +22,13 @@ import re
 import copy
 import requests
 import os
+main_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(main_path)
+from common_utils.classifier_client import ClassifierClient
+from common_utils.mysql_pool import get_mysql_pool
+from common_utils.schema_cache import get_schema_cache
+from common_utils.industry_tree import IndustryTree
+from common_utils.arango_cursor import iter_aql
 
 logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s - %(filename)s[line:%(lineno)d] - %(levelname)s: %(message)s')
@@ -43,6 +49,11 @@ class RelationPipeline(object):
         self.kb_expert = self.arango_db[self.config.get("arango","kb_expert")]
         self.kb_organization = self.arango_db[self.config.get("arango","kb_organization")]
         self.industry_url = self.config.get("url","expert_classifier")
+        # 专家分类接口只接受单个expert_id，批次大小固定为1，多个请求并发提交
+        self.industry_client = ClassifierClient(self.industry_url,
+                                    lambda ids: {"expert_id": ids[0]},
+                                    lambda body, batch: [body],
+                                    batch_size=1)
         self._init_division_schema() # init division_schema from mysql
         self._init_industry_schema()
         self.count_graph_update = 0 # arango更新关系数据数量
@@ -53,18 +64,17 @@ class RelationPipeline(object):
         行政区域实体关系加载
         '''
         self.division_schema = {}
-        sql_conn = pymysql.connect( host = self.config.get("mysql","host") ,
+        sql_conn = get_mysql_pool( host = self.config.get("mysql","host") ,
                             user = self.config.get("mysql","user") ,
                             passwd = self.config.get("mysql","passwd"),
                             port = self.config.getint("mysql","port") ,
                             db = self.config.get("mysql","db"),
-                            charset = "utf8" )
+                            charset = "utf8" ).connect()
         sql_cur = sql_conn.cursor() 
 
         # 初始化行政区域的关系schema
         sql_query_industry = "select name, id, level, parent_id from {}".format(self.config.get("mysql","res_division"))
-        sql_cur.execute(sql_query_industry)
-        divisions = sql_cur.fetchall()
+        divisions = get_schema_cache().fetchall(sql_cur, sql_query_industry)
         for division in divisions:
             division_name, division_id, division_level, division_parent_id = division
             self.division_schema[division_name] = {
@@ -83,18 +93,17 @@ class RelationPipeline(object):
         init loading industry schema at mysql res_industry table
         '''
         self.industry_schema = {}
-        sql_conn = pymysql.connect( host = self.config.get("mysql","host") ,
+        sql_conn = get_mysql_pool( host = self.config.get("mysql","host") ,
                             user = self.config.get("mysql","user") ,
                             passwd = self.config.get("mysql","passwd"),
                             port = self.config.getint("mysql","port") ,
                             db = self.config.get("mysql","db"),
-                            charset = "utf8" )
+                            charset = "utf8" ).connect()
         sql_cur = sql_conn.cursor() 
 
         # 初始化产业/产业领域 schema
         sql_query_industry = "select name, id, parent_id from {}".format(self.config.get("mysql","res_industry"))
-        sql_cur.execute(sql_query_industry)
-        labels = sql_cur.fetchall()
+        labels = get_schema_cache().fetchall(sql_cur, sql_query_industry)
         for industry in labels:
             industry_name, industry_id, parent_id = industry
             self.industry_schema[industry_id] = {
@@ -105,6 +114,7 @@ class RelationPipeline(object):
                 "object_parent_id": parent_id
             }
 
+        self.industry_tree = IndustryTree(self.industry_schema)
         sql_cur.close()
         sql_conn.close()
         logger.info("MYSQL industry schema 加载完成")
@@ -156,57 +166,23 @@ class RelationPipeline(object):
         
 
         
-    def get_related_industry_tags(self, industry_id):
-        '''
-        根据子领域名称递归返回领域及所有父领域标签
-        '''
-        relations = []
-        # 过滤招商领域与图谱定义不一致的
-        if not industry_id in self.industry_schema:
-            return relations
-        
-        relations.append(self.industry_schema[industry_id])
-        parent_id = self.industry_schema[industry_id]["object_parent_id"]
-        while (parent_id):
-            node = self.industry_schema[parent_id]
-            relations.append(node)
-            parent_id = node["object_parent_id"]
-        return relations
-
-        
-    def process_industry_rel(self, _key):
+    def process_industry_rel(self, _key, industry_field_tags=None):
         '''
         产业领域标签ID化添加
+        industry_field_tags 为并发请求分类接口已返回的分类结果，为None时单独请求分类接口
         '''
-        industry_tags = []
-
-        industry_field_tags = []
-        expert_id = _key
-
-        post_data = {
-            "expert_id":  expert_id ,
-        }
-        pack_data = json.dumps(post_data)
-        try:
-            res = requests.post(self.industry_url, data=pack_data)
-
-            if res.status_code == 200:
-                tags = res.json().get("body")
-                industry_field_tags.extend(tags)
-
-        except Exception as e:
-            logging.error("获取专家产业领域失败，专家id=[{}]，接口=[{}]".format(expert_id,self.industry_url),e)
+        if industry_field_tags is None:
+            industry_field_tags = self.industry_client.classify([_key])[0]
+        if not industry_field_tags:
+            industry_field_tags = []
 
-        for field in industry_field_tags:
-            for node in self.get_related_industry_tags(field["id"]):
-                if node not in industry_tags:
-                    industry_tags.append(node)
+        industry_tags = self.industry_tree.related_tags(field["id"] for field in industry_field_tags)
 
         return industry_tags
 
 
 
-    def process_relations(self, properties,_key):
+    def process_relations(self, properties,_key, industry_field_tags=None):
         '''
         添加关系
         '''
@@ -221,7 +197,7 @@ class RelationPipeline(object):
         relations.extend(organization_rel)
 
         # 关联产业分类
-        industry_rel = self.process_industry_rel(_key)
+        industry_rel = self.process_industry_rel(_key, industry_field_tags)
         relations.extend(industry_rel)
 
         return relations
@@ -262,12 +238,7 @@ class RelationPipeline(object):
         
         end_str_sql = "{'_key':expert._key,'name':expert.properties.name,'research_institution':expert.properties.research_institution,'province':expert.properties.province,'city':expert.properties.city,'area':expert.properties.area}"
 
-        try:
-            res = self.arango_db.AQLQuery(aql+end_str_sql, rawResults=True, batchSize=100)
-        except AQLFetchError as e:
-            '''没有查到数据时，fetch_list会抛出异常'''
-            res = []
-            logger.warn("Arango专家库没有查到数据",e)
+        res = iter_aql(self.arango_db, aql+end_str_sql)
 
         self.total = len(res)
         logger.info("[{}]，专家知识库查到待处理数据[{}]个".format(process_date, self.total))
@@ -282,11 +253,13 @@ class RelationPipeline(object):
         doc_list = []
         # arango数据库专家信息处理
 
-        for expert in process_experts:
+        # 产业分类接口并发请求，按原顺序返回每个专家的分类结果
+        classified_experts = self.industry_client.iter_classified(process_experts, lambda e: e["_key"])
+        for expert, industry_field_tags in classified_experts:
             count += 1
             #logger.info("处理专家关系，专家名=[{}]".format(expert["name"]))
             expert_key = expert["_key"]
-            relations = self.process_relations(expert, expert_key)
+            relations = self.process_relations(expert, expert_key, industry_field_tags)
             if not relations:
                 continue
             try:
@@ -19,6 +19,10 @@ from logging.handlers import RotatingFileHandler
 import copy
 from tqdm import tqdm
 
+main_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(main_path)
+from common_utils.author_kid_index import AuthorKidIndex
+
 logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s - %(filename)s[line:%(lineno)d] - %(levelname)s: %(message)s')
 
@@ -52,6 +56,7 @@ class ArticleClean(object):
         self.res_kb_expert_index = self.mongo_con[self.config.get("mongo", "res_kb_db")][
             self.config.get("mongo", "res_kb_expert_index")]
         self.count_update = 0
+        self.kid_index = None
         self.load_university()
 
     def load_university(self):
@@ -66,31 +71,22 @@ class ArticleClean(object):
 
         logger.info("高校信息加载完成")
 
-    def process_kId(self, author):
-        '''给author添加KID，返回KID字符串'''
-        university = author.get("university", "")
-        name = author["name"]
-        research_institution = author["research_institution"]
-        kId = ""
-        
+    def load_kid_index(self):
+        '''清洗库已有kId作者及专家索引一次性加载到内存'''
+        self.kid_index = AuthorKidIndex()
+        self.kid_index.load_resolved(self.res_kb_process_expert_article)
+        self.kid_index.load_index(self.res_kb_expert_index)
+
+    def author_institution(self, author):
         # 优先用university匹配
-        if university:
-            research_institution = university 
-        regex_str = ".*" + research_institution
-
-        # 查找库中已有数据
-        exist_data = self.res_kb_process_expert_article.find_one({"authors": {
-            "$elemMatch": {"name": name, "research_institution": {"$regex":regex_str}, "kId": {"$regex": ".{2,}"}}}})
-        if exist_data:
-            kId = list(filter(lambda x: x["name"] == name and "research_institution" in x and re.findall(regex_str, x["research_institution"]), exist_data["authors"]))[0]["kId"]
-       
-        # 查找index中数据
-        else:
-            index_data = self.res_kb_expert_index.find_one({"expert_name": name, "research_institution": {"$regex":regex_str}})
-            if index_data:
-                kId = index_data["kId"]
+        return author.get("university", "") or author["research_institution"]
 
-        return kId
+    def process_kId(self, author):
+        '''给author添加KID，返回KID字符串'''
+        if self.kid_index is None:
+            self.load_kid_index()
+        # 先查清洗库中已有数据，再查index中数据
+        return self.kid_index.resolve(author["name"], self.author_institution(author))
 
     def query_daily_data(self, crawl_date):
         if crawl_date == "yesterday":
@@ -125,11 +121,13 @@ class ArticleClean(object):
         docs = self.query_daily_data(crawl_date)
         total = docs.count()
         logging.info("日期[{}]查到待处理数据[{}]条".format(self.process_date, total))
+        self.load_kid_index()
 
         for doc in tqdm(docs):
             count += 1
             authors = doc["authors"]
             new_authors = []
+            resolved = []
             for author in authors:
                 # 添加高校名称字段
                 author["university"] = ""
@@ -141,6 +139,8 @@ class ArticleClean(object):
                 # 添加KID
                 if (not author["kId"]) and author["research_institution"]:
                     author["kId"] = self.process_kId(author)
+                    if author["kId"]:
+                        resolved.append(author)
 
                 new_authors.append(author)
 
@@ -148,6 +148,9 @@ class ArticleClean(object):
             result = self.res_kb_process_expert_article.update_one({"_id": doc["_id"]},
                                                                   {"$set": update})
             self.count_update += result.modified_count
+            # 本条成果新匹配到的作者加入索引，后续成果可直接命中
+            for author in resolved:
+                self.kid_index.add_resolved(author["name"], author.get("research_institution"), author["kId"])
 
         logging.info("[{}]论文数据KID添加完毕，共找到论文[{}]条，更新[{}]条".format(
             self.process_date, total, self.count_update))
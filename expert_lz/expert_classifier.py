@@ -1,4 +1,4 @@
-from pymongo import MongoClient
+from pymongo import MongoClient, UpdateOne
 import logging
 import os
 from tqdm import tqdm 
@@ -7,8 +7,15 @@ from logging.handlers import RotatingFileHandler
 import math 
 import numpy as np 
 import re 
+import sys
 import datetime
 
+main_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(main_path)
+from common_utils.aho_corasick import AhoCorasick
+from common_utils.expert_corpus import ExpertCorpusBuilder
+from common_utils.product_stats import ProductStatAccumulator, ProductStatStore, PRODUCT_STAT_PROJECTION
+
 dir_path = os.path.dirname(__file__)
 
 def set_log():
@@ -40,12 +47,17 @@ class ExpertClassifier(object):
         self.patent = self.client[DB][PATENT]
         self.project = self.client[DB][PROJECT]
         self.article = self.client[DB][ARTICLE]
+        self.corpus_builder = ExpertCorpusBuilder(self.patent, self.article, self.project) # 批量组装专家语料
         self.label = {}
         self.id2name = {}
         self.expert_max_abs = {}
         self.expert_max_normal = {}
         self.expert_min_normal = {}
+        self.automaton = AhoCorasick()      # 全部产品节点别名的多模式匹配自动机
+        self.padded = {}                    # 模式串id -> 是否为英文别名（原正则前后各带一个 [^A-Z]）
+        self.label_terms = {}               # 产品节点 -> [模式串id 或 预编译正则]，与 self.label 一一对应
         self.load_label()
+        self.stat_store = ProductStatStore(self.client[DB][PRODUCT_CHAIN])    # 节点正常范围增量维护
         
         
     def load_label(self):
@@ -60,10 +72,45 @@ class ExpertClassifier(object):
             self.id2name[node["_id"]] = node["name"]
             self.expert_max_normal[node["_id"]] = node["expert_max_normal"]
             self.expert_min_normal[node["_id"]] = node["expert_min_normal"]
+            self.label_terms[node["_id"]] = [self.add_term(w) for w in words]
+        self.automaton.build()
         logger.info("产业产品匹配节点加载完成")
         client.close()
 
 
+    def add_term(self, word):
+        '''
+        别名加入自动机，返回模式串id；含正则特殊字符的别名保留原正则匹配（预编译），返回编译后的正则
+        英文别名 [^A-Z]w[^A-Z] 作用在已转小写的文本上，等价于要求 w 前后各有一个字符，且两侧字符计入匹配范围
+        '''
+        padded = word.startswith("[^A-Z]") and word.endswith("[^A-Z]")
+        literal = word[6:-6] if padded else word
+        if not literal or re.escape(literal) != literal:
+            return re.compile(word)
+        pid = self.automaton.add(literal)
+        self.padded[pid] = padded
+        return pid
+
+    def count_terms(self, text):
+        '''
+        一次扫描文本，返回 {模式串id: 次数}
+        每个模式串按起始位置从左到右取不重叠的匹配，与 re.findall 对定长模式串的计数一致
+        '''
+        n = len(text)
+        counts = {}
+        last_end = {}
+        patterns = self.automaton.patterns
+        for start, pid in self.automaton.iter(text):
+            end = start + len(patterns[pid])
+            if self.padded[pid]:
+                if start < 1 or end >= n:
+                    continue
+                start, end = start - 1, end + 1
+            if start >= last_end.get(pid, 0):
+                counts[pid] = counts.get(pid, 0) + 1
+                last_end[pid] = end
+        return counts
+
     def classify(self, text):
         '''
         Function
@@ -83,12 +130,16 @@ class ExpertClassifier(object):
         res = []
         label_count = {}
         text = text.strip().lower() # 英文大小写归一化小写
+        term_counts = self.count_terms(text)
         
         # 产品词频统计
-        for key, words in self.label.items():
+        for key, terms in self.label_terms.items():
             count = 0
-            for word in words:
-                count += len(re.findall(word, text))
+            for term in terms:
+                if isinstance(term, int):
+                    count += term_counts.get(term, 0)
+                else:
+                    count += len(term.findall(text))
             if count > 2:
                 label_count[key] = count
                       
@@ -104,14 +155,18 @@ class ExpertClassifier(object):
             res.append(item)
         
         return res
+
+    def classify_batch(self, texts):
+        '''批量分类多个专家语料，返回与 texts 一一对应的 product_stat 列表'''
+
+        return [self.classify(text) for text in texts]
     
     def process_stat_all(self):
         
         # 计算专家关联产品节点词频
         # experts = self.expert.find({"properties.resource_count":{"$exists":False}}, no_cursor_timeout=True).sort([("_id",1)])
         experts = self.expert.find({},no_cursor_timeout=True).sort([("_id",1)])
-        for expert in tqdm(experts):
-            text, resource_count = self.gen_expert_corpus(expert)                           
+        for expert, text, resource_count in self.corpus_builder.iter_build(tqdm(experts)):
             ## 文本产品词频统计          
             product_nodes = self.classify(text)
             update = {
@@ -128,75 +183,40 @@ class ExpertClassifier(object):
     def stat_save_max(self):
         client = MongoClient(MONGO_URL)
         collection = client[DB][PRODUCT_CHAIN]
-        nodes = collection.find({"is_match":1})
-        # 节点上专家分布统计
-        for node in tqdm(nodes):
-            node_counts = []
-            node_id = node["_id"]
-            datas = self.expert.find({"properties.product_stat.product_id": node_id})
-            for data in datas:
-                node_count = list(filter(lambda x:x["product_id"] == node_id, data["properties"]["product_stat"]))[0]["product_count"]
-                node_counts.append(node_count)
-            node_counts.sort()
-            
-            # 计算某一节点的专家词频分布范围
-            if node_counts:
-                mean = np.mean(node_counts)
-                std = np.std(node_counts)
-                expert_max_normal = int(mean + 2 * std)
-                expert_min_normal = max(int(mean - 2 * std),0)
-                
-            else:
-                node_counts = [0]
-                expert_max_normal = 0
-                expert_min_normal = 0
-                
-            # 更新节点正常范围    
+        node_ids = [node["_id"] for node in collection.find({"is_match":1}, {"_id":1})]
+        # 节点上专家分布统计：全部专家的 product_stat 只读取一遍
+        stats = ProductStatAccumulator(node_ids)
+        datas = self.expert.find({"properties.product_stat.0": {"$exists": True}}, PRODUCT_STAT_PROJECTION, no_cursor_timeout=True)
+        for data in tqdm(datas):
+            stats.add(data["properties"]["product_stat"])
+        datas.close()
+
+        # 计算各节点的专家词频分布范围，一次批量更新节点正常范围
+        requests = []
+        for node_id, (expert_max_normal, expert_min_normal, expert_max_abs) in stats.compute().items():
             self.expert_max_normal[node_id] = expert_max_normal
             self.expert_min_normal[node_id] = expert_min_normal
-            collection.update_one({"_id":node_id},{"$set":{"expert_max_normal":expert_max_normal, "expert_min_normal":expert_min_normal, "expert_max_abs":node_counts[-1]}})
+            count, total, total_sq = stats.moments[node_id]
+            requests.append(UpdateOne({"_id":node_id},{"$set":{"expert_max_normal":expert_max_normal, "expert_min_normal":expert_min_normal, "expert_max_abs":expert_max_abs,
+                                                               "expert_stat_count":count, "expert_stat_sum":total, "expert_stat_sum_sq":total_sq}}))
+        if requests:
+            collection.bulk_write(requests, ordered=False)
+        # 全量统计结果作为增量维护的新起点
+        if self.stat_store.incremental:
+            self.stat_store.load()
         
         client.close()    
         logger.info("节点正常范围分布更新完成")
         
     def gen_expert_corpus(self, data):
-        # 待处理文本
-        text = ""
-        resource_count = 0
-        kids = data["properties"]["kId"]  
-        
-        # 各个KID数据融合统计    
-        for kid in kids:
-            # 专利数据
-            patents = self.patent.find({"properties.authors.kId":kid})
-            for patent in patents:
-                resource_count += 1
-                text += patent["properties"]["title"]
-                if patent["properties"]["abstract"]:
-                    text += "。" + patent["properties"]["abstract"]
-                    
-            # 论文数据
-            articles = self.article.find({"properties.authors.kId":kid})
-            for article in articles:
-                resource_count += 1
-                text += article["properties"]["title"]
-                if article["properties"]["abstract"]:
-                    text += "。" + article["properties"]["abstract"]
-                    
-            # 科研课题数据
-            projects = self.project.find({"properties.authors.kId":kid})
-            for project in projects:
-                resource_count += 1
-                text += project["properties"]["title"]
-                if project["properties"]["abstract"]:
-                    text += "。" + project["properties"]["abstract"]  
-                    
-        return text, resource_count      
+        # 待处理文本及成果数，批量组装见 ExpertCorpusBuilder
+        return self.corpus_builder.build([data])[0]
     
     def process_one(self, data):
         # 主函数：迭代专家进行统计 --》 分布情况统计 --》 评分
         
         text, resource_count = self.gen_expert_corpus(data)
+        old_product_stat = (data.get("properties") or {}).get("product_stat")
                         
         ## 文本产品词频统计          
         product_nodes = self.classify(text)
@@ -206,10 +226,17 @@ class ExpertClassifier(object):
                 "update_time": datetime.datetime.today()
             }
         self.expert.update_one({"_id":data["_id"]},{"$set": update})
+        # 增量更新专家词频变化节点的正常范围，评分使用最新阈值
+        for node_id in self.stat_store.update_expert(old_product_stat, product_nodes):
+            self.expert_max_normal[node_id], self.expert_min_normal[node_id] = self.stat_store.thresholds(node_id)
         expert_product_relations = self.score_one(update)
         return expert_product_relations
         
         
+    def flush_stats(self):
+        # 增量统计写回产品链节点
+        return self.stat_store.flush()
+        
     def cal_confidence(self, node):
         # 按产品频次绝对值打分  指标归一
         max_abs_normal = self.expert_max_normal[node["product_id"]]
@@ -14,6 +14,10 @@ import sys
 import datetime 
 import pymysql
 import os
+main_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(main_path)
+from common_utils.mysql_pool import get_mysql_pool
+from common_utils.schema_cache import get_schema_cache
 from dateutil import parser
 import logging 
 logging.basicConfig(
@@ -50,14 +54,13 @@ class ExpertFusionClean(object):
         self.client = MongoClient(MongoUrl)
         self.res_kb_expert_aminer = self.client[res_kb][res_kb_expert_aminer]
         self.res_kb_process_expert = self.client[res_kb_process][res_kb_process_expert]
-        self.sql_conn = pymysql.connect(**mysql_config)
+        self.sql_conn = get_mysql_pool(**mysql_config).connect()
         self.sql_cur = self.sql_conn.cursor()
         self.count_update = 0 # 更新记录
         
     def _init_prof_title(self):
         self.prof_title = []
-        self.sql_cur.execute(prof_title_query)
-        for t in self.sql_cur.fetchall():
+        for t in get_schema_cache().fetchall(self.sql_cur, prof_title_query):
             self.prof_title.append(t[0])
         self.prof_title.sort(key=lambda x:len(x),reverse=True)
         self.sql_cur.close()
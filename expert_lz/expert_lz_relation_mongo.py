@@ -23,7 +23,9 @@ import copy
 from tqdm import tqdm 
 main_path = os.path.dirname(os.path.abspath(__file__))
 sys.path.append(main_path)
+sys.path.append(os.path.dirname(main_path))
 from expert_classifier import ExpertClassifier
+from common_utils.coauthor_index import build_coauthor_index, touched_experts
 
 logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s - %(filename)s[line:%(lineno)d] - %(levelname)s: %(message)s')
@@ -54,6 +56,10 @@ class ExpertRelation(object):
         self.kb_expert_lz_article = self.mongo_con[self.config.get("mongo","kb_arango")][self.config.get("mongo","kb_expert_article")]
         self.kb_expert_lz_project = self.mongo_con[self.config.get("mongo","kb_arango")][self.config.get("mongo","kb_expert_project")]
         self.count_update = 0
+        # incremental=true 时只处理关联成果在处理日期之后有更新的专家，否则处理全部专家
+        self.incremental = self.config.getboolean("expert_relation", "incremental", fallback=False)
+        self.batch_size = self.config.getint("expert_relation", "batch_size", fallback=1000)
+        self.resource_collections = [self.kb_expert_lz_article, self.kb_expert_lz_patent, self.kb_expert_lz_project]
         
 
     def query_daily_data(self, crawl_date):
@@ -73,62 +79,37 @@ class ExpertRelation(object):
         iso_date_str = crawl_date + 'T00:00:00+08:00'
         iso_date = parser.parse(iso_date_str)
         # res = self.kb_expert_lz.find({"update_time": {"$gte": iso_date}}).sort([("_id",1)])
-        res = self.kb_expert_lz.find({}, no_cursor_timeout=True).sort([("_id",1)])
-        return res
+        if self.incremental:
+            # 成果库各读一次，建立相关专家的合作关系索引
+            expert_ids = touched_experts(self.resource_collections, iso_date, self.batch_size)
+            logger.info("日期[{}]之后有更新的成果关联专家[{}]位".format(crawl_date, len(expert_ids)))
+            self.coauthor_index = build_coauthor_index(self.resource_collections, expert_ids, self.batch_size)
+            # 专家id按 batch_size 分批 $in 查询，避免查询条件超过 BSON 大小限制
+            expert_ids = sorted(expert_ids)
+            chunks = [expert_ids[i:i + self.batch_size] for i in range(0, len(expert_ids), self.batch_size)]
+            total = sum(self.kb_expert_lz.count_documents({"_id": {"$in": chunk}}) for chunk in chunks)
+            res = self.iter_experts(chunks)
+        else:
+            self.coauthor_index = build_coauthor_index(self.resource_collections, batch_size=self.batch_size)
+            res = self.kb_expert_lz.find({}, no_cursor_timeout=True).sort([("_id",1)])
+            total = res.count()
+        return res, total
+
+    def iter_experts(self, chunks):
+        '''按批读取专家，整体仍按 _id 升序'''
+
+        for chunk in chunks:
+            cursor = self.kb_expert_lz.find({"_id": {"$in": chunk}}, no_cursor_timeout=True).sort([("_id",1)])
+            try:
+                for doc in cursor:
+                    yield doc
+            finally:
+                cursor.close()
     
     def process_expert_expert_relation(self, doc):
-        relations = []
-        
-        expert_id = doc["_id"]
-        # 论文合作作者
-        articles = self.kb_expert_lz_article.find({"relations.object_id":expert_id})
-        for article in articles:
-            author_relation = list(filter(lambda x:x["object_type"] == "expert", article["relations"]))
-            for rel in author_relation:
-                if rel["object_id"] == doc["_id"]:
-                    continue 
-                relation = {
-                    "relation_type":"concept_relation/100021",
-                    "object_type":"expert",
-                    "object_name": rel["object_name"],
-                    "object_id": rel["object_id"]
-                }
-                if relation not in relations:
-                    relations.append(relation)
-                    
-        # 专利合作作者
-        patents = self.kb_expert_lz_patent.find({"relations.object_id":expert_id})
-        for patent in patents:
-            author_relation = list(filter(lambda x:x["object_type"] == "expert", patent["relations"]))
-            for rel in author_relation:
-                if rel["object_id"] == doc["_id"]:
-                    continue 
-                relation = {
-                    "relation_type":"concept_relation/100021",
-                    "object_type":"expert",
-                    "object_name": rel["object_name"],
-                    "object_id": rel["object_id"]
-                }
-                if relation not in relations:
-                    relations.append(relation)
-                    
-        # 科研课题合作作者
-        projects = self.kb_expert_lz_project.find({"relations.object_id":expert_id})
-        for project in projects:
-            author_relation = list(filter(lambda x:x["object_type"] == "expert", project["relations"]))
-            for rel in author_relation:
-                if rel["object_id"] == doc["_id"]:
-                    continue 
-                relation = {
-                    "relation_type":"concept_relation/100021",
-                    "object_type":"expert",
-                    "object_name": rel["object_name"],
-                    "object_id": rel["object_id"]
-                }
-                if relation not in relations:
-                    relations.append(relation)
-                    
-        return relations
+        '''论文、专利、科研课题合作作者，从合作关系索引中读取'''
+
+        return self.coauthor_index.relations(doc["_id"])
         
     
     def process_relations(self, doc):
@@ -159,8 +140,7 @@ class ExpertRelation(object):
         '''
 
         count = 0
-        docs = self.query_daily_data(crawl_date)
-        total = docs.count()
+        docs, total = self.query_daily_data(crawl_date)
         logging.info("日期[{}]查到待处理数据[{}]条".format(self.process_date, total))
         batch_data = []
         self.expert_product_classifer = ExpertClassifier()
@@ -175,6 +155,7 @@ class ExpertRelation(object):
                 self.kb_expert_lz.update_one({"_id":doc["_id"]},{"$set":update})
                 self.count_update += 1
 
+        self.expert_product_classifer.flush_stats()
 
         logging.info("[{}]专家数据关联完毕，共找到记录[{}]条，添加关系记录[{}]条".format(
                     self.process_date, total, self.count_update) )
@@ -21,6 +21,10 @@ from dateutil import parser
 import pymysql
 import os
 
+main_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(main_path)
+from common_utils.mysql_pool import get_mysql_pool
+from common_utils.schema_cache import get_schema_cache
 logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s - %(filename)s[line:%(lineno)d] - %(levelname)s: %(message)s')
 
@@ -58,16 +62,15 @@ class FinancingClean(object):
 
         self.f_round_schema = {}
 
-        sql_conn = pymysql.connect( host = "xxx" ,
+        sql_conn = get_mysql_pool( host = "xxx" ,
                 user = "xxx",
                 passwd = "xxx",
                 port = 0 ,
                 db = "xxx",
-                charset = "utf8" )
+                charset = "utf8" ).connect()
         sql_cur = sql_conn.cursor() 
         currency_sql = "select name,alter_names from res_invest_round"
-        sql_cur.execute(currency_sql)
-        for c in sql_cur.fetchall():
+        for c in get_schema_cache().fetchall(sql_cur, currency_sql):
             f_round = [c[0]]
             if c[1]:
                 f_round.extend(c[1].split("|")) 
@@ -81,16 +84,15 @@ class FinancingClean(object):
 
         self.currency_world_code = {}
 
-        sql_conn = pymysql.connect( host = "xxx" ,
+        sql_conn = get_mysql_pool( host = "xxx" ,
                 user = "xxx",
                 passwd = "xxx",
                 port = 0 ,
                 db = "xxx",
-                charset = "utf8" )
+                charset = "utf8" ).connect()
         sql_cur = sql_conn.cursor() 
         currency_sql = "select name,alter_names,name_en from res_currency"
-        sql_cur.execute(currency_sql)
-        for c in sql_cur.fetchall():
+        for c in get_schema_cache().fetchall(sql_cur, currency_sql):
             keywords = [c[0],c[2]]
             keywords.extend(c[1].split("|")) 
             keywords = list(set(keywords))
@@ -23,6 +23,10 @@ import re
 import copy
 import requests
 import os
+main_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(main_path)
+from common_utils.mysql_pool import get_mysql_pool
+from common_utils.schema_cache import get_schema_cache
 import bson
 
 logging.basicConfig(level=logging.INFO,
@@ -58,16 +62,15 @@ class KbpPipeline(object):
 
         self.f_round_sort = {}
 
-        sql_conn = pymysql.connect( host = "xxx" ,
+        sql_conn = get_mysql_pool( host = "xxx" ,
                 user = "xxx",
                 passwd = "xxx",
                 port = 0,
                 db = "xxx",
-                charset = "xxx" )
+                charset = "xxx" ).connect()
         sql_cur = sql_conn.cursor() 
         currency_sql = "select name,sequence from res_invest_round where sequence is not null"
-        sql_cur.execute(currency_sql)
-        for c in sql_cur.fetchall():
+        for c in get_schema_cache().fetchall(sql_cur, currency_sql):
             self.f_round_sort[c[0]] = c[1]
 
         sql_cur.close()
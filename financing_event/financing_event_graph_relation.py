@@ -13,7 +13,7 @@ import logging
 import time
 import datetime
 from pyArango.connection import Connection as ArangoConnection
-from py2neo import Graph, Relationship, NodeMatcher
+from py2neo import Graph
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -30,23 +30,56 @@ ARANGO_COLLECTION = "xxx"
 NEO4J_URL = "http://xxx"
 NEO4J_USER = "xxx"
 NEO4J_PASSWD = "xxx"
+NEO4J_BATCH_SIZE = 1000                     ## 每个UNWIND事务处理的结点名/关系数
+
+## 一批名称查找结点id, 先查投资机构, 找不到再查企业
+RESOLVE_CYPHER = (
+    "UNWIND $names AS name "
+    "OPTIONAL MATCH (i:InvestInstitution {name: name}) "
+    "WITH name, head(collect(id(i))) AS node_id "
+    "OPTIONAL MATCH (c:Company {name: name}) WHERE node_id IS NULL "
+    "WITH name, node_id, head(collect(id(c))) AS company_id "
+    "RETURN name, coalesce(node_id, company_id) AS node_id"
+)
+## 一批同类型关系, 关系类型不能作为参数, 按类型分别执行
+CREATE_CYPHER = (
+    "UNWIND $rows AS row "
+    "MATCH (s) WHERE id(s) = row.start_id "
+    "MATCH (e) WHERE id(e) = row.end_id "
+    "CREATE (s)-[r:`{}`]->(e) "
+    "SET r = row.props "
+    "RETURN count(r) AS created"
+)
+RELATION_PROPERTIES = ["url", "source", "financing_round", "financing_date", "raw_financing_money",
+                       "financing_money", "financing_proportion", "industry", "news"]
 
 
 class FinancingEventGraphRelation:
 
     def __init__(self):
         self.graph = Graph(NEO4J_URL, username=NEO4J_USER, password=NEO4J_PASSWD)
-        self.node_matcher = NodeMatcher(self.graph)
 
 
-    def find_node(self, name):
-        ## 首先查找投资机构
-        node = None
-        node = self.node_matcher.match("InvestInstitution", name=name).first()
-        ## 再查找企业
-        if not node:
-            node = self.node_matcher.match("Company", name=name).first()
-        return node
+    def resolve_nodes(self, names):
+        '''名称 -> 结点id, 每 NEO4J_BATCH_SIZE 个名称一次查询, 找不到的名称不在返回结果中'''
+        node_ids = {}
+        names = list(names)
+        for i in range(0, len(names), NEO4J_BATCH_SIZE):
+            for record in self.graph.run(RESOLVE_CYPHER, names=names[i:i + NEO4J_BATCH_SIZE]).data():
+                if record["node_id"] is not None:
+                    node_ids[record["name"]] = record["node_id"]
+        return node_ids
+
+
+    def create_relationships(self, relation_name, rows):
+        '''同类型关系按批在一个事务中创建, 返回创建数量'''
+        created = 0
+        for i in range(0, len(rows), NEO4J_BATCH_SIZE):
+            tx = self.graph.begin()
+            res = tx.run(CREATE_CYPHER.format(relation_name), rows=rows[i:i + NEO4J_BATCH_SIZE]).data()
+            tx.commit()
+            created += res[0]["created"] if res else 0
+        return created
 
 
     def process(self, date_str):
@@ -81,10 +114,11 @@ class FinancingEventGraphRelation:
             logger.error("查询arangodb错误: " + str(e))
 
         ## 导入投融资事件关系, 在vertex脚本中就已经导入实体节点
+        ## 先收集当天全部关系和端点名称, 一次解析端点结点, 再按关系类型批量创建
+        pending = []
         for result in results:
             source_count += 1
 
-            ## 关系导入
             for relation in result["relations"]:
                 start = relation["start"]
                 end = relation["end"]
@@ -93,30 +127,24 @@ class FinancingEventGraphRelation:
                         start = entity["externalReference"]["name"]
                     if entity["name"] == end and entity["externalReference"]:
                         end = entity["externalReference"]["name"]
-                        
-                start_node = self.find_node(start)
-                end_node = self.find_node(end)
-                relation_type = relation["relation_type"]
-                relation_name = relation["relation_name"]
-
-                if start_node and end_node:
-                    relationship = Relationship(start_node, relation_name, end_node)
-                    relationship["id"]                      = result["_id"]
-                    relationship["url"]                     = result["properties"]["url"]
-                    relationship["source"]                  = result["properties"]["source"]
-                    relationship["financing_round"]         = result["properties"]["financing_round"]
-                    relationship["financing_date"]          = result["properties"]["financing_date"]
-                    relationship["raw_financing_money"]     = result["properties"]["raw_financing_money"]
-                    relationship["financing_money"]         = result["properties"]["financing_money"]
-                    relationship["financing_proportion"]    = result["properties"]["financing_proportion"]
-                    relationship["industry"]                = result["properties"]["industry"]
-                    relationship["news"]                    = result["properties"]["news"]
-
-                    self.graph.create(relationship)
-                    relationship_count += 1
-                else:
-                    logger.error("未找到关系节点, 起始节点: {} - {} ^^^, 终止节点: {} - {}".format(relation["start"], start, relation["end"], end))
-                
+
+                props = {"id": result["_id"]}
+                for key in RELATION_PROPERTIES:
+                    props[key] = result["properties"][key]
+                pending.append((relation, start, end, props))
+
+        node_ids = self.resolve_nodes(set(name for _, start, end, _ in pending for name in (start, end)))
+        rows_by_type = {}
+        for relation, start, end, props in pending:
+            if start in node_ids and end in node_ids:
+                rows_by_type.setdefault(relation["relation_name"], []).append(
+                    {"start_id": node_ids[start], "end_id": node_ids[end], "props": props})
+            else:
+                logger.error("未找到关系节点, 起始节点: {} - {} ^^^, 终止节点: {} - {}".format(relation["start"], start, relation["end"], end))
+
+        for relation_name, rows in rows_by_type.items():
+            relationship_count += self.create_relationships(relation_name, rows)
+
         end_time = time.time()
         logger.info("关系导入结束, 共有事件 {} 条, 导入neo4j关系有 {} 条, 共耗时".format(source_count, relationship_count, int(end_time - start_time)))
 
@@ -14,7 +14,7 @@ import time
 import datetime
 from tqdm import tqdm
 from pyArango.connection import Connection as ArangoConnection
-from py2neo import Graph, Node, NodeMatcher, Relationship
+from py2neo import Graph
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -31,24 +31,64 @@ ARANGO_COLLECTION = "xxx"                        ## 投融资事件库
 NEO4J_URL = "http://xxx"
 NEO4J_USER = "xxx"
 NEO4J_PASSWD = "xxx"
+NEO4J_BATCH_SIZE = 1000                 ## 每个UNWIND事务处理的结点/名称数
+ARANGO_BATCH_SIZE = 1000                ## 每次DOCUMENT()查询的企业数
+
+## 一批名称中图谱里已有同名企业或投资机构结点的名称
+EXIST_CYPHER = (
+    "UNWIND $names AS name MATCH (n:Company {name: name}) RETURN name "
+    "UNION "
+    "UNWIND $names AS name MATCH (n:InvestInstitution {name: name}) RETURN name"
+)
+## 一批同标签结点, 标签不能作为参数, 按标签分别执行
+CREATE_CYPHER = "UNWIND $rows AS r CREATE (n:`{}`) SET n = r RETURN count(n) AS created"
 
 
 class FinancingEventGraphVertex:
 
     def __init__(self):
         self.graph = Graph(NEO4J_URL, username=NEO4J_USER, password=NEO4J_PASSWD)
-        self.node_matcher = NodeMatcher(self.graph)
         self.arango_connector = ArangoConnection(arangoURL=ARANGO_URL,
                                                  username=ARANGO_USER,
                                                  password=ARANGO_PASSWD)
 
         self.arango_db = self.arango_connector[ARANGO_DB]
 
-    ## 根据id获取企业库信息
-    def fetch_company(self, company_id):
-        collection = self.arango_db[COMPANY_COLLECTION]
-        company_id = company_id.split("/")[1]
-        return collection[company_id]
+    ## 根据一批id获取企业库信息, 返回 {_key: 企业}
+    def fetch_companies(self, company_ids):
+        keys = list(set(company_id.split("/")[1] for company_id in company_ids))
+        companies = {}
+        aql = "FOR doc IN DOCUMENT(@ids) RETURN doc"
+        for i in range(0, len(keys), ARANGO_BATCH_SIZE):
+            ids = [COMPANY_COLLECTION + "/" + key for key in keys[i:i + ARANGO_BATCH_SIZE]]
+            query = self.arango_db.AQLQuery(aql, rawResults=True, batchSize=len(ids), bindVars={"ids": ids})
+            for company in query.result:
+                if company:
+                    companies[company["_key"]] = company
+        return companies
+
+
+    ## 图谱中已有同名企业或投资机构结点的名称
+    def exist_names(self, names):
+        names = list(names)
+        exists = set()
+        for i in range(0, len(names), NEO4J_BATCH_SIZE):
+            for record in self.graph.run(EXIST_CYPHER, names=names[i:i + NEO4J_BATCH_SIZE]).data():
+                exists.add(record["name"])
+        return exists
+
+
+    ## 同标签结点按批在一个事务中创建, 返回创建数量
+    def create_nodes(self, label, rows):
+        created = 0
+        for i in range(0, len(rows), NEO4J_BATCH_SIZE):
+            tx = self.graph.begin()
+            res = tx.run(CREATE_CYPHER.format(label), rows=rows[i:i + NEO4J_BATCH_SIZE]).data()
+            tx.commit()
+            created += res[0]["created"] if res else 0
+            for row in rows[i:i + NEO4J_BATCH_SIZE]:
+                logger.info("插入节点: {}, 类型: {}".format(row["name"], label))
+        return created
 
 
     def process(self, date_str):
@@ -79,53 +119,66 @@ class FinancingEventGraphVertex:
             logger.error("查询arangodb错误: " + str(e))
 
         ## 从arangodb中导入实体节点，如果arangodb中也不存在, 那就只有实体节点的名称
+        ## 先收集当天全部待导入实体, 企业信息一次批量获取
+        entities = []
         for result in tqdm(results):
             source_count += 1
-            ## 实体导入
             for entity in result["entities"]:
                 ## 创建标签节点
                 label = "InvestInstitution"
                 if entity["type"] == "company":
                     label = "Company"
-                
-                node = Node(label)
-                if not entity["externalReference"]:             ## 企业库、投资机构库中没有，需要创建节点
-                    node["name"] = entity["name"]
-                elif label == "Company":                        ## 企业节点需要跟随事件导入
-                    company = self.fetch_company(entity["externalReference"]["id"])
-                    node["name"]                            = company["name"]
-                    node["alter_names"]                     = company["alter_names"]
-                    node["address"]                         = company["properties"]["address"]
-                    node["business_scope"]                  = company["properties"]["business_scope"]
-                    node["description"]                     = company["properties"]["desc"]
-                    node["email"]                           = company["properties"]["email"]
-                    node["phone"]                           = company["properties"]["phone"]
-                    node["logo"]                            = company["properties"]["logo_img"]
-                    node["name_en"]                         = company["properties"]["name_en"]
-                    node["province"]                        = company["properties"]["province"]
-                    node["city"]                            = company["properties"]["city"]
-                    node["profession"]                      = company["properties"]["profession"]
-                    node["webiste"]                         = company["properties"]["website"]
-                    node["legal_person"]                    = company["properties"]["legal_person"]
                 ## 投资机构之前已经导入
-                else:
+                if entity["externalReference"] and label != "Company":
                     continue
-
-                ## 检查是否有重复节点
-                duplicate = False
-                companys = self.node_matcher.match('Company', name=node["name"])
-                if len(companys):
-                    duplicate = True
-                else:
-                    investors = self.node_matcher.match("InvestInstitution", name=node["name"])
-                    if len(investors):
-                        duplicate = True
-                
-                if not duplicate:
-                    self.graph.create(node)
-                    logger.info("插入节点: {}, 类型: {}".format(node["name"], label))
-                else:
-                    logger.info("数据库内已有相同节点: {}".format(node["name"]))
+                entities.append((label, entity))
+
+        companies = self.fetch_companies(entity["externalReference"]["id"] for label, entity in entities
+                                         if entity["externalReference"])
+
+        nodes = {}                              ## 名称 -> (标签, 属性), 同名实体只导入第一个
+        for label, entity in entities:
+            node = {}
+            if not entity["externalReference"]:             ## 企业库、投资机构库中没有，需要创建节点
+                node["name"] = entity["name"]
+            else:                                           ## 企业节点需要跟随事件导入
+                company = companies.get(entity["externalReference"]["id"].split("/")[1])
+                if not company:
+                    logger.error("企业库中未找到企业: {}".format(entity["externalReference"]["id"]))
+                    continue
+                node["name"]                            = company["name"]
+                node["alter_names"]                     = company["alter_names"]
+                node["address"]                         = company["properties"]["address"]
+                node["business_scope"]                  = company["properties"]["business_scope"]
+                node["description"]                     = company["properties"]["desc"]
+                node["email"]                           = company["properties"]["email"]
+                node["phone"]                           = company["properties"]["phone"]
+                node["logo"]                            = company["properties"]["logo_img"]
+                node["name_en"]                         = company["properties"]["name_en"]
+                node["province"]                        = company["properties"]["province"]
+                node["city"]                            = company["properties"]["city"]
+                node["profession"]                      = company["properties"]["profession"]
+                node["webiste"]                         = company["properties"]["website"]
+                node["legal_person"]                    = company["properties"]["legal_person"]
+            if node["name"] not in nodes:
+                nodes[node["name"]] = (label, node)
+            else:                                           ## 同名节点已随前一个实体导入
+                logger.info("数据库内已有相同节点: {}".format(node["name"]))
+
+        ## 检查是否有重复节点
+        exists = self.exist_names(nodes)
+        rows_by_label = {}
+        for name, (label, node) in nodes.items():
+            if name in exists:
+                logger.info("数据库内已有相同节点: {}".format(name))
+            else:
+                rows_by_label.setdefault(label, []).append(node)
+
+        for label, rows in rows_by_label.items():
+            node_count += self.create_nodes(label, rows)
+
+        end_time = time.time()
+        logger.info("节点导入结束, 共有事件 {} 条, 导入neo4j节点 {} 个, 共耗时 {} 秒".format(source_count, node_count, int(end_time - start_time)))
 
 
 if __name__ == "__main__":
@@ -24,7 +24,7 @@ from tqdm import tqdm
 
 main_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.append(main_path)
-from common_utils.neo4j_helper import Neo4jHelper
+from common_utils.neo4j_helper import Neo4jBatchUpserter
 
 logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s - %(filename)s[line:%(lineno)d] - %(levelname)s: %(message)s')
@@ -85,7 +85,7 @@ class GraphPipeline(object):
                     username = self.config.get("neo","user"),
                     password = self.config.get("neo","passwd")                          
                     )
-        neo4j_helper = Neo4jHelper(self.graph)
+        neo4j_upserter = Neo4jBatchUpserter(self.graph, self.label) # 按批UNWIND MERGE写入
         count = 0
         
         for data in tqdm(datas):
@@ -96,11 +96,12 @@ class GraphPipeline(object):
             properties["update_time"] = datetime.datetime.today().strftime("%Y-%m-%d %H:%M:%S")
             properties.pop("leaders")
             properties.pop("shareholder")
-            neo4j_helper.upsert_node(self.label, properties)
+            neo4j_upserter.add(properties)
             count += 1
+        count_create, count_update = neo4j_upserter.flush()
 
-        logger.info("日期[{}]投资机构构建库共找到记录[{}]个，图数据库更新结点[{}]个".format(
-            self.process_date, self.total, count))
+        logger.info("日期[{}]投资机构构建库共找到记录[{}]个，图数据库更新结点[{}]个，其中新建[{}]个、更新[{}]个、失败[{}]个".format(
+            self.process_date, self.total, count, count_create, count_update, neo4j_upserter.count_failed))
 
 if __name__=="__main__":
 
@@ -26,6 +26,8 @@ main_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.append(main_path)
 
 from common_utils.address_parser import AddressParser
+from common_utils.mysql_pool import get_mysql_pool
+from common_utils.schema_cache import get_schema_cache
 
 logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s - %(filename)s[line:%(lineno)d] - %(levelname)s: %(message)s')
@@ -55,12 +57,12 @@ class InvestInstitutionClean(object):
         self.res_kb_invest_institution = self.mongo_con[self.config.get("mongo","res_kb_db")][self.config.get("mongo","res_kb_invest_institution")] # 投资机构信息，爬虫库
         self.res_kb_process_invest_institution = self.mongo_con[self.config.get("mongo","res_kb_process")][self.config.get("mongo","process_invest_institution")] # 投资机构信息，清洗库
         # 投资机构tags标签，人工整理
-        self.sql_conn = pymysql.connect( host = self.config.get("mysql","host") ,
+        self.sql_conn = get_mysql_pool( host = self.config.get("mysql","host") ,
                 user = self.config.get("mysql","user"),
                 passwd = self.config.get("mysql","passwd"),
                 port = self.config.getint("mysql","port") ,
                 db = self.config.get("mysql","db"),
-                charset = self.config.get("mysql","charset") )
+                charset = self.config.get("mysql","charset") ).connect()
         self.sql_cur = self.sql_conn.cursor() 
         self.address_parser = AddressParser()
         self.alter_url = self.config.get("url","alter_name")
@@ -76,16 +78,15 @@ class InvestInstitutionClean(object):
         self.f_round_schema = {}
         self.f_round_sort = {}
 
-        sql_conn = pymysql.connect( host = "xxxx" ,
+        sql_conn = get_mysql_pool( host = "xxxx" ,
                 user = "xxxx",
                 passwd = "xxxx",
                 port = 0000 ,
                 db = "xxxx",
-                charset = "xxxx" )
+                charset = "xxxx" ).connect()
         sql_cur = sql_conn.cursor() 
         currency_sql = "select name,alter_names,sequence from res_invest_round where sequence is not null"
-        sql_cur.execute(currency_sql)
-        for c in sql_cur.fetchall():
+        for c in get_schema_cache().fetchall(sql_cur, currency_sql):
             f_round = [c[0]]
             self.f_round_sort[c[0]] = c[2]
             if c[1]:
@@ -99,8 +100,7 @@ class InvestInstitutionClean(object):
 
         self.currency_world_code = {}
         currency_sql = "select name,alter_names,name_en from res_currency"
-        self.sql_cur.execute(currency_sql)
-        for c in self.sql_cur.fetchall():
+        for c in get_schema_cache().fetchall(self.sql_cur, currency_sql):
             keywords = [c[0],c[2]]
             keywords.extend(c[1].split("|")) 
             keywords = list(set(keywords))
@@ -110,8 +110,7 @@ class InvestInstitutionClean(object):
 
         self.company_types = {}
         sql = "select name,alter_names from res_company_type"
-        self.sql_cur.execute(sql)
-        for c in self.sql_cur.fetchall():
+        for c in get_schema_cache().fetchall(self.sql_cur, sql):
             keywords = c[1].split("|")
             self.company_types[c[0]] = keywords
 
@@ -23,6 +23,11 @@ import copy
 import requests
 import os
 
+main_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(main_path)
+from common_utils.mysql_pool import get_mysql_pool
+from common_utils.schema_cache import get_schema_cache
+from common_utils.kb_bulk_loader import KbBulkLoader
 logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s - %(filename)s[line:%(lineno)d] - %(levelname)s: %(message)s')
 logger = logging.getLogger(__name__)
@@ -41,6 +46,7 @@ class KbpPipeline(object):
         self.res_kb_process_invest_institution = self.mongo_con[self.config.get("mongo","res_kb_process")][self.config.get("mongo","process_invest_institution")] # 清洗库
         self.arango_con = ArangoConnection(arangoURL=self.config.get("arango","arango_url"),username= self.config.get("arango","user"),password=self.config.get("arango","passwd"))
         self.graph_kb_invest_institution = self.arango_con[self.config.get("arango","db")][self.config.get("arango","kb_invest_institution")]
+        self.kb_loader = KbBulkLoader(self.arango_con[self.config.get("arango","db")], self.config.get("arango","kb_invest_institution"), key_field="name") # 批量查重、批量新增
         self._init_label_schema() # init self.label_schema from mysql
         self.count_graph_insert = 0 # arango新增数据数量
         self.count_graph_exist = 0 # 投资机构信息在图数据库中
@@ -52,18 +58,17 @@ class KbpPipeline(object):
         '''
         self.label_schema = {}
         self.industry_schema = {}
-        sql_conn = pymysql.connect( host = self.config.get("mysql","host") ,
+        sql_conn = get_mysql_pool( host = self.config.get("mysql","host") ,
                             user = self.config.get("mysql","user") ,
                             passwd = self.config.get("mysql","passwd"),
                             port = self.config.getint("mysql","port") ,
                             db = self.config.get("mysql","db"),
-                            charset = "utf8" )
+                            charset = "utf8" ).connect()
         sql_cur = sql_conn.cursor() 
 
         # 初始化投资机构标签schema
         sql_query_label = "select name, type, id from {}".format(self.config.get("mysql","res_tag"))
-        sql_cur.execute(sql_query_label)
-        labels = sql_cur.fetchall()
+        labels = get_schema_cache().fetchall(sql_cur, sql_query_label)
         for label in labels:
             label_name, label_type, label_id = label
             self.label_schema[label_name] = {
@@ -97,12 +102,12 @@ class KbpPipeline(object):
         # 人工梳理的标签确定，再进行ID化
         res = []
 
-        sql_conn = pymysql.connect( host = self.config.get("mysql","host") ,
+        sql_conn = get_mysql_pool( host = self.config.get("mysql","host") ,
                             user = self.config.get("mysql","user") ,
                             passwd = self.config.get("mysql","passwd"),
                             port = self.config.getint("mysql","port") ,
                             db = self.config.get("mysql","db"),
-                            charset = "utf8" )
+                            charset = "utf8" ).connect()
         sql_cur = sql_conn.cursor() 
         # 查询投资机构相关的标签信息
         sql_state = self.config.get("mysql","company_tags_query").replace("eq","=").format(properties["name"])
@@ -200,10 +205,8 @@ class KbpPipeline(object):
         count = 0
         
         # arango数据库投资机构信息处理
-        for company in process_companys:
+        for company, exist in self.kb_loader.iter_exist(process_companys, lambda d: d["name"]):
             logger.info("处理投资机构[{}]".format(company["name"]))
-            # Arango查重
-            exist = self.graph_kb_invest_institution.fetchFirstExample({"name":company["name"]})
 
             if not exist:
                 logger.info("新增投资机构[{}]，准备转移到投资机构知识库".format(company["name"]))
@@ -221,15 +224,17 @@ class KbpPipeline(object):
                     "create_time": datetime.datetime.today(),
                     "update_time": datetime.datetime.today()
                 }
-                self.insert_graph_kb(kf) 
+                self.kb_loader.add(kf)
             else:
                 logger.info("投资机构数据已存在图数据库中，投资机构名=[{}]".format(company)) 
-                self.count_graph_exist += 1
 
             count += 1
             if count % 100 == 0 or count == self.total:
                 logger.info("清洗库前[{}]家投资机构导入投资机构知识库处理完成".format(count))
 
+        self.kb_loader.flush()
+        self.count_graph_insert = self.kb_loader.count_insert
+        self.count_graph_exist = self.kb_loader.count_exist
         self.close_connection() 
         logger.info("日期[{}]清洗库共找到投资机构{}个，arango投资机构库新增{}个，arango已有[{}]个".format(
             self.process_date, self.total, self.count_graph_insert, self.count_graph_exist))
@@ -22,6 +22,9 @@ import re
 import copy
 import requests
 import os
+main_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(main_path)
+from common_utils.kb_bulk_loader import KbBulkLoader
 
 logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s - %(filename)s[line:%(lineno)d] - %(levelname)s: %(message)s')
@@ -39,6 +42,7 @@ class KbpPipeline(object):
         self.res_kb_process_judgedoc = self.mongo_con[self.config.get("mongo","res_kb_process")][self.config.get("mongo","process_judgedoc")]
         self.arango_con = ArangoConnection(arangoURL=self.config.get("arango","arango_url"),username= self.config.get("arango","user"),password=self.config.get("arango","passwd"))
         self.kb_judgedoc = self.arango_con[self.config.get("arango","db")][self.config.get("arango","kb_judgedoc")]
+        self.kb_loader = KbBulkLoader(self.arango_con[self.config.get("arango","db")], self.config.get("arango","kb_judgedoc")) # 批量查重、批量新增
         self.count_graph_insert = 0 # arango新增数据数量
         self.count_graph_exist = 0 # 信息在图数据库中
         self.count_graph_update = 0
@@ -122,12 +126,10 @@ class KbpPipeline(object):
         count = 0
 
         # arango数据库裁判文书信息处理
-        for judgedoc in judgedocs:
+        for judgedoc, exist in self.kb_loader.iter_exist(judgedocs, lambda d: d["_id"]):
 
             logger.info("处理裁判文书，编号=[{}]".format(judgedoc["case_num"]))
 
-            # arango现存裁判文书查询
-            exist = self.kb_judgedoc.fetchFirstExample( {"_key":judgedoc["_id"]}  )
 
             # 没有name字段，组合一个
             name = judgedoc["case_num"] + "_" + judgedoc["case_name"]
@@ -148,18 +150,20 @@ class KbpPipeline(object):
                     "update_time": datetime.datetime.today(),
                 }
 
-                self.insert_graph_kb(kf) 
+                self.kb_loader.add(kf)
 
             else:
 
                 logger.info("裁判文书数据已存在图数据库中，裁判文书名=[{}]，裁判文书ID=[{}]".format(name, judgedoc["_id"])) 
-                self.count_graph_exist += 1
 
             count += 1
 
         if count % 100 == 0 or count == self.total:
             logger.info("清洗库前[{}]条裁判文书数据导入裁判文书知识库处理完成".format(count))
 
+        self.kb_loader.flush()
+        self.count_graph_insert = self.kb_loader.count_insert
+        self.count_graph_exist = self.kb_loader.count_exist
         self.close_connection() 
 
         logger.info("日期[{}]共找到清洗库裁判文书数据[{}]条，arango裁判文书库新增数据{}条，arango已存在裁判文书数据[{}]条".format(
@@ -23,6 +23,9 @@ import re
 import copy
 import requests
 import os
+main_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(main_path)
+from common_utils.relation_writer import RelationWriter
 
 logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s - %(filename)s[line:%(lineno)d] - %(levelname)s: %(message)s')
@@ -41,6 +44,7 @@ class RelationPipeline(object):
         self.arango_con = ArangoConnection(arangoURL=self.config.get("arango","arango_url"),username= self.config.get("arango","user"),password=self.config.get("arango","passwd"))
         self.arango_db = self.arango_con[self.config.get("arango","db")]
         self.kb_judgedoc = self.arango_db[self.config.get("arango","kb_judgedoc")]
+        self.relation_writer = RelationWriter(self.arango_db, self.config.get("arango","kb_judgedoc")) # 关系批量写入
         self.kb_company = self.arango_db[self.config.get("arango","kb_company")]
         self.count_graph_update = 0 # arango更新关系数据数量
         self.total = 0 # 处理日期总共需要添加关系的数量
@@ -124,14 +128,7 @@ class RelationPipeline(object):
             #logger.info("处理裁判文书关系，裁判文书名=[{}]".format(judgedoc["name"]))
             judgedoc_key = judgedoc["_key"]
             relations = self.process_relations(judgedoc["properties"])
-            try:
-                doc = self.kb_judgedoc[judgedoc_key]
-                doc["relations"] = relations
-                doc["update_time"] = datetime.datetime.today()
-                doc.save()
-                self.count_graph_update += 1
-            except Exception as e:
-                logger.error("裁判文书关系添加失败，裁判文书名=[{}]".format(judgedoc["name"]))
+            self.relation_writer.add(judgedoc_key, relations)
 
 
             count += 1
@@ -139,6 +136,9 @@ class RelationPipeline(object):
             if count % 500 == 0 or count == self.total:
                 logger.info("前[{}]家裁判文书关系添加完成".format(count))
 
+        self.count_graph_update = self.relation_writer.flush()
+        if self.relation_writer.failed_keys:
+            logger.error("关系更新失败[{}]条".format(len(self.relation_writer.failed_keys)))
         logger.info("日期[{}]裁判文书知识库共找到裁判文书{}个，arango裁判文书库添加裁判文书关系{}个".format(
             self.process_date, self.total, self.count_graph_update))
 
@@ -20,11 +20,18 @@ from logging.handlers import RotatingFileHandler
 import configparser
 from datetime import datetime,  date, timedelta
 import pyArango.connection as ArangoDb
-from pyArango.theExceptions import AQLFetchError
 import pymysql
 import re
 import os
 
+main_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(main_path)
+from common_utils.mysql_pool import get_mysql_pool
+from common_utils.schema_cache import get_schema_cache
+from common_utils.arango_cursor import iter_aql
+from common_utils.hbase_sink import HBaseSink
+from common_utils.hbase_codec import get_hbase_codec, FORMAT_COLUMN
+from common_utils.hbase_rowkey import get_hbase_rowkey
 dir_path = os.path.dirname(__file__)
 kbp_path = os.path.dirname(dir_path)
 config_path = os.path.join(kbp_path,"config.ini")
@@ -47,6 +54,8 @@ class EntityPipeline(object):
         self.init_concpet_classid() # 加载实体类别定义关键词映射
  
         self.nlpipe_count = 0 # 经过PIPE的实体数
+        self.hbase_codec = get_hbase_codec() # json单元格编码，紧凑压缩格式可在配置中开启
+        self.hbase_rowkey = get_hbase_rowkey() # rowkey规则，可配置盐值前缀打散region
         self.hbase_count = 0 # 导入HBASE的实体数
         self.hbase_dupl_count = 0 # 监测rowkey已存在的实体数
         self.no_hbase_count = 0 # 找不到HBASE rowkey的实体，分类去重颠倒导致
@@ -60,16 +69,15 @@ class EntityPipeline(object):
         加载MYSQL中定义的实体类别表
         '''
         self.news_class_ids = {}
-        sql_conn = pymysql.connect( host = self.config.get("mysql","host") ,
+        sql_conn = get_mysql_pool( host = self.config.get("mysql","host") ,
                             user = self.config.get("mysql","user") ,
                             passwd = self.config.get("mysql","passwd"),
                             port = self.config.getint("mysql","port") ,
                             db = self.config.get("mysql","db"),
-                            charset = "utf8" )
+                            charset = "utf8" ).connect()
         sql_cur = sql_conn.cursor()
         sql_state = self.config.get("mysql","entity_type_query").replace("eq","=")
-        sql_cur.execute(sql_state)
-        mysql_res = sql_cur.fetchall()
+        mysql_res = get_schema_cache().fetchall(sql_cur, sql_state)
         for name, class_id, patent_id in mysql_res:
             self.news_class_ids[name] = class_id
         logger.info("MYSQL实体类别定义加载完成")
@@ -80,8 +88,7 @@ class EntityPipeline(object):
         ''' 将读取的arango记录转换成hbase存储结构'''
 
         classid = self.news_class_ids['企业高管']
-        rowkey_str = classid+'|'+item['_key']
-        rowkey = bytes(rowkey_str, encoding="utf8")
+        rowkey = self.hbase_rowkey.make(classid, item['_key'])
         alter_names = []
         tags = []
         crawl_t = ""
@@ -96,9 +103,10 @@ class EntityPipeline(object):
             b"info:entity_type_id": bytes(classid, encoding="utf8"),
             b"info:entity_name": bytes(item["name"], encoding="utf8"),
             b"info:uuid": bytes(item["_key"], encoding="utf8"),
-            b"info:entity_properties": bytes(json.dumps(item["properties"], ensure_ascii=False), encoding="utf8"),#.getStore() for doc
-            b"info:tags": bytes(json.dumps(tags, ensure_ascii=False), encoding="utf8"),
-            b"info:relations": bytes(json.dumps(item["relations"], ensure_ascii=False), encoding="utf8"),
+            b"info:entity_properties": self.hbase_codec.dumps(item["properties"]),#.getStore() for doc
+            b"info:tags": self.hbase_codec.dumps(tags),
+            b"info:relations": self.hbase_codec.dumps(item["relations"]),
+            FORMAT_COLUMN: self.hbase_codec.format_version,
             b"info:insert_time": bytes(datetime.today().strftime("%Y-%m-%d %H:%M:%S"), encoding="utf8")
         }
         return rowkey,column_family
@@ -136,43 +144,28 @@ class EntityPipeline(object):
 
         db_name = conn[self.config.get("arango","db")]
         collection = db_name[colletion_name]
-        try:
-            query = db_name.fetch_list(aql_arango)
-        except AQLFetchError as e:
-            query = []
-            logger.warn("Arango[高管] 库没有查到数据",e)
+        # 流式游标分批读取，不再一次性读入全部文档
+        query = iter_aql(db_name, aql_arango)
 
         logger.info("HBASE共含有[高管] %s条记录，本次查询%s条记录！" % (collection.figures()['count'],len(query)))
         num = 0
         num_ins = 0
-        pre_send_rowkey = []
-        pre_send_data = []
-
-        for item in query:
-            num += 1
-            ####################################################
-            rowkey, data = self.process_leader_hbase_data(item)#
-            ####################################################
-            if rowkey not in pre_send_rowkey:
-                pre_send_rowkey.append(rowkey)
-                pre_send_data.append(data)
-        zip_list = zip(pre_send_rowkey, pre_send_data)
-        logger.info("数据封装完毕，开始写入hbase...")
         self.hbase_pool = happybase.ConnectionPool( host = self.config.get("hbase","host"),
                         port = self.config.getint("hbase","port"),
                         timeout=None,
                         autoconnect=True,
                         size = self.config.getint("hbase","pool_size"))
+        hbase_sink = HBaseSink(self.hbase_pool, self.config.get("hbase","entity")) # 流式去重、多连接批量写入
 
-        with self.hbase_pool.connection() as hbase_conn:
-            self.hbase_entity_table = hbase_conn.table(self.config.get("hbase","entity"))
-
-            with self.hbase_entity_table.batch(batch_size=200) as bat:
-                for send_rowkey, send_data in zip_list:
-                    bat.put(send_rowkey, send_data)
-                    self.hbase_count += 1
-                    if self.hbase_count % 500 == 0:
-                        logger.info("已经写入写入hbase...{}条".format(self.hbase_count))
+        for item in query:
+            num += 1
+            ####################################################
+            rowkey, data = self.process_leader_hbase_data(item)#
+            ####################################################
+            hbase_sink.put(rowkey, data)
+        sink_stats = hbase_sink.close()
+        self.hbase_count = sink_stats["rows"]
+        self.hbase_dupl_count = sink_stats["duplicates"]
         logger.info("HBASE批量数据导入完成,共插入%s条高管记录" % self.hbase_count)
 
 if __name__ == '__main__':
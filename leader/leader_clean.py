@@ -31,6 +31,8 @@ from bson import ObjectId
 main_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.append(main_path)
 from common_utils.address_parser import AddressParser
+from common_utils.mysql_pool import get_mysql_pool
+from common_utils.schema_cache import get_schema_cache
 
 
 logging.basicConfig(level=logging.INFO,
@@ -59,12 +61,12 @@ class LeaderClean(object):
         self.mongo_con = MongoClient(self.config.get("mongo","mongo_url"))
         self.res_kb_leader = self.mongo_con[self.config.get("mongo","res_kb_db")][self.config.get("mongo","res_kb_leader")] 
         self.res_kb_process_leader = self.mongo_con[self.config.get("mongo","res_kb_process")][self.config.get("mongo","process_leader")] # 高管清洗库
-        self.sql_conn = pymysql.connect( host = self.config.get("mysql","host") ,
+        self.sql_conn = get_mysql_pool( host = self.config.get("mysql","host") ,
                 user = self.config.get("mysql","user"),
                 passwd = self.config.get("mysql","passwd"),
                 port = self.config.getint("mysql","port") ,
                 db = self.config.get("mysql","db"),
-                charset = self.config.get("mysql","charset") )
+                charset = self.config.get("mysql","charset") ).connect()
         self.sql_cur = self.sql_conn.cursor()
         self._init_edu_degree()
         self._init_prof_title()
@@ -78,16 +80,14 @@ class LeaderClean(object):
 
         self.edu_degree_schema = {}       
         sql_state = self.config.get("mysql","edu_degree_query")
-        self.sql_cur.execute(sql_state)
-        for c in self.sql_cur.fetchall():
+        for c in get_schema_cache().fetchall(self.sql_cur, sql_state):
             self.edu_degree_schema[c[0]] = c[1]
 
 
     def _init_prof_title(self):
         self.prof_title = []
         sql_state = self.config.get("mysql","prof_title_query")
-        self.sql_cur.execute(sql_state)
-        for t in self.sql_cur.fetchall():
+        for t in get_schema_cache().fetchall(self.sql_cur, sql_state):
             self.prof_title.append(t[0])
         self.prof_title.sort(key=lambda x:len(x),reverse=True)
         self.sql_cur.close()
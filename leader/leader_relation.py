@@ -13,7 +13,6 @@ import sys
 from pymongo import MongoClient
 from pymongo import errors
 from pyArango.connection import Connection as ArangoConnection
-from pyArango.theExceptions import AQLFetchError
 import pymysql
 from dateutil import parser
 import datetime
@@ -23,6 +22,9 @@ import re
 import copy
 import requests
 import os
+main_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(main_path)
+from common_utils.arango_cursor import iter_aql
 
 logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s - %(filename)s[line:%(lineno)d] - %(levelname)s: %(message)s')
@@ -105,12 +107,7 @@ class RelationPipeline(object):
         
         end_str_sql = "{ '_key':leader._key, 'name':leader.name,'properties':{'raw_work_experiences': leader.properties.raw_work_experiences } }"
 
-        try:
-            res = self.arango_db.AQLQuery(aql + end_str_sql, rawResults=True, batchSize=100)
-        except AQLFetchError as e:
-            '''没有查到数据时，fetch_list会抛出异常'''
-            res = []
-            logger.warn("Arango高管库没有查到数据",e)
+        res = iter_aql(self.arango_db, aql + end_str_sql)
 
         return res
 
@@ -22,6 +22,9 @@ import re
 import copy
 import requests
 import os
+main_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(main_path)
+from common_utils.kb_bulk_loader import KbBulkLoader
 
 logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s - %(filename)s[line:%(lineno)d] - %(levelname)s: %(message)s')
@@ -39,6 +42,7 @@ class KbpPipeline(object):
         self.res_kb_process_organization = self.mongo_con[self.config.get("mongo","res_kb_process")][self.config.get("mongo","process_organization")]
         self.arango_con = ArangoConnection(arangoURL=self.config.get("arango","arango_url"),username= self.config.get("arango","user"),password=self.config.get("arango","passwd"))
         self.kb_organization = self.arango_con[self.config.get("arango","db")][self.config.get("arango","kb_organization")]
+        self.kb_loader = KbBulkLoader(self.arango_con[self.config.get("arango","db")], self.config.get("arango","kb_organization")) # 批量查重、批量新增
         self.count_graph_insert = 0 # arango新增数据数量
         self.count_insert_fail = 0
         self.count_skip = 0 #信息存在，跳过
@@ -124,7 +128,7 @@ class KbpPipeline(object):
         count = 0
 
         # arango数据库高校机构信息处理
-        for organization in organizations:
+        for organization, exist in self.kb_loader.iter_exist(organizations, lambda d: d["_id"]):
 
             logger.info("处理高校机构[{}]".format(organization["name"]))    
             properties = self.process_properties(organization)
@@ -140,18 +144,14 @@ class KbpPipeline(object):
                 "update_time": datetime.datetime.today(),
             }
 
-            # arango查询，判断信息是否已存在
-            exist = self.kb_organization.fetchFirstExample( {"_key":kf["_key"]}  )
-
             if not exist:
 
                 logger.info("Arango新增高校机构[{}]".format(organization["name"]))
-                self.insert_graph_kb(kf)
+                self.kb_loader.add(kf)
 
             else:
                 # 信息存在跳过
                 logger.info("高校机构数据已存在，高校机构名=[{}]，高校机构ID=[{}]，跳过".format(kf["name"], kf["_key"])) 
-                self.count_skip += 1
                 
 
             count += 1
@@ -159,6 +159,10 @@ class KbpPipeline(object):
         if count % 100 == 0 or count == self.total:
             logger.info("清洗库前[{}]条高校机构数据导入高校机构知识库处理完成".format(count))
 
+        self.kb_loader.flush()
+        self.count_graph_insert = self.kb_loader.count_insert
+        self.count_insert_fail = self.kb_loader.count_failed
+        self.count_skip = self.kb_loader.count_exist
         self.close_connection() 
 
         logger.info("日期[{}]共找到清洗库高校机构数据[{}]条，arango高校机构机构库新增数据[{}]条，新增失败[{}]条，跳过已存在数据[{}]条".format(
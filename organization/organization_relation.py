@@ -13,7 +13,6 @@ import sys
 from pymongo import MongoClient
 from pymongo import errors
 from pyArango.connection import Connection as ArangoConnection
-from pyArango.theExceptions import AQLFetchError
 import pymysql
 from dateutil import parser
 import datetime
@@ -24,6 +23,12 @@ import copy
 import requests
 import os
 
+main_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(main_path)
+from common_utils.mysql_pool import get_mysql_pool
+from common_utils.schema_cache import get_schema_cache
+from common_utils.arango_cursor import iter_aql
+from common_utils.relation_writer import RelationWriter
 logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s - %(filename)s[line:%(lineno)d] - %(levelname)s: %(message)s')
 logger = logging.getLogger(__name__)
@@ -41,6 +46,7 @@ class RelationPipeline(object):
         self.arango_con = ArangoConnection(arangoURL=self.config.get("arango","arango_url"),username= self.config.get("arango","user"),password=self.config.get("arango","passwd"))
         self.arango_db = self.arango_con[self.config.get("arango","db")]
         self.kb_organization = self.arango_db[self.config.get("arango","kb_organization")]
+        self.relation_writer = RelationWriter(self.arango_db, self.config.get("arango","kb_organization")) # 关系批量写入
         self.kb_company = self.arango_db[self.config.get("arango","kb_company")]
         self._init_division_schema()
         self.count_graph_update = 0 # arango更新关系数据数量
@@ -51,18 +57,17 @@ class RelationPipeline(object):
         行政区域实体关系加载
         '''
         self.division_schema = {}
-        sql_conn = pymysql.connect( host = self.config.get("mysql","host") ,
+        sql_conn = get_mysql_pool( host = self.config.get("mysql","host") ,
                             user = self.config.get("mysql","user") ,
                             passwd = self.config.get("mysql","passwd"),
                             port = self.config.getint("mysql","port") ,
                             db = self.config.get("mysql","db"),
-                            charset = "utf8" )
+                            charset = "utf8" ).connect()
         sql_cur = sql_conn.cursor() 
 
         # 初始化行政区域的关系schema
         sql_query_industry = "select name, id, level, parent_id from {}".format(self.config.get("mysql","res_division"))
-        sql_cur.execute(sql_query_industry)
-        divisions = sql_cur.fetchall()
+        divisions = get_schema_cache().fetchall(sql_cur, sql_query_industry)
         for division in divisions:
             division_name, division_id, division_level, division_parent_id = division
             self.division_schema[division_name] = {
@@ -94,14 +99,12 @@ class RelationPipeline(object):
         iso_date_str = process_date + 'T00:00:00+08:00'
         iso_date = parser.parse(iso_date_str)
 
-        aql = "FOR organization IN {} FILTER organization.create_time >= '{}' SORT organization.create_time return organization".format(
+        aql = "FOR organization IN {} FILTER organization.create_time >= '{}' SORT organization.create_time return ".format(
                         self.config.get("arango","kb_organization"), iso_date) 
-        try:
-            res = self.arango_db.fetch_list(aql)
-        except AQLFetchError as e:
-            '''没有查到数据时，fetch_list会抛出异常'''
-            res = []
-            logger.warn("Arango高校机构库没有查到数据",e)
+        end_str_sql = "{'_key':organization._key,'name':organization.name,'properties':{'university':organization.properties.university,'province':organization.properties.province,'city':organization.properties.city,'area':organization.properties.area}}"
+
+        # 流式游标，只返回关系处理需要的字段
+        res = iter_aql(self.arango_db, aql + end_str_sql)
 
         self.total = len(res)
         self.process_date = process_date
@@ -179,14 +182,7 @@ class RelationPipeline(object):
             logger.info("处理高校机构关系，高校机构名=[{}]".format(organization["name"]))
             organization_key = organization["_key"]
             relations = self.process_relations(organization["properties"])
-            try:
-                doc = self.kb_organization[organization_key]
-                doc["relations"] = relations
-                doc["update_time"] = datetime.datetime.today()
-                doc.save()
-                self.count_graph_update += 1
-            except Exception as e:
-                logger.error("高校机构关系添加失败，高校机构名=[{}]".format(organization["name"]),e)
+            self.relation_writer.add(organization_key, relations)
 
 
             count += 1
@@ -195,6 +191,9 @@ class RelationPipeline(object):
                 logger.info("前[{}]家高校机构关系添加完成".format(count))
 
 
+        self.count_graph_update = self.relation_writer.flush()
+        if self.relation_writer.failed_keys:
+            logger.error("关系更新失败[{}]条".format(len(self.relation_writer.failed_keys)))
         logger.info("日期[{}]高校机构知识库共找到高校机构{}个，arango高校机构库添加高校机构关系{}个".format(
             self.process_date, self.total, self.count_graph_update))
 
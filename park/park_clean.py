@@ -20,6 +20,11 @@ from dateutil import parser
 import os
 from logging.handlers import RotatingFileHandler
 import copy
+import time
+main_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(main_path)
+from common_utils.geocode_cache import get_geocode_cache
+from common_utils.gazetteer import get_gazetteer
 
 logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s - %(filename)s[line:%(lineno)d] - %(levelname)s: %(message)s')
@@ -212,15 +217,21 @@ class AddressParser(object):
     def __init__(self):
         self.ak2 = '5kFxKa49p60ynLGDo6ZpVKw0v7w8nCiI'
         self.ak3 = '64WbEPR9jUwraj1zMoI4DBD58t32kO0n'
+        self.geocode_cache = get_geocode_cache() # 百度地址解析结果本地缓存
 
         # TODO：行政区划使用的是common库中的数据
-        with open(os.path.join(dir_path,'prov_city_area_dict.json'),'r') as load_f:
-            self.all_address = json.load(load_f)
+        self.gazetteer = get_gazetteer(os.path.join(dir_path,'prov_city_area_dict.json')) # 行政区划自动机，进程内只构建一次
+        self.all_address = self.gazetteer.all_address
 
     def get_lng_lat(self, address):
 
         if not address:
             return {}
+        # 优先查本地缓存，命中则不再请求百度接口
+        cache_res = self.geocode_cache.get(address)
+        if cache_res is not None:
+            return cache_res
+        start_time = time.time()
         to_ak = self.ak2
         url_new = 'http://api.map.baidu.com/geocoding/v3/?address='
         url = url_new
@@ -236,6 +247,9 @@ class AddressParser(object):
             map_res = self.get_geocode_info(map_index)
             map_res['longitude'] = lng
             map_res['latitude'] = lat
+            # 行政区划接口出错时不缓存，下次重新请求
+            if map_res['province']:
+                self.geocode_cache.set(address, map_res, cost=time.time()-start_time)
         return map_res
 
 
@@ -300,65 +314,14 @@ class AddressParser(object):
 
 
     def match_addr(self, _address, _area=''):
-        all_dict = self.all_address
+        '''行政区划匹配，返回 (省, 市, 区县)，一次扫描地址完成'''
 
-        find_prov = False
-        find_city = False
-        find_area = False
         index_prov = ''
-        index_city = ''
-        index_area = ''
         if _area:
             index_prov = _area
-            find_prov = True
             if index_prov in ['北京市','天津市','上海市','重庆市']:
                 index_prov = index_prov.strip('市')
-        else:
-            for prov in all_dict:
-                if _address.find(prov)>-1:
-                    find_prov = True
-                    index_prov = prov
-                    break
-                elif prov.find('省')>-1 and _address.find(prov.strip('省'))>-1:
-                    find_prov = True
-                    index_prov = prov
-                    break
-        if not find_prov:
-            if not _area:
-                return ('','','')
-        for city in all_dict[index_prov]:
-            if _address.find(city)>-1:
-                find_city = True
-                index_city = city
-                break
-            elif city.find('市')>-1 and _address.find(city.strip('市'))>-1:
-                find_city = True
-                index_city = city
-                break
-        if not find_city:
-            for n_city in all_dict[index_prov]:
-                for n_area in all_dict[index_prov][n_city]:
-                    if _address.find(n_area)>-1:
-                        find_area = True
-                        index_city = n_city
-                        index_area = n_area
-                        break
-                    elif n_area.find('市')>-1 and _address.find(n_area.strip('市'))>-1:
-                        find_area = True
-                        index_city = n_city
-                        index_area = n_area
-                        break
-        else:
-            for area in all_dict[index_prov][index_city]:
-                if _address.find(area)>-1:
-                    find_area = True
-                    index_area = area
-                    break
-                elif area.find('市')>-1 and _address.find(area.strip('市'))>-1:
-                    find_area = True
-                    index_area = area
-                    break
-        return (index_prov,index_city,index_area)
+        return self.gazetteer.match_addr(_address, index_prov)
 
 
 
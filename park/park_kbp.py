@@ -22,6 +22,9 @@ import re
 import copy
 import requests
 import os
+main_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(main_path)
+from common_utils.kb_bulk_loader import KbBulkLoader
 
 logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s - %(filename)s[line:%(lineno)d] - %(levelname)s: %(message)s')
@@ -39,6 +42,7 @@ class KbpPipeline(object):
         self.res_kb_process_park = self.mongo_con[self.config.get("mongo","res_kb_process")][self.config.get("mongo","process_park")]
         self.arango_con = ArangoConnection(arangoURL=self.config.get("arango","arango_url"),username= self.config.get("arango","user"),password=self.config.get("arango","passwd"))
         self.kb_park = self.arango_con[self.config.get("arango","db")][self.config.get("arango","kb_park")]
+        self.kb_loader = KbBulkLoader(self.arango_con[self.config.get("arango","db")], self.config.get("arango","kb_park")) # 批量查重、批量新增
         self.count_graph_insert = 0 # arango新增数据数量
         self.count_graph_exist = 0 # 信息在图数据库中
         self.count_graph_update = 0
@@ -123,13 +127,10 @@ class KbpPipeline(object):
         count = 0
 
         # arango数据库园区信息处理
-        for park in parks:
+        for park, exist in self.kb_loader.iter_exist(parks, lambda d: d["_id"]):
 
             logger.info("处理园区[{}]".format(park["name"]))
 
-            # arango现存园区查询
-            exist = self.kb_park.fetchFirstExample( {"_key":park["_id"]}  )
-
             if not exist:
 
                 logger.info("Arango新增园区[{}]".format(park["name"]))
@@ -149,18 +150,20 @@ class KbpPipeline(object):
                     "update_time": datetime.datetime.today(),
                 }
 
-                self.insert_graph_kb(kf) 
+                self.kb_loader.add(kf)
 
             else:
 
                 logger.info("园区数据已存在图数据库中，园区名=[{}]，园区ID=[{}]".format(park["name"], park["_id"])) 
-                self.count_graph_exist += 1
 
             count += 1
 
         if count % 100 == 0 or count == self.total:
             logger.info("清洗库前[{}]条园区数据导入园区知识库处理完成".format(count))
 
+        self.kb_loader.flush()
+        self.count_graph_insert = self.kb_loader.count_insert
+        self.count_graph_exist = self.kb_loader.count_exist
         self.close_connection() 
 
         logger.info("日期[{}]共找到清洗库园区数据[{}]条，arango园区库新增数据{}条，arango已存在园区数据[{}]条".format(
@@ -13,7 +13,6 @@ import sys
 from pymongo import MongoClient
 from pymongo import errors
 from pyArango.connection import Connection as ArangoConnection
-from pyArango.theExceptions import AQLFetchError
 import pymysql
 from dateutil import parser
 import datetime
@@ -23,6 +22,14 @@ import re
 import copy
 import requests
 import os
+main_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(main_path)
+from common_utils.classifier_client import ClassifierClient
+from common_utils.mysql_pool import get_mysql_pool
+from common_utils.schema_cache import get_schema_cache
+from common_utils.industry_tree import IndustryTree
+from common_utils.arango_cursor import iter_aql
+from common_utils.relation_writer import RelationWriter
 
 logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s - %(filename)s[line:%(lineno)d] - %(levelname)s: %(message)s')
@@ -41,8 +48,14 @@ class RelationPipeline(object):
         self.arango_con = ArangoConnection(arangoURL=self.config.get("arango","arango_url"),username= self.config.get("arango","user"),password=self.config.get("arango","passwd"))
         self.arango_db = self.arango_con[self.config.get("arango","db")]
         self.kb_patent = self.arango_db[self.config.get("arango","kb_patent")]
+        self.relation_writer = RelationWriter(self.arango_db, self.config.get("arango","kb_patent")) # 关系批量写入
         self.kb_company = self.arango_db[self.config.get("arango","kb_company")]
         self.industry_url = self.config.get("url","patent_classifier")
+        # 专利分类接口只接受单个patent_id，批次大小固定为1，多个请求并发提交
+        self.industry_client = ClassifierClient(self.industry_url,
+                                    lambda ids: {"patent_id": ids[0]},
+                                    lambda body, batch: [body],
+                                    batch_size=1)
         self._init_division_schema() # init division_schema from mysql
         self._init_industry_schema()
         self.count_graph_update = 0 # arango更新关系数据数量
@@ -53,18 +66,17 @@ class RelationPipeline(object):
         行政区域实体关系加载
         '''
         self.division_schema = {}
-        sql_conn = pymysql.connect( host = self.config.get("mysql","host") ,
+        sql_conn = get_mysql_pool( host = self.config.get("mysql","host") ,
                             user = self.config.get("mysql","user") ,
                             passwd = self.config.get("mysql","passwd"),
                             port = self.config.getint("mysql","port") ,
                             db = self.config.get("mysql","db"),
-                            charset = "utf8" )
+                            charset = "utf8" ).connect()
         sql_cur = sql_conn.cursor() 
 
         # 初始化行政区域的关系schema
         sql_query_industry = "select name, id, level, parent_id from {}".format(self.config.get("mysql","res_division"))
-        sql_cur.execute(sql_query_industry)
-        divisions = sql_cur.fetchall()
+        divisions = get_schema_cache().fetchall(sql_cur, sql_query_industry)
         for division in divisions:
             division_name, division_id, division_level, division_parent_id = division
             self.division_schema[division_name] = {
@@ -84,18 +96,17 @@ class RelationPipeline(object):
         init loading industry schema at mysql res_industry table
         '''
         self.industry_schema = {}
-        sql_conn = pymysql.connect( host = self.config.get("mysql","host") ,
+        sql_conn = get_mysql_pool( host = self.config.get("mysql","host") ,
                             user = self.config.get("mysql","user") ,
                             passwd = self.config.get("mysql","passwd"),
                             port = self.config.getint("mysql","port") ,
                             db = self.config.get("mysql","db"),
-                            charset = "utf8" )
+                            charset = "utf8" ).connect()
         sql_cur = sql_conn.cursor() 
 
         # 初始化产业/产业领域 schema
         sql_query_industry = "select name, id, parent_id from {}".format(self.config.get("mysql","res_industry"))
-        sql_cur.execute(sql_query_industry)
-        labels = sql_cur.fetchall()
+        labels = get_schema_cache().fetchall(sql_cur, sql_query_industry)
         for industry in labels:
             industry_name, industry_id, parent_id = industry
             self.industry_schema[industry_id] = {
@@ -106,6 +117,10 @@ class RelationPipeline(object):
                 "object_parent_id": parent_id
             }
 
+        self.industry_tree = IndustryTree(self.industry_schema)
+        sql_cur.close()
+        sql_conn.close()
+        logger.info("MYSQL industry schema 加载完成")
 
 
     def query_process_patent(self, process_date):
@@ -125,14 +140,12 @@ class RelationPipeline(object):
         iso_date_str = process_date + 'T00:00:00+08:00'
         iso_date = parser.parse(iso_date_str)
 
-        aql = "FOR patent IN {} FILTER patent.create_time >= '{}' SORT patent.create_time return patent".format(
+        aql = "FOR patent IN {} FILTER patent.create_time >= '{}' SORT patent.create_time return ".format(
                         self.config.get("arango","kb_patent"), iso_date) 
-        try:
-            res = self.arango_db.fetch_list(aql)
-        except AQLFetchError as e:
-            '''没有查到相关数据时，fetch_list会抛出异常'''
-            res = []
-            logger.warn("Arango专利库没有查到数据",e)
+        end_str_sql = "{'_key':patent._key,'name':patent.name,'properties':{'applicant':patent.properties.applicant,'province':patent.properties.province,'city':patent.properties.city,'area':patent.properties.area}}"
+
+        # 流式游标，只返回关系处理需要的字段
+        res = iter_aql(self.arango_db, aql + end_str_sql)
 
         self.total = len(res)
         self.process_date = process_date
@@ -140,23 +153,6 @@ class RelationPipeline(object):
         return res
 
         
-    def get_related_industry_tags(self, industry_id):
-        '''
-        根据子领域名称递归返回领域及所有父领域标签
-        '''
-        relations = []
-        # 过滤招商领域与图谱定义不一致的
-        if not industry_id in self.industry_schema:
-            return relations
-        
-        relations.append(self.industry_schema[industry_id])
-        parent_id = self.industry_schema[industry_id]["object_parent_id"]
-        while (parent_id):
-            node = self.industry_schema[parent_id]
-            relations.append(node)
-            parent_id = node["object_parent_id"]
-        return relations
-
 
 
     def process_company_rel(self, properties):
@@ -180,33 +176,17 @@ class RelationPipeline(object):
 
         return company_rels   
         
-    def process_industry_rel(self, _key):
+    def process_industry_rel(self, _key, industry_field_tags=None):
         '''
         产业领域标签ID化添加
+        industry_field_tags 为并发请求分类接口已返回的分类结果，为None时单独请求分类接口
         '''
-        industry_tags = []
-
-        industry_field_tags = []
-        patent_id = _key
-
-        post_data = {
-            "patent_id":  patent_id ,
-        }
-        pack_data = json.dumps(post_data)
-        try:
-            res = requests.post(self.industry_url, data=pack_data)
-
-            if res.status_code == 200:
-                tags = res.json().get("body")
-                industry_field_tags.extend(tags)
-
-        except Exception as e:
-            logging.error("获取专家产业领域失败，专家id=[{}]，接口=[{}]".format(patent_id,self.industry_url),e)
+        if industry_field_tags is None:
+            industry_field_tags = self.industry_client.classify([_key])[0]
+        if not industry_field_tags:
+            industry_field_tags = []
 
-        for field in industry_field_tags:
-            for node in self.get_related_industry_tags(field["id"]):
-                if node not in industry_tags:
-                    industry_tags.append(node)
+        industry_tags = self.industry_tree.related_tags(field["id"] for field in industry_field_tags)
 
         return industry_tags
 
@@ -230,7 +210,7 @@ class RelationPipeline(object):
 
         return div_rel
 
-    def process_relations(self, properties, _key):
+    def process_relations(self, properties, _key, industry_field_tags=None):
         '''
         添加关系
         '''
@@ -239,7 +219,7 @@ class RelationPipeline(object):
         relations.extend(company_rel)
 
         # 关联产业分类
-        industry_rel = self.process_industry_rel(_key)
+        industry_rel = self.process_industry_rel(_key, industry_field_tags)
         relations.extend(industry_rel)
 
         # 籍贯关联的行政区划
@@ -256,24 +236,22 @@ class RelationPipeline(object):
 
         # arango数据库专利信息处理
 
-        for patent in process_patents:
+        # 产业分类接口并发请求，按原顺序返回每个专利的分类结果
+        classified_patents = self.industry_client.iter_classified(process_patents, lambda p: p["_key"])
+        for patent, industry_field_tags in classified_patents:
 
             count += 1
             #logger.info("处理专利关系，专利名=[{}]".format(patent["name"]))
             patent_key = patent["_key"]
-            relations = self.process_relations(patent["properties"], patent_key)
-            try:
-                doc = self.kb_patent[patent_key]
-                doc["relations"] = relations
-                doc["update_time"] = datetime.datetime.today()
-                doc.save()
-                self.count_graph_update += 1
-            except Exception as e:
-                logger.error("专利关系添加失败，专利名=[{}],id=[{}]".format(patent["name"],patent_key))
+            relations = self.process_relations(patent["properties"], patent_key, industry_field_tags)
+            self.relation_writer.add(patent_key, relations)
 
             if count % 100 == 0 or count == self.total:
                 logger.info("前[{}]家专利关系添加完成".format(count))
 
+        self.count_graph_update = self.relation_writer.flush()
+        if self.relation_writer.failed_keys:
+            logger.error("关系更新失败[{}]条".format(len(self.relation_writer.failed_keys)))
         logger.info("日期[{}]专利知识库共找到专利{}个，arango专利库添加专利关系{}个".format(
             self.process_date, self.total, self.count_graph_update))
 
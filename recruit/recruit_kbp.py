@@ -22,6 +22,9 @@ import re
 import copy
 import requests
 import os
+main_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(main_path)
+from common_utils.kb_bulk_loader import KbBulkLoader
 
 logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s - %(filename)s[line:%(lineno)d] - %(levelname)s: %(message)s')
@@ -39,6 +42,7 @@ class KbpPipeline(object):
         self.res_kb_process_recruit = self.mongo_con[self.config.get("mongo","res_kb_process")][self.config.get("mongo","process_recruit")]
         self.arango_con = ArangoConnection(arangoURL=self.config.get("arango","arango_url"),username= self.config.get("arango","user"),password=self.config.get("arango","passwd"))
         self.kb_recruit = self.arango_con[self.config.get("arango","db")][self.config.get("arango","kb_recruit")]
+        self.kb_loader = KbBulkLoader(self.arango_con[self.config.get("arango","db")], self.config.get("arango","kb_recruit")) # 批量查重、批量新增
         self.count_graph_insert = 0 # arango新增数据数量
         self.count_graph_exist = 0 # 信息在图数据库中
         self.count_graph_update = 0
@@ -122,13 +126,10 @@ class KbpPipeline(object):
         count = 0
 
         # arango数据库招聘信息处理
-        for recruit in recruits:
+        for recruit, exist in self.kb_loader.iter_exist(recruits, lambda d: d["_id"]):
 
             logger.info("处理岗位需求[{}]".format(recruit["name"]))
 
-            # arango现存招聘查询
-            exist = self.kb_recruit.fetchFirstExample( {"_key":recruit["_id"]}  )
-
             if not exist:
 
                 logger.info("Arango新增岗位需求[{}]".format(recruit["name"]))
@@ -146,18 +147,20 @@ class KbpPipeline(object):
                     "update_time": datetime.datetime.today(),
                 }
 
-                self.insert_graph_kb(kf) 
+                self.kb_loader.add(kf)
 
             else:
 
                 logger.info("招聘数据已存在图数据库中，岗位名=[{}]，招聘ID=[{}]".format(recruit["name"], recruit["_id"])) 
-                self.count_graph_exist += 1
 
             count += 1
 
         if count % 100 == 0 or count == self.total:
             logger.info("清洗库前[{}]条招聘数据导入招聘知识库处理完成".format(count))
 
+        self.kb_loader.flush()
+        self.count_graph_insert = self.kb_loader.count_insert
+        self.count_graph_exist = self.kb_loader.count_exist
         self.close_connection() 
 
         logger.info("日期[{}]共找到清洗库招聘数据[{}]条，arango招聘库新增数据{}条，arango已存在招聘数据[{}]条".format(
@@ -23,6 +23,9 @@ import re
 import copy
 import requests
 import os
+main_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(main_path)
+from common_utils.relation_writer import RelationWriter
 
 logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s - %(filename)s[line:%(lineno)d] - %(levelname)s: %(message)s')
@@ -41,6 +44,7 @@ class RelationPipeline(object):
         self.arango_con = ArangoConnection(arangoURL=self.config.get("arango","arango_url"),username= self.config.get("arango","user"),password=self.config.get("arango","passwd"))
         self.arango_db = self.arango_con[self.config.get("arango","db")]
         self.kb_recruit = self.arango_db[self.config.get("arango","kb_recruit")]
+        self.relation_writer = RelationWriter(self.arango_db, self.config.get("arango","kb_recruit")) # 关系批量写入
         self.kb_company = self.arango_db[self.config.get("arango","kb_company")]
         self.count_graph_update = 0 # arango更新关系数据数量
         self.total = 0 # 处理日期总共需要添加关系的数量
@@ -123,16 +127,7 @@ class RelationPipeline(object):
             #logger.info("处理岗位信息关系，岗位=[{}]".format(recruit["name"]))
             recruit_key = recruit["_key"]
             relations = self.process_relations(recruit["properties"])
-            try:
-                doc = self.kb_recruit[recruit_key]
-                doc["relations"] = relations
-                doc["update_time"] = datetime.datetime.today()
-                doc.save()
-                self.count_graph_update += 1
-                if self.count_graph_update % 1000 == 0:
-                    logger.error("{} 已经更新{}条".format(count,self.count_graph_update))
-            except Exception as e:
-                logger.error("岗位关系添加失败，岗位=[{}]".format(recruit["name"]))
+            self.relation_writer.add(recruit_key, relations)
 
 
             count += 1
@@ -140,6 +135,9 @@ class RelationPipeline(object):
             if count % 100 == 0 or count == self.total:
                 logger.info("前[{}]家岗位信息关系添加完成".format(count))
 
+        self.count_graph_update = self.relation_writer.flush()
+        if self.relation_writer.failed_keys:
+            logger.error("关系更新失败[{}]条".format(len(self.relation_writer.failed_keys)))
         logger.info("日期[{}]清洗库共找到招聘{}个，arango招聘库更新关系{}个".format(
             self.process_date, self.total, self.count_graph_update))
 
@@ -23,6 +23,11 @@ import copy
 import requests
 import os
 
+main_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(main_path)
+from common_utils.mysql_pool import get_mysql_pool
+from common_utils.schema_cache import get_schema_cache
+from common_utils.kb_bulk_loader import KbBulkLoader
 logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s - %(filename)s[line:%(lineno)d] - %(levelname)s: %(message)s')
 logger = logging.getLogger(__name__)
@@ -39,6 +44,7 @@ class KbpPipeline(object):
         self.res_kb_process_software = self.mongo_con[self.config.get("mongo","res_kb_process")][self.config.get("mongo","process_software")]
         self.arango_con = ArangoConnection(arangoURL=self.config.get("arango","arango_url"),username= self.config.get("arango","user"),password=self.config.get("arango","passwd"))
         self.kb_software = self.arango_con[self.config.get("arango","db")][self.config.get("arango","kb_software")]
+        self.kb_loader = KbBulkLoader(self.arango_con[self.config.get("arango","db")], self.config.get("arango","kb_software")) # 批量查重、批量新增
         self._init_entity_type()
         self.count_graph_insert = 0 # arango新增数据数量
         self.count_graph_exist = 0 # 信息在图数据库中
@@ -47,17 +53,16 @@ class KbpPipeline(object):
     def _init_entity_type(self):
         '''加载MYSQL的实体类型ID'''
         self.entity_type_id = {}
-        sql_conn = pymysql.connect( host = self.config.get("mysql","host") ,
+        sql_conn = get_mysql_pool( host = self.config.get("mysql","host") ,
                             user = self.config.get("mysql","user") ,
                             passwd = self.config.get("mysql","passwd"),
                             port = self.config.getint("mysql","port") ,
                             db = self.config.get("mysql","db"),
-                            charset = "utf8" )
+                            charset = "utf8" ).connect()
         sql_cur = sql_conn.cursor() 
         sql_state = self.config.get("mysql","entity_type_query").replace("eq","=")
         print(sql_state)
-        sql_cur.execute(sql_state)
-        mysql_res = sql_cur.fetchall()
+        mysql_res = get_schema_cache().fetchall(sql_cur, sql_state)
         for name, entity_id, parent_id in mysql_res:
             self.entity_type_id[name] = (entity_id, parent_id)
 
@@ -146,13 +151,10 @@ class KbpPipeline(object):
         count = 0
 
         # arango数据库软著信息处理
-        for software in softwares:
+        for software, exist in self.kb_loader.iter_exist(softwares, lambda d: d["_id"]):
 
             logger.info("处理软著[{}]".format(software["name"]))
 
-            # arango现存软著查询
-            exist = self.kb_software.fetchFirstExample( {"_key":software["_id"]}  )
-
             if not exist:
 
                 logger.info("Arango新增软著[{}]".format(software["name"]))
@@ -170,18 +172,20 @@ class KbpPipeline(object):
                     "update_time": datetime.datetime.today()
                 }
 
-                self.insert_graph_kb(kf) 
+                self.kb_loader.add(kf)
 
             else:
 
                 logger.info("软著数据已存在图数据库中，软著名=[{}]，软著ID=[{}]".format(software["name"], software["_id"])) 
-                self.count_graph_exist += 1
 
             count += 1
 
         if count % 100 == 0 or count == self.total:
             logger.info("清洗库前[{}]条软著数据导入软著知识库处理完成".format(count))
 
+        self.kb_loader.flush()
+        self.count_graph_insert = self.kb_loader.count_insert
+        self.count_graph_exist = self.kb_loader.count_exist
         self.close_connection() 
 
         logger.info("日期[{}]共找到清洗库软著数据[{}]条，arango软著库新增数据[{}]条，arango已存在软著数据[{}]条".format(